@@ -4,26 +4,31 @@ import Grid from '@mui/material/Grid';
 import Card from '@mui/material/Card';
 import CardContent from '@mui/material/CardContent';
 import Typography from '@mui/material/Typography';
+import Button from '@mui/material/Button';
 
 const AllDeviceLogs = () => {
   const [logs, setLogs] = useState([]);
   const [error, setError] = useState(null);
+  // The API returns logs a page at a time, newest first; X-Next-Cursor points at the next page
+  const [nextCursor, setNextCursor] = useState(null);
 
-  useEffect(() => {
-    const fetchLogs = async () => {
-      try {
-        const response = await axios.get('http://127.0.0.1:5000/logs', {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem('accessToken')}`,
-          },
-        });
-        setLogs(response.data);
-      } catch (error) {
-        setError('Error fetching all device logs');
-        console.error('Error fetching all device logs:', error);
-      }
-    };
+  const fetchLogs = async (cursor) => {
+    try {
+      const response = await axios.get('http://127.0.0.1:5000/logs', {
+        params: cursor ? { cursor } : {},
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem('accessToken')}`,
+        },
+      });
+      setLogs((previous) => (cursor ? [...previous, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      setError('Error fetching all device logs');
+      console.error('Error fetching all device logs:', error);
+    }
+  };
 
+  useEffect(() => {
     fetchLogs();
   }, []);
 
@@ -45,6 +50,11 @@ const AllDeviceLogs = () => {
           </Grid>
         ))}
       </Grid>
+      {nextCursor && (
+        <Button variant="contained" onClick={() => fetchLogs(nextCursor)} style={{ marginTop: '20px' }}>
+          Load older logs
+        </Button>
+      )}
     </div>
   );
 };
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
+import { subscribeToEvents, applyDeviceEvent } from '../events';
 import { Grid, Typography, Card, CardContent, Box, Button } from '@mui/material';
 
 const Kitchen = () => {
@@ -22,6 +23,11 @@ const Kitchen = () => {
     };
 
     fetchDevices();
+
+    // Keep the list current from pushed device changes instead of re-fetching
+    return subscribeToEvents({
+      device: (event) => setDevices((current) => applyDeviceEvent(current, event, 'kitchen')),
+    });
   }, []);
 
   const handleToggleDevice = async (id, status) => {
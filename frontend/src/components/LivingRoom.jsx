@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import axios from 'axios';
+import { subscribeToEvents, applyDeviceEvent } from '../events';
 import Grid from '@mui/material/Grid';
 import Card from '@mui/material/Card';
 import CardContent from '@mui/material/CardContent';
@@ -25,6 +26,11 @@ const LivingRoom = () => {
     };
 
     fetchDevices();
+
+    // Keep the list current from pushed device changes instead of re-fetching
+    return subscribeToEvents({
+      device: (event) => setDevices((current) => applyDeviceEvent(current, event, 'living-room')),
+    });
   }, []);
 
   return (
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Grid, Card, CardContent, Typography, Button } from '@mui/material';
 import axios from 'axios';
 import { getAccessToken } from '../auth';
+import { subscribeToEvents } from '../events';
 
 const Temperature = () => {
   const [temperature, setTemperature] = useState(null);
@@ -46,7 +47,15 @@ const Temperature = () => {
       fetchHumidity();
     }, 300000); // Update every 5 minutes
 
-    return () => clearInterval(interval);
+    // Temperature readings are pushed by the backend
+    const unsubscribe = subscribeToEvents({
+      temperature: (data) => setTemperature(data.temperature),
+    });
+
+    return () => {
+      clearInterval(interval);
+      unsubscribe();
+    };
   }, []);
 
   return (
@@ -0,0 +1,28 @@
+import { getAccessToken } from './auth';
+
+// Opens the backend event stream and routes each named event to its handler.
+// Returns a function that closes the stream.
+export const subscribeToEvents = (handlers) => {
+  const token = encodeURIComponent(getAccessToken());
+  const source = new EventSource(`http://127.0.0.1:5000/events?jwt=${token}`);
+
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)));
+  });
+
+  return () => source.close();
+};
+
+// Applies a `device` event to a list of devices shown for one location.
+export const applyDeviceEvent = (devices, { change, device }, location) => {
+  const others = devices.filter((d) => d.id !== device.id);
+  if (change === 'deleted' || (device.location && device.location !== location)) {
+    return others;
+  }
+
+  const existing = devices.find((d) => d.id === device.id);
+  if (!existing) {
+    return change === 'created' ? [...devices, device] : devices;
+  }
+  return devices.map((d) => (d.id === device.id ? { ...d, ...device } : d));
+};
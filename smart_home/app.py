@@ -1,45 +1,201 @@
 from functools import wraps
-from flask import Flask, jsonify, request
-from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from flask import Flask, Response, json, jsonify, request, stream_with_context
+from sqlalchemy import orm, true
 from flask_jwt_extended import (
-    JWTManager,
     create_access_token,
     create_refresh_token,
+    decode_token,
     jwt_required,
     get_jwt_identity,
     get_jwt,
 )
-from config import Config
-from flask_migrate import Migrate
+from config import get_config
+from log_pipeline import configure_logging
+from db_tuning import install_fork_guard, install_sqlite_pragmas
+from extensions import db, jwt, migrate
+from tenancy import DEFAULT_SHARD, current_shard, shard_bind_key, shard_for_user, shard_names, use_shard
+from serializers import json_encoder
 import logging
 from flask_cors import CORS
-import random
+from werkzeug.middleware.proxy_fix import ProxyFix
+import math
+import time
+from datetime import datetime
+import click
 
-logging.basicConfig(
-    filename="app.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+config = get_config()
+configure_logging(config)
+install_sqlite_pragmas(config.SQLITE_PRAGMAS)
+install_fork_guard()
 
 app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)
+app.config.from_object(config)
+app.json_encoder = json_encoder(app.config["JSON_BACKEND"], app.config["JSON_DATETIME_FORMAT"])
+CORS(app, expose_headers=["X-Next-Cursor"])
+if app.config["TRUSTED_PROXIES"]:
+    # request.remote_addr (rate limit keys, logs) becomes the client the outermost trusted proxy saw
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
+
+db.app = app  # Usable outside an app context, as when it was built with the app
+db.init_app(app)
+jwt.init_app(app)
+migrate.init_app(app, db)
+
+from models import User, Household, MockIoTDevice, DeviceLog, DeviceCommand, AutomationRule
+from revocation import RevocationIndex
+from user_cache import UserCache
+from pagination import encode_cursor, filter_logs, page_size
+from device_control import (
+    ACTIONS,
+    MAX_BULK_COMMANDS,
+    bump_device_version,
+    command_error,
+    control_devices,
+    load_devices,
+    resolve_action,
+)
+from response_cache import ResponseCache
+from log_buffer import DeviceLogBuffer
+from events import format_sse, load_broker as load_event_broker
+from sensors import RESOLUTIONS, SensorSimulator, SensorStore, now_ms, parse_readings, post_readings
+from passwords import PasswordHasher, PasswordHasherBusy
+from instrumentation import Instrumentation
+from policies import PolicyError, compile_policy
+from rules import RuleEngine, RuleError, RuleScheduler, rule_columns, rule_to_dict
+from drivers import load_driver
+from command_queue import CommandQueue, CommandQueueFull, command_to_dict
+from bulk_io import (
+    DEVICE_EXPORT_FIELDS,
+    FORMATS,
+    LOG_EXPORT_FIELDS,
+    MIMETYPES,
+    detect_format,
+    device_validator,
+    export_rows,
+    import_rows,
+    log_validator,
+    read_rows,
+)
+from ratelimit import RateLimited, RateLimiter, load_backend as load_rate_limit_backend
+from serializers import (
+    DEVICE_FIELDS,
+    DEVICE_LIST_FIELDS,
+    LOG_FIELDS,
+    columns,
+    response_layout,
+    serialize_rows,
+    to_dict,
+)
 
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
-migrate = Migrate(app, db)
+revoked_tokens = RevocationIndex(sync_interval=app.config["JWT_REVOCATION_SYNC_SECONDS"])
+user_cache = UserCache(ttl=app.config["USER_CACHE_TTL_SECONDS"])
+event_broker = load_event_broker(app.config)
+sensor_store = SensorStore(ttl=app.config["SENSOR_LATEST_TTL_SECONDS"])
+response_cache = ResponseCache(max_bytes=app.config["RESPONSE_CACHE_MAX_BYTES"])
+device_log_buffer = (
+    DeviceLogBuffer(
+        app,
+        batch_size=app.config["DEVICE_LOG_BATCH_SIZE"],
+        flush_interval=app.config["DEVICE_LOG_FLUSH_MS"] / 1000,
+        max_pending=app.config["DEVICE_LOG_MAX_PENDING"],
+    )
+    if app.config["DEVICE_LOG_WRITE_BEHIND"]
+    else None
+)
+password_hasher = PasswordHasher(
+    rounds=app.config["BCRYPT_LOG_ROUNDS"],
+    workers=app.config["PASSWORD_HASH_WORKERS"],
+    max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+)
+rate_limiter = RateLimiter(
+    load_rate_limit_backend(app.config),
+    enabled=app.config["RATE_LIMIT_ENABLED"],
+    default=app.config["RATE_LIMIT_DEFAULT"],
+)
+instrumentation = (
+    Instrumentation(
+        n_plus_one_threshold=app.config["N_PLUS_ONE_THRESHOLD"],
+        slow_request_ms=app.config["PROFILE_SLOW_REQUEST_MS"],
+        sample_interval_ms=app.config["PROFILE_SAMPLE_INTERVAL_MS"],
+        profile_dir=app.config["PROFILE_DIR"],
+    )
+    if app.config["INSTRUMENTATION_ENABLED"]
+    else None
+)
+if instrumentation is not None:
+    instrumentation.init_app(app)
+rate_limiter.init_app(app)  # After instrumentation, so shed requests still show in /metrics
+rule_engine = RuleEngine(
+    dispatch=lambda rules: run_rule_actions(rules),
+    sync_interval=app.config["RULES_SYNC_SECONDS"],
+)
+command_queue = (
+    CommandQueue(
+        app,
+        load_driver(app.config),
+        on_complete=lambda command, result: publish_command_result(command, result),
+        workers=app.config["DEVICE_COMMAND_WORKERS"],
+        max_pending=app.config["DEVICE_COMMAND_MAX_PENDING"],
+        timeout=app.config["DEVICE_COMMAND_TIMEOUT_MS"] / 1000,
+        max_attempts=app.config["DEVICE_COMMAND_MAX_ATTEMPTS"],
+        retry_backoff=app.config["DEVICE_COMMAND_RETRY_BACKOFF_MS"] / 1000,
+        log_buffer=device_log_buffer,
+    )
+    if app.config["DEVICE_COMMAND_QUEUE_ENABLED"]
+    else None
+)
 
-from models import User, MockIoTDevice, DeviceLog, TokenBlacklist
+
+# Load revoked tokens once before serving
+@app.before_first_request
+def load_revoked_tokens():
+    loaded = revoked_tokens.sync()
+    logging.info("Loaded %s revoked tokens into memory", loaded)
+
+
+# Index automation rules once before serving; time rules need the scheduler
+@app.before_first_request
+def load_automation_rules():
+    loaded = rule_engine.sync()
+    logging.info("Loaded %s automation rules into memory", loaded)
+    if app.config["RULES_SCHEDULER_ENABLED"]:
+        RuleScheduler(app, rule_engine).start()
 
 
 # Token Blacklist Check
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blacklist(jwt_header, jwt_payload):
-    jti = jwt_payload["jti"]
-    token = TokenBlacklist.query.filter_by(jti=jti).first()
-    return token is not None  # Returns True if token is blacklisted
+    return revoked_tokens.is_revoked(jwt_payload["jti"])  # Returns True if token is blacklisted
+
+
+# Shed password work when the hashing pool is saturated
+@app.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    logging.warning("Password hashing queue full, request rejected")
+    return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+
+
+@app.errorhandler(CommandQueueFull)
+def command_queue_full(e):
+    logging.warning("Device command queue full, request rejected")
+    return jsonify({"error": "Too many pending device commands, please retry"}), 503, {"Retry-After": "1"}
+
+
+# Shed requests over their rate limit before any database or password work
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    logging.warning("Rate limit exceeded: %s %s from %s", request.method, request.path, request.remote_addr)
+    return (
+        jsonify({"error": "Too many requests, please retry later"}),
+        429,
+        {"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+
+def login_username():
+    """The username a login attempt is for, so guessing one account's password is limited across IPs."""
+    username = (request.get_json(silent=True) or {}).get("username")
+    return None if username is None else str(username)
 
 
 # Admin-only decorator
@@ -48,9 +204,9 @@ def admin_required(fn):
     @jwt_required()
     def wrapper(*args, **kwargs):
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = user_cache.get(user_id)
         if not user or not user.is_admin:
-            logging.warning(f"Unauthorized access attempt by User ID: {user_id}")
+            logging.warning("Unauthorized access attempt by User ID: %s", user_id)
             return jsonify({"error": "Admin access required"}), 403
         return fn(*args, **kwargs)
 
@@ -61,26 +217,23 @@ def admin_required(fn):
 @app.route("/users", methods=["GET"])
 @admin_required
 def get_all_users():
-    users = User.query.all()
-    users_list = [
-        {
-            "id": user.id,
-            "username": user.username,
-            "parental_controls": user.get_parental_controls(),
-        }
-        for user in users
-    ]
+    users = User.query.with_entities(User.id, User.username, User.parental_controls)
+    # The stored settings are already JSON, so they are spliced in rather than decoded and re-encoded
+    body = ",".join(
+        f'{{"id":{user_id},"username":{json.dumps(username)},"parental_controls":{parental_controls or "{}"}}}'
+        for user_id, username, parental_controls in users
+    )
     logging.info("All users fetched")
-    return jsonify(users_list), 200
+    return Response(f"[{body}]\n", mimetype="application/json"), 200
 
 
 # Get User Details (Admin)
 @app.route("/users/<int:id>", methods=["GET"])
 @admin_required
 def get_user_details(id):
-    user = User.query.get(id)
+    user = user_cache.get(id)
     if not user:
-        logging.error(f"User with ID {id} not found.")
+        logging.error("User with ID %s not found.", id)
         return jsonify({"error": "User not found"}), 404
 
     user_details = {
@@ -88,7 +241,7 @@ def get_user_details(id):
         "username": user.username,
         "parental_controls": user.get_parental_controls(),
     }
-    logging.info(f"Details fetched for user ID: {id}")
+    logging.info("Details fetched for user ID: %s", id)
     return jsonify(user_details), 200
 
 
@@ -97,13 +250,13 @@ def get_user_details(id):
 @jwt_required()
 def get_current_user_details():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = user_cache.get(user_id)
     if not user:
-        logging.error(f"User with ID {user_id} not found.")
+        logging.error("User with ID %s not found.", user_id)
         return jsonify({"error": "User not found"}), 404
 
     user_details = {"id": user.id, "username": user.username}
-    logging.info(f"Details fetched for user ID: {user_id}")
+    logging.info("Details fetched for user ID: %s", user_id)
     return jsonify(user_details), 200
 
 
@@ -113,7 +266,7 @@ def get_current_user_details():
 def update_user_details(id):
     user = User.query.get(id)
     if not user:
-        logging.error(f"User with ID {id} not found.")
+        logging.error("User with ID %s not found.", id)
         return jsonify({"error": "User not found"}), 404
 
     data = request.get_json()
@@ -123,10 +276,11 @@ def update_user_details(id):
     if username:
         user.username = username
     if password:
-        user.password = bcrypt.generate_password_hash(password).decode("utf-8")
+        user.password = password_hasher.hash(password)
 
     db.session.commit()
-    logging.info(f"User ID {id} updated")
+    user_cache.invalidate(id)
+    logging.info("User ID %s updated", id)
     return jsonify({"message": "User updated successfully"}), 200
 
 
@@ -136,12 +290,19 @@ def update_user_details(id):
 def delete_user(id):
     user = User.query.get(id)
     if not user:
-        logging.error(f"User with ID {id} not found.")
+        logging.error("User with ID %s not found.", id)
         return jsonify({"error": "User not found"}), 404
 
+    # Database-level cascades only reach household data kept in the main database
+    shard = shard_for_user(id)
+    if shard != DEFAULT_SHARD:
+        with use_shard(shard):
+            AutomationRule.query.filter_by(user_id=id).delete(synchronize_session=False)
+            MockIoTDevice.query.filter_by(user_id=id).delete(synchronize_session=False)
     db.session.delete(user)
     db.session.commit()
-    logging.info(f"User ID {id} deleted")
+    user_cache.invalidate(id)
+    logging.info("User ID %s deleted", id)
     return jsonify({"message": "User deleted successfully"}), 200
 
 
@@ -152,39 +313,63 @@ def home():
     return jsonify({"message": "Smart Home Automation System Backend"})
 
 
+# Prometheus metrics (only with INSTRUMENTATION_ENABLED)
+@app.route("/metrics")
+def metrics():
+    if instrumentation is None:
+        return jsonify({"error": "Instrumentation is disabled"}), 404
+    return Response(instrumentation.render(), mimetype="text/plain; version=0.0.4")
+
+
 # User Registration
 @app.route("/register", methods=["POST"])
+@rate_limiter.limit("20/hour", per="ip")
 def register():
     data = request.get_json()
-    hashed_password = bcrypt.generate_password_hash(data["password"]).decode("utf-8")
-    user = User(username=data["username"], password=hashed_password)
+    hashed_password = password_hasher.hash(data["password"])
+    household = Household(name=f"{data['username']}'s home", shard=app.config["HOUSEHOLD_DEFAULT_SHARD"])
+    user = User(username=data["username"], password=hashed_password, household=household)
     db.session.add(user)
     db.session.commit()
-    logging.info(f"User registered: {data['username']}")
+    logging.info("User registered: %s", data["username"])
     return jsonify({"message": "User registered successfully"}), 201
 
 
+def user_by_username_query(username):
+    """Query of the user logging in as ``username``."""
+    return User.query.filter_by(username=username)
+
+
 # User Login
 @app.route("/login", methods=["POST"])
+@rate_limiter.limit("20/minute", per="ip")
+@rate_limiter.limit("10/minute", per=login_username)
 def login():
     data = request.get_json()
-    user = User.query.filter_by(username=data["username"]).first()
-    if user and bcrypt.check_password_hash(user.password, data["password"]):
+    user = user_by_username_query(data["username"]).first()
+    if user and password_hasher.check(user.password, data["password"]):
+        if password_hasher.needs_rehash(user.password):
+            # Upgrade hashes made with a lower cost factor while we have the plaintext
+            user.password = password_hasher.hash(data["password"])
+            db.session.commit()
+            user_cache.invalidate(user.id)
+            logging.info("Password hash upgraded for user: %s", data["username"])
         access_token = create_access_token(identity=user.id)
         refresh_token = create_refresh_token(identity=user.id)  # Generate refresh token
-        logging.info(f"User logged in: {data['username']}")
+        logging.info("User logged in: %s", data["username"])
         return jsonify(access_token=access_token, refresh_token=refresh_token), 200
-    logging.warning(f"Failed login attempt for user: {data['username']}")
+    logging.warning("Failed login attempt for user: %s", data["username"])
     return jsonify({"error": "Invalid credentials"}), 401
 
 
 # Refresh Access Token
 @app.route("/refresh", methods=["POST"])
+@rate_limiter.limit("30/minute", per="ip")
 @jwt_required(refresh=True)
 def refresh():
     current_user = get_jwt_identity()
     new_access_token = create_access_token(identity=current_user)
-    logging.info(f"Access token refreshed for user: {current_user}")
+    logging.info("Access token refreshed for user: %s", current_user)
     return jsonify(access_token=new_access_token)
 
 
@@ -192,11 +377,10 @@ def refresh():
 @app.route("/logout", methods=["DELETE"])
 @jwt_required()
 def logout():
-    jti = get_jwt()["jti"]  # Get the JWT ID (jti) from the token
-    blacklist_token = TokenBlacklist(jti=jti)
-    db.session.add(blacklist_token)
-    db.session.commit()
-    logging.info(f"User with token {jti} logged out and token blacklisted")
+    token = get_jwt()
+    jti = token["jti"]  # Get the JWT ID (jti) from the token
+    revoked_tokens.revoke(jti, token.get("exp"))
+    logging.info("User with token %s logged out and token blacklisted", jti)
     return jsonify({"message": "Successfully logged out"}), 200
 
 # Add a Mock IoT Device
@@ -215,10 +399,16 @@ def add_mock_device():
     user_id = get_jwt_identity()
     device = MockIoTDevice(name=device_name, device_type=device_type, location=location, user_id=user_id)
     db.session.add(device)
+    bump_device_version(user_id)
     db.session.commit()
+    publish_device_event(device, "created")
 
     logging.info(
-        f"Mock device added: {device_name} (Type: {device_type}, Location: {location}) by User ID: {user_id}"
+        "Mock device added: %s (Type: %s, Location: %s) by User ID: %s",
+        device_name,
+        device_type,
+        location,
+        user_id,
     )
     return (
         jsonify({"message": "Mock device added successfully", "device_id": device.id}),
@@ -226,57 +416,161 @@ def add_mock_device():
     )
     
 
+def device_listing_rows(query, fields):
+    """The ``fields`` of the devices in ``query``, as plain rows."""
+    return query.with_entities(*columns(MockIoTDevice, fields))
+
+
+def device_version_query(user_id):
+    """Query of the ``device_version`` that keys ``user_id``'s cached listings."""
+    return db.session.query(User.device_version).filter_by(id=user_id)
+
+
+def cached_device_listing(user_id, key, query, fields):
+    """Serve a device listing from the response cache, with an ETag and 304 support.
+
+    Entries are keyed on the user's ``device_version``, which every device
+    write bumps, so checking freshness costs one primary-key lookup. Only
+    ``fields`` are selected, as plain rows, in the requested ``?layout=``.
+    """
+    try:
+        layout = response_layout(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        return serialize_rows(device_listing_rows(query, fields), fields, layout)
+
+    key += (layout,)
+    version = device_version_query(user_id).scalar()
+    cache_key = (int(user_id), version) + key
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        entry = response_cache.put(cache_key, (json.dumps(build()) + "\n").encode("utf-8"))
+    etag, body = entry
+
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
 # Fetch all Mock IoT Devices
 @app.route("/mock/devices", methods=["GET"])
 @jwt_required()
 def get_all_mock_devices():
     user_id = get_jwt_identity()
-    devices = MockIoTDevice.query.filter_by(user_id=user_id).all()
-    devices_list = [
-        {
-            "id": device.id,
-            "name": device.name,
-            "device_type": device.device_type,
-            "status": device.status,
-            "last_action": device.last_action,
-        }
-        for device in devices
-    ]
-    logging.info(f"All devices fetched for User ID: {user_id}")
-    return jsonify(devices_list), 200
+    query = MockIoTDevice.query.filter_by(user_id=user_id)
+    logging.info("All devices fetched for User ID: %s", user_id)
+    return cached_device_listing(user_id, ("devices",), query, DEVICE_LIST_FIELDS)
+
+
+def upload_lines():
+    """``(format, lines)`` of an import: a ``file`` form field or the raw request body, read as it streams in."""
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("file")
+        if upload is None:
+            raise ValueError("Missing 'file' upload")
+        return detect_format(request.args.get("format"), upload.mimetype, upload.filename), upload.stream
+    return detect_format(request.args.get("format"), request.mimetype), request.stream
+
+
+def export_response(query, fields, name):
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}"}), 400
+    return Response(
+        stream_with_context(export_rows(query, fields, fmt)),
+        mimetype=MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"},
+    )
+
+
+# Import Mock IoT Devices from a CSV or NDJSON upload
+@app.route("/mock/devices/import", methods=["POST"])
+@jwt_required()
+@rate_limiter.limit("10/minute", per="user")
+def import_mock_devices():
+    user_id = get_jwt_identity()
+    try:
+        fmt, lines = upload_lines()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    report = import_rows(
+        read_rows(lines, fmt),
+        device_validator(user_id),
+        MockIoTDevice,
+        chunk_size=app.config["BULK_IMPORT_CHUNK_SIZE"],
+        on_chunk=lambda: bump_device_version(user_id),
+    )
+    logging.info(
+        "Imported %s devices (%s rejected) for User ID: %s", report["imported"], report["rejected"], user_id
+    )
+    return jsonify(report), 200
+
+
+# Export Mock IoT Devices as CSV or NDJSON
+@app.route("/mock/devices/export", methods=["GET"])
+@jwt_required()
+@rate_limiter.limit("10/minute", per="user")
+def export_mock_devices():
+    user_id = get_jwt_identity()
+    query = (
+        MockIoTDevice.query.with_entities(*(getattr(MockIoTDevice, field) for field in DEVICE_EXPORT_FIELDS))
+        .filter_by(user_id=user_id)
+        .order_by(MockIoTDevice.id)
+    )
+    logging.info("Devices exported for User ID: %s", user_id)
+    return export_response(query, DEVICE_EXPORT_FIELDS, "devices")
 
 
 # Control a Mock IoT Device
 @app.route("/mock/devices/<int:id>/control", methods=["POST"])
 @jwt_required()
+@rate_limiter.limit("120/minute", per="user")
 def control_mock_device(id):
     device = MockIoTDevice.query.get(id)
     if not device:
-        logging.error(f"Device with ID {id} not found.")
+        logging.error("Device with ID %s not found.", id)
         return jsonify({"error": "Device not found"}), 404
 
     action = request.json.get("action")
-    if action not in ["turn_on", "turn_off", "adjust"]:
-        logging.error(f"Invalid action attempted on device ID {id}: {action}")
+    if action not in ACTIONS:
+        logging.error("Invalid action attempted on device ID %s: %s", id, action)
         return jsonify({"error": "Invalid action"}), 400
 
-    if action == "turn_on":
-        device.status = "on"
-        device.last_action = "Device turned on"
-    elif action == "turn_off":
-        device.status = "off"
-        device.last_action = "Device turned off"
-    elif action == "adjust":
-        adjustment = request.json.get("value")
-        device.last_action = f"Device adjusted to {adjustment}"
-
-    # Log the device action
-    log = DeviceLog(action=device.last_action, device_id=device.id)
-    db.session.add(log)
+    user = user_cache.get(get_jwt_identity())
+    reason = user.policy.check(device.name, device.device_type, action) if user else None
+    if reason:
+        logging.warning("Parental controls blocked %s on device ID %s: %s", action, id, reason)
+        return jsonify({"error": reason}), 403
+
+    if command_queue is not None:
+        command_id, = command_queue.submit(device.user_id, [(device.id, action, request.json.get("value"))])
+        logging.info("Command %s queued for device %s by User ID: %s", command_id, device.name, get_jwt_identity())
+        return (
+            jsonify({"message": "Command queued", "command_id": command_id, "status": "queued"}),
+            202,
+            {"Location": f"/commands/{command_id}"},
+        )
+
+    status, device.last_action = resolve_action(action, request.json.get("value"))
+    if status:
+        device.status = status
+
+    # Log the device action; with write-behind enabled it is queued after the commit
+    if device_log_buffer is None:
+        db.session.add(DeviceLog(action=device.last_action, device_id=device.id))
+    bump_device_version(device.user_id)
     db.session.commit()
+    if device_log_buffer is not None:
+        device_log_buffer.add(device.id, device.last_action)
+    publish_device_event(device, "updated")
+    rule_engine.on_device_changes(device.user_id, [(device.id, device.status)])
 
     logging.info(
-        f"Device {device.name} controlled: {action} by User ID: {get_jwt_identity()}"
+        "Device %s controlled: %s by User ID: %s", device.name, action, get_jwt_identity()
     )
     return jsonify(
         {
@@ -287,19 +581,185 @@ def control_mock_device(id):
     )
 
 
+# Control several Mock IoT Devices in one transaction
+@app.route("/mock/devices/control", methods=["POST"])
+@jwt_required()
+@rate_limiter.limit("30/minute", per="user")
+def control_mock_devices_bulk():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+
+    if "commands" in data:
+        try:
+            if not isinstance(data["commands"], list) or not all(
+                isinstance(command, dict) for command in data["commands"]
+            ):
+                raise TypeError
+            commands = [
+                (int(command["device_id"]), command.get("action"), command.get("value"))
+                for command in data["commands"]
+            ]
+        except (KeyError, TypeError, ValueError):
+            logging.error("Malformed bulk control commands.")
+            return jsonify({"error": "Each command needs a device_id and an action"}), 400
+    elif "selector" in data:
+        selector = data.get("selector") or {}
+        if not isinstance(selector, dict):
+            logging.error("Malformed bulk control selector.")
+            return jsonify({"error": "Selector must be an object"}), 400
+        selector = {key: value for key, value in selector.items() if key in ("location", "device_type")}
+        if not selector:
+            logging.error("Bulk control selector without location or device_type.")
+            return jsonify({"error": "Selector needs a location or device_type"}), 400
+        if not all(isinstance(value, str) for value in selector.values()):
+            logging.error("Malformed bulk control selector.")
+            return jsonify({"error": "Selector location and device_type must be strings"}), 400
+        device_ids = MockIoTDevice.query.with_entities(MockIoTDevice.id).filter_by(
+            user_id=user_id, **selector
+        )
+        commands = [(device_id, data.get("action"), data.get("value")) for device_id, in device_ids]
+    else:
+        return jsonify({"error": "Either commands or selector is required"}), 400
+
+    if len(commands) > MAX_BULK_COMMANDS:
+        return jsonify({"error": f"At most {MAX_BULK_COMMANDS} commands per request"}), 400
+
+    user = user_cache.get(user_id)
+    if command_queue is not None:
+        results = queue_device_commands(user_id, commands, policy=user.policy if user else None)
+        logging.info("Bulk control of %s devices queued by User ID: %s", len(commands), user_id)
+        return jsonify({"message": "Commands queued", "results": results}), 202
+
+    results = control_devices(
+        user_id, commands, log_buffer=device_log_buffer, policy=user.policy if user else None
+    )
+    publish_control_results(user_id, results)
+    rule_engine.on_device_changes(
+        user_id, [(result["device_id"], result["status"]) for result in results if "error" not in result]
+    )
+    logging.info("Bulk control of %s devices by User ID: %s", len(commands), user_id)
+    return jsonify({"message": "Devices controlled", "results": results}), 200
+
+
+def queue_device_commands(user_id, commands, policy=None, source="api"):
+    """Validate commands like ``control_devices`` and queue the valid ones; returns a result per command."""
+    devices = load_devices(user_id, {device_id for device_id, _, _ in commands})
+    results = []
+    accepted = []
+    for device_id, action, value in commands:
+        error = command_error(devices.get(device_id), action, policy)
+        if error:
+            results.append({"device_id": device_id, "error": error})
+        else:
+            results.append({"device_id": device_id, "status": "queued"})
+            accepted.append((device_id, action, value))
+    command_ids = iter(command_queue.submit(user_id, accepted, source=source) if accepted else ())
+    for result in results:
+        if "error" not in result:
+            result["command_id"] = next(command_ids)
+    return results
+
+
+def publish_command_result(command, result):
+    """Publish a finished queued command; changes made by users (not rules) feed the device triggers."""
+    failed = "error" in result
+    event_broker.publish(
+        command.user_id,
+        "command",
+        {
+            "id": command.id,
+            "device_id": command.device_id,
+            "status": "failed" if failed else "succeeded",
+            "error": result.get("error"),
+        },
+    )
+    if not failed:
+        publish_control_results(command.user_id, [result])
+        if command.source != "rule":
+            rule_engine.on_device_changes(command.user_id, [(command.device_id, result["status"])])
+
+
+def publish_control_results(user_id, results):
+    """Publish an ``updated`` event for each successful ``control_devices`` result."""
+    for result in results:
+        if "error" not in result:
+            device = {
+                "id": result["device_id"],
+                "status": result["status"],
+                "last_action": result["last_action"],
+                "location": result["location"],
+            }
+            event_broker.publish(user_id, "device", {"change": "updated", "device": device})
+
+
+def publish_device_event(device, change):
+    event_broker.publish(device.user_id, "device", {"change": change, "device": to_dict(device)})
+
+
+# Get the Status of a Queued Device Command
+@app.route("/commands/<int:id>", methods=["GET"])
+@jwt_required()
+def get_device_command(id):
+    command = DeviceCommand.query.filter_by(id=id, user_id=get_jwt_identity()).first()
+    if not command:
+        logging.error("Device command with ID %s not found.", id)
+        return jsonify({"error": "Command not found"}), 404
+    return jsonify(command_to_dict(command)), 200
+
+
+def device_status_query(device_id, limit):
+    """Query of a device joined to its ``limit`` most recent logs.
+
+    Device and logs come back in one round trip; a device without logs
+    yields one row of NULLs. The rows are unordered: sorting at most
+    ``limit`` of them in Python saves the database a temporary B-tree.
+    """
+    # The N most recent logs, read off the (device_id, timestamp) index
+    recent = (
+        DeviceLog.query.with_entities(DeviceLog.id, DeviceLog.action, DeviceLog.timestamp)
+        .filter(DeviceLog.device_id == device_id)
+        .order_by(DeviceLog.timestamp.desc(), DeviceLog.id.desc())
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        db.session.query(
+            MockIoTDevice.id,
+            MockIoTDevice.name,
+            MockIoTDevice.device_type,
+            MockIoTDevice.status,
+            MockIoTDevice.last_action,
+            recent.c.id.label("log_id"),
+            recent.c.action,
+            recent.c.timestamp,
+        )
+        .outerjoin(recent, true())
+        .filter(MockIoTDevice.id == device_id)
+    )
+
+
 # Get Device Status with Monitoring Logs
 @app.route("/mock/devices/<int:id>/status", methods=["GET"])
 @jwt_required()
+@rate_limiter.limit("120/minute", per="user")
 def mock_device_status(id):
-    device = MockIoTDevice.query.get(id)
-    if not device:
-        logging.error(f"Device with ID {id} not found.")
+    try:
+        limit = page_size(request.args, default=app.config["DEVICE_STATUS_LOG_LIMIT"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = device_status_query(id, limit).all()
+    if not rows:
+        logging.error("Device with ID %s not found.", id)
         return jsonify({"error": "Device not found"}), 404
 
-    # Fetch recent logs for the device
-    logs = [{"action": log.action, "timestamp": log.timestamp} for log in device.logs]
+    device = rows[0]
+    recent = sorted((row for row in rows if row.log_id is not None), key=lambda row: (row.timestamp, row.log_id))
+    logs = [{"action": row.action, "timestamp": row.timestamp} for row in reversed(recent)]
 
-    logging.info(f"Status checked for device {device.name} (ID: {id})")
+    logging.info("Status checked for device %s (ID: %s)", device.name, id)
     return jsonify(
         {
             "device_id": device.id,
@@ -318,7 +778,7 @@ def mock_device_status(id):
 def update_mock_device(id):
     device = MockIoTDevice.query.get(id)
     if not device:
-        logging.error(f"Device with ID {id} not found.")
+        logging.error("Device with ID %s not found.", id)
         return jsonify({"error": "Device not found"}), 404
 
     data = request.get_json()
@@ -333,27 +793,14 @@ def update_mock_device(id):
     if location:
         device.location = location
 
+    bump_device_version(device.user_id)
     db.session.commit()
+    publish_device_event(device, "updated")
 
     logging.info(
-        f"Device {device.name} (ID: {id}) updated by User ID: {get_jwt_identity()}"
-    )
-    return (
-        jsonify(
-            {
-                "message": "Device updated successfully",
-                "device": {
-                    "id": device.id,
-                    "name": device.name,
-                    "device_type": device.device_type,
-                    "status": device.status,
-                    "last_action": device.last_action,
-                    "location": device.location,
-                },
-            }
-        ),
-        200,
+        "Device %s (ID: %s) updated by User ID: %s", device.name, id, get_jwt_identity()
     )
+    return jsonify({"message": "Device updated successfully", "device": to_dict(device)}), 200
     
 
 # Delete a Mock IoT Device
@@ -364,28 +811,275 @@ def delete_mock_device(id):
 
     # Log if the device was not found
     if not device:
-        logging.error(f"Device with ID {id} not found.")
+        logging.error("Device with ID %s not found.", id)
         return jsonify({"error": "Device not found"}), 404
 
     # Log the deletion process
-    logging.info(f"Deleting device: {device.name} (ID: {id})")
+    logging.info("Deleting device: %s (ID: %s)", device.name, id)
 
-    db.session.delete(device)
+    user_id = device.user_id
+    if device_log_buffer is not None:
+        device_log_buffer.flush()  # Don't let queued logs land after the device is gone
+    db.session.delete(device)  # Logs and readings go with it through ON DELETE CASCADE
+    bump_device_version(user_id)
     db.session.commit()
+    sensor_store.forget_device(id)
+    event_broker.publish(user_id, "device", {"change": "deleted", "device": {"id": id}})
 
-    logging.info(f"Device with ID {id} deleted successfully.")
+    logging.info("Device with ID %s deleted successfully.", id)
     return jsonify({"message": "Device deleted successfully"}), 200
 
 
+def temperature_payload(reading):
+    if reading is None:
+        return {"temperature": None, "device_id": None, "timestamp": None}
+    return {
+        "temperature": reading["value"],
+        "device_id": reading["device_id"],
+        "timestamp": reading["timestamp"],
+    }
+
+
 # Temperature Controller
 @app.route("/temperature", methods=["GET"])
 @jwt_required()
+@rate_limiter.limit("60/minute", per="user")
 def get_temperature():
-    temperature = round(
-        random.uniform(18.0, 26.0), 2
-    )  # Generate a random temperature between 18 and 26 degrees Celsius
-    logging.info(f"Temperature reading: {temperature}°C")
-    return jsonify({"temperature": temperature})
+    user_id = get_jwt_identity()
+    reading = sensor_store.latest(user_id)
+    logging.info("Temperature reading for User ID %s: %s°C", user_id, reading and reading["value"])
+    return jsonify(temperature_payload(reading))
+
+
+# Ingest a batch of sensor readings
+@app.route("/sensors/readings", methods=["POST"])
+@jwt_required()
+@rate_limiter.limit("600/minute", per="user")
+def ingest_sensor_readings():
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    try:
+        readings = parse_readings(data.get("readings", []), now_ms())
+    except ValueError as e:
+        logging.error("Malformed sensor readings: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+    device_ids = {reading["device_id"] for reading in readings}
+    owned = {
+        device_id
+        for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id).filter(
+            MockIoTDevice.user_id == user_id, MockIoTDevice.id.in_(device_ids)
+        )
+    }
+    if device_ids - owned:
+        logging.error("Sensor readings for unknown devices: %s", sorted(device_ids - owned))
+        return jsonify({"error": "Device not found", "device_ids": sorted(device_ids - owned)}), 404
+
+    for reading in sensor_store.ingest(user_id, readings):
+        if reading["kind"] == "temperature":
+            event_broker.publish(user_id, "temperature", temperature_payload(reading))
+    rule_engine.on_sensor_readings(user_id, readings)
+
+    logging.info("%s sensor readings ingested for User ID: %s", len(readings), user_id)
+    return jsonify({"message": "Readings stored", "count": len(readings)}), 201
+
+
+# Temperature history rolled up per time bucket
+@app.route("/temperature/history", methods=["GET"])
+@jwt_required()
+@rate_limiter.limit("30/minute", per="user")
+def get_temperature_history():
+    user_id = get_jwt_identity()
+    resolution = request.args.get("resolution", "1m")
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": f"Resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        since = request.args.get("since", type=int)
+        until = request.args.get("until", type=int)
+        device_id = request.args.get("device_id", type=int)
+    except ValueError:
+        return jsonify({"error": "since, until and device_id must be integers"}), 400
+
+    query = MockIoTDevice.query.with_entities(MockIoTDevice.id).filter_by(user_id=user_id)
+    if device_id is not None:
+        query = query.filter_by(id=device_id)
+    device_ids = [device_id for device_id, in query]
+
+    buckets = sensor_store.rollup(device_ids, "temperature", resolution, since, until)
+    logging.info("Temperature history (%s) fetched for User ID: %s", resolution, user_id)
+    return jsonify({"resolution": resolution, "buckets": buckets}), 200
+
+
+# Server-sent stream of device changes and sensor readings
+@app.route("/events", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+@rate_limiter.limit("10/minute", per="user")
+def stream_events():
+    """Push ``device`` and ``temperature`` events to the caller as they happen.
+
+    ``EventSource`` cannot set headers, so the access token may also be passed
+    as ``?jwt=<token>``.
+    """
+    user_id = get_jwt_identity()
+    interval = app.config["EVENT_STREAM_KEEPALIVE_SECONDS"]
+    current = sensor_store.latest(user_id)
+    subscription = event_broker.subscribe(user_id)
+
+    def generate():
+        try:
+            yield format_sse("temperature", temperature_payload(current))
+            deadline = time.monotonic() + interval
+            while True:
+                for message in subscription.drain(max(deadline - time.monotonic(), 0)):
+                    yield message
+                if time.monotonic() >= deadline:
+                    yield ": keepalive\n\n"
+                    deadline = time.monotonic() + interval
+        finally:
+            event_broker.unsubscribe(user_id, subscription)
+
+    logging.info("Event stream opened for User ID: %s", user_id)
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def run_rule_actions(rules):
+    """Run fired automation rules through the bulk device-control path, one transaction per user,
+    or through the command queue when it is enabled.
+
+    Changes made by rules are published like manual ones but are not fed
+    back into the device triggers, so rules cannot set each other off in a loop.
+    """
+    by_user = {}
+    for rule in rules:
+        by_user.setdefault((rule.shard, rule.user_id), []).append(rule)
+
+    for (shard, user_id), user_rules in by_user.items():
+        with use_shard(shard):
+            commands = []
+            for rule in user_rules:
+                if rule.target_device_id is not None:
+                    device_ids = [rule.target_device_id]
+                else:
+                    selector = {
+                        key: value
+                        for key, value in (
+                            ("location", rule.target_location),
+                            ("device_type", rule.target_device_type),
+                        )
+                        if value
+                    }
+                    device_ids = [
+                        device_id
+                        for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id).filter_by(
+                            user_id=user_id, **selector
+                        )
+                    ]
+                commands.extend((device_id, rule.action, rule.value) for device_id in device_ids)
+
+            user = user_cache.get(user_id)
+            policy = user.policy if user else None
+            if command_queue is not None:
+                results = queue_device_commands(user_id, commands[:MAX_BULK_COMMANDS], policy=policy, source="rule")
+            else:
+                results = control_devices(
+                    user_id, commands[:MAX_BULK_COMMANDS], log_buffer=device_log_buffer, policy=policy
+                )
+                publish_control_results(user_id, results)
+        logging.info("Automation rules sent %s device commands for User ID: %s", len(results), user_id)
+
+
+def find_rule(user_id, id):
+    return AutomationRule.query.filter_by(id=id, user_id=user_id, deleted_at=None).first()
+
+
+def save_rule(user_id, rule, data):
+    """Validate ``data`` onto ``rule`` and commit; returns an error response or ``None``."""
+    try:
+        columns = rule_columns(data)
+    except RuleError as e:
+        return jsonify({"error": str(e)}), 400
+    device_ids = {columns[key] for key in ("trigger_device_id", "target_device_id") if columns[key] is not None}
+    owned = {
+        device_id
+        for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id).filter(
+            MockIoTDevice.user_id == user_id, MockIoTDevice.id.in_(device_ids)
+        )
+    }
+    if device_ids - owned:
+        return jsonify({"error": "Device not found", "device_ids": sorted(device_ids - owned)}), 404
+
+    for key, value in columns.items():
+        setattr(rule, key, value)
+    if rule.id is None:
+        db.session.add(rule)
+    db.session.commit()
+    rule_engine.apply(rule, current_shard())
+    return None
+
+
+# List Automation Rules
+@app.route("/rules", methods=["GET"])
+@jwt_required()
+def get_rules():
+    user_id = get_jwt_identity()
+    rules = AutomationRule.query.filter_by(user_id=user_id, deleted_at=None).order_by(AutomationRule.id)
+    return jsonify([rule_to_dict(rule) for rule in rules]), 200
+
+
+# Create an Automation Rule
+@app.route("/rules", methods=["POST"])
+@jwt_required()
+def create_rule():
+    user_id = get_jwt_identity()
+    rule = AutomationRule(user_id=user_id)
+    error = save_rule(user_id, rule, request.get_json())
+    if error:
+        return error
+    logging.info("Automation rule %s created by User ID: %s", rule.id, user_id)
+    return jsonify(rule_to_dict(rule)), 201
+
+
+# Replace an Automation Rule, or just enable/disable it with {"enabled": ...}
+@app.route("/rules/<int:id>", methods=["PUT"])
+@jwt_required()
+def update_rule(id):
+    user_id = get_jwt_identity()
+    rule = find_rule(user_id, id)
+    if not rule:
+        return jsonify({"error": "Rule not found"}), 404
+
+    data = request.get_json() or {}
+    if set(data) == {"enabled"}:
+        rule.enabled = bool(data["enabled"])
+        db.session.commit()
+        rule_engine.apply(rule, current_shard())
+    else:
+        error = save_rule(user_id, rule, data)
+        if error:
+            return error
+    logging.info("Automation rule %s updated by User ID: %s", id, user_id)
+    return jsonify(rule_to_dict(rule)), 200
+
+
+# Delete an Automation Rule
+@app.route("/rules/<int:id>", methods=["DELETE"])
+@jwt_required()
+def delete_rule(id):
+    user_id = get_jwt_identity()
+    rule = find_rule(user_id, id)
+    if not rule:
+        return jsonify({"error": "Rule not found"}), 404
+
+    # Soft delete: other workers drop the rule on their next sync; retention purges the row
+    rule.deleted_at = datetime.utcnow()
+    db.session.commit()
+    rule_engine.remove(current_shard(), id)
+    logging.info("Automation rule %s deleted by User ID: %s", id, user_id)
+    return jsonify({"message": "Rule deleted successfully"}), 200
 
 
 # Parental Control Settings Endpoint
@@ -395,11 +1089,11 @@ def update_parental_control_settings():
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     if not user:
-        logging.error(f"User with ID {user_id} not found.")
+        logging.error("User with ID %s not found.", user_id)
         return jsonify({"error": "User not found"}), 404
 
     data = request.get_json()
-    logging.info(f"Received data: {data}")
+    logging.info("Received data: %s", data)
     if not data:
         logging.error("Invalid input")
         return jsonify({"error": "Invalid input"}), 422
@@ -409,10 +1103,17 @@ def update_parental_control_settings():
         logging.error("Settings not provided")
         return jsonify({"error": "Settings not provided"}), 422
 
-    logging.info(f"Updating parental controls for user ID {user_id} with settings: {settings}")
+    try:
+        compile_policy(settings)
+    except PolicyError as e:
+        logging.error("Invalid parental control settings: %s", e)
+        return jsonify({"error": str(e)}), 422
+
+    logging.info("Updating parental controls for user ID %s with settings: %s", user_id, settings)
     user.set_parental_controls(settings)
     db.session.commit()
-    logging.info(f"Parental controls updated for user ID {user_id}")
+    user_cache.invalidate(user_id)
+    logging.info("Parental controls updated for user ID %s", user_id)
     return jsonify({"message": "Parental control settings updated successfully", "settings": settings}), 200
 
 # Get Parental Control Settings
@@ -420,71 +1121,168 @@ def update_parental_control_settings():
 @jwt_required()
 def get_parental_control():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = user_cache.get(user_id)
     if not user:
-        logging.error(f"User with ID {user_id} not found.")
+        logging.error("User with ID %s not found.", user_id)
         return jsonify({"error": "User not found"}), 404
 
     # Deserialize and return the parental controls as a dictionary
     settings = user.get_parental_controls()
 
-    logging.info(f"Parental controls retrieved for User ID: {user_id}")
+    logging.info("Parental controls retrieved for User ID: %s", user_id)
     return jsonify({"message": "Parental controls retrieved", "settings": settings})
 
 
+def household_member_ids(user_id):
+    """Ids of the users sharing ``user_id``'s household, ``user_id`` included."""
+    user = user_cache.get(user_id)
+    if user is None or user.household_id is None:
+        return [user_id]
+    return [member_id for member_id, in household_members_query(user.household_id)]
+
+
+def household_members_query(household_id):
+    """Query of the ids of ``household_id``'s members."""
+    return User.query.with_entities(User.id).filter_by(household_id=household_id)
+
+
+def household_devices(member_ids):
+    """SELECT of the ids of every device owned by ``member_ids``, for use in ``IN``."""
+    return MockIoTDevice.query.with_entities(MockIoTDevice.id).filter(MockIoTDevice.user_id.in_(member_ids)).statement
+
+
+def household_logs(member_ids):
+    """Query of the device logs of the household ``member_ids``, for ``logs_response``.
+
+    The device filter is on ``device_id + 0``, which no index can answer, so
+    the database walks the ``timestamp`` index newest first and checks each
+    row against the household's devices: a page stops after ``limit``
+    matches instead of sorting the household's whole history. With
+    households in their own shards nearly every row walked matches.
+    """
+    return DeviceLog.query.filter((DeviceLog.device_id + 0).in_(household_devices(member_ids)))
+
+
+def device_logs(device_id):
+    """Query of one device's logs, for ``logs_response``."""
+    return DeviceLog.query.filter_by(device_id=device_id)
+
+
+def log_rows(query, args):
+    """``LOG_FIELDS`` of the logs in ``query``, filtered, ordered and positioned by ``args``."""
+    return filter_logs(query.with_entities(*columns(DeviceLog, LOG_FIELDS)), DeviceLog, args)
+
+
+def logs_response(query):
+    """Return one keyset-paginated page of logs, or every match as NDJSON.
+
+    Query params: ``limit``, ``cursor`` (from the ``X-Next-Cursor`` header of
+    the previous page), ``since``/``until`` (ISO 8601), ``action`` (prefix),
+    ``layout=columns`` for the columnar page format and ``format=ndjson`` to
+    stream rows as they are read from the database.
+    """
+    try:
+        query = log_rows(query, request.args)
+        layout = response_layout(request.args)
+        stream = request.args.get("format") == "ndjson"
+        limit = page_size(request.args) if not stream or "limit" in request.args else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if stream:
+        if limit:
+            query = query.limit(limit)
+
+        def generate():
+            for row in query.yield_per(1000):
+                yield json.dumps(dict(zip(LOG_FIELDS, row))) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    rows = query.limit(limit + 1).all()
+    response = jsonify(serialize_rows(rows[:limit], LOG_FIELDS, layout))
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.timestamp, last.id)
+    return response, 200
+
+
 # Get All Device Logs
 @app.route("/logs", methods=["GET"])
 @jwt_required()
+@rate_limiter.limit("60/minute", per="user")
 def get_all_logs():
-    logs = DeviceLog.query.all()
-    logs_list = [
-        {
-            "id": log.id,
-            "action": log.action,
-            "timestamp": log.timestamp,
-            "device_id": log.device_id,
-        }
-        for log in logs
-    ]
-    logging.info("All device logs fetched")
-    return jsonify(logs_list), 200
+    response = logs_response(household_logs(household_member_ids(get_jwt_identity())))
+    logging.info("All device logs fetched for the household of User ID: %s", get_jwt_identity())
+    return response
+
+
+# Import Device Logs from a CSV or NDJSON upload
+@app.route("/logs/import", methods=["POST"])
+@jwt_required()
+@rate_limiter.limit("10/minute", per="user")
+def import_device_logs():
+    user_id = get_jwt_identity()
+    try:
+        fmt, lines = upload_lines()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    report = import_rows(
+        read_rows(lines, fmt),
+        log_validator(user_id),
+        DeviceLog,
+        chunk_size=app.config["BULK_IMPORT_CHUNK_SIZE"],
+    )
+    logging.info(
+        "Imported %s device logs (%s rejected) for User ID: %s", report["imported"], report["rejected"], user_id
+    )
+    return jsonify(report), 200
+
+
+# Export Device Logs as CSV or NDJSON
+@app.route("/logs/export", methods=["GET"])
+@jwt_required()
+@rate_limiter.limit("10/minute", per="user")
+def export_device_logs():
+    query = (
+        DeviceLog.query.with_entities(*(getattr(DeviceLog, field) for field in LOG_EXPORT_FIELDS))
+        .filter(DeviceLog.device_id.in_(household_devices(household_member_ids(get_jwt_identity()))))
+        .order_by(DeviceLog.id)
+    )
+    logging.info("Device logs exported for the household of User ID: %s", get_jwt_identity())
+    return export_response(query, LOG_EXPORT_FIELDS, "device_logs")
 
 
 # Get Logs for a Specific Device
 @app.route("/logs/<int:device_id>", methods=["GET"])
 @jwt_required()
+@rate_limiter.limit("60/minute", per="user")
 def get_device_logs(device_id):
     device = MockIoTDevice.query.get(device_id)
-    if not device:
-        logging.error(f"Device with ID {device_id} not found.")
+    if not device or device.user_id not in household_member_ids(get_jwt_identity()):
+        logging.error("Device with ID %s not found.", device_id)
         return jsonify({"error": "Device not found"}), 404
 
-    logs = DeviceLog.query.filter_by(device_id=device_id).all()
-    logs_list = [
-        {
-            "id": log.id,
-            "action": log.action,
-            "timestamp": log.timestamp,
-            "device_id": log.device_id,
-        }
-        for log in logs
-    ]
-    logging.info(f"Logs fetched for device ID: {device_id}")
-    return jsonify(logs_list), 200
+    response = logs_response(device_logs(device_id))
+    logging.info("Logs fetched for device ID: %s", device_id)
+    return response
 
 # Verify Password Endpoint
 @app.route('/verify-password', methods=['POST'])
 @jwt_required()
+@rate_limiter.limit("10/minute", per="user")
 def verify_password():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    # The hash is never cached: a password change elsewhere must take effect at once
+    pw_hash = db.session.query(User.password).filter_by(id=user_id).scalar()
+    if not pw_hash:
         return jsonify({"success": False, "message": "User not found"}), 404
 
     data = request.get_json()
     current_password = data.get('currentPassword')
 
-    if bcrypt.check_password_hash(user.password, current_password):
+    if password_hasher.check(pw_hash, current_password):
         return jsonify({"success": True}), 200
     else:
         return jsonify({"success": False, "message": "Incorrect password"}), 401
@@ -492,6 +1290,7 @@ def verify_password():
 # Update User Endpoint
 @app.route('/update-user', methods=['PUT'])
 @jwt_required()
+@rate_limiter.limit("10/minute", per="user")
 def update_user():
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
@@ -505,9 +1304,10 @@ def update_user():
     if username:
         user.username = username
     if password:
-        user.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        user.password = password_hasher.hash(password)
 
     db.session.commit()
+    user_cache.invalidate(user_id)
     return jsonify({"message": "User updated successfully"}), 200
 
 # Fetch Mock IoT Devices by Location
@@ -515,19 +1315,328 @@ def update_user():
 @jwt_required()
 def get_devices_by_location(location):
     user_id = get_jwt_identity()
-    devices = MockIoTDevice.query.filter_by(user_id=user_id, location=location).all()
-    devices_list = [
-        {
-            "id": device.id,
-            "name": device.name,
-            "device_type": device.device_type,
-            "status": device.status,
-            "last_action": device.last_action,
-            "location": device.location,
-        }
-        for device in devices
+    query = MockIoTDevice.query.filter_by(user_id=user_id, location=location)
+    logging.info("Devices fetched for User ID: %s at location: %s", user_id, location)
+    return cached_device_listing(user_id, ("location", location), query, DEVICE_FIELDS)
+
+
+def prewarm():
+    """Do once, before serving, the setup the first requests would otherwise pay for.
+
+    Configures the model mappers, builds every shard's engine (without
+    connecting) and signs and decodes a throwaway JWT. ``wsgi.create_app``
+    calls it in the server's master process, so preforked workers inherit
+    the result.
+    """
+    orm.configure_mappers()
+    with app.app_context():
+        for shard in shard_names(app.config):
+            db.get_engine(app, bind=shard_bind_key(shard))
+        decode_token(create_access_token(identity=0))
+
+
+@app.cli.group("sensors")
+def sensors_cli():
+    """Sensor data commands."""
+
+
+@sensors_cli.command("simulate")
+@click.option("--user-id", type=int, required=True, help="Owner of the simulated sensors.")
+@click.option("--rate", type=int, default=1000, show_default=True, help="Readings per second.")
+@click.option("--seconds", type=float, default=10.0, show_default=True)
+@click.option("--batch", type=int, default=500, show_default=True, help="Readings per insert.")
+@click.option("--url", help="Post to a running server (e.g. http://localhost:5000) instead of writing directly.")
+def simulate_sensors(user_id, rate, seconds, batch, url):
+    """Feed random-walk temperature readings for the user's devices through ingestion.
+
+    With --url each batch is a POST /sensors/readings, so load tests go through
+    the served path: validation, event streams and rules in the server.
+    """
+    with use_shard(shard_for_user(user_id)):
+        simulate_sensor_readings(user_id, rate, seconds, batch, url)
+
+
+def simulate_sensor_readings(user_id, rate, seconds, batch, url=None):
+    device_ids = [
+        device_id
+        for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id).filter_by(user_id=user_id)
     ]
-    logging.info(f"Devices fetched for User ID: {user_id} at location: {location}")
-    return jsonify(devices_list), 200
+    if not device_ids:
+        raise click.ClickException(f"User {user_id} has no devices")
+
+    def ingest(readings):
+        for reading in sensor_store.ingest(user_id, readings):
+            event_broker.publish(user_id, "temperature", temperature_payload(reading))
+        rule_engine.on_sensor_readings(user_id, readings)
+
+    send = post_readings(url, create_access_token(identity=user_id)) if url else ingest
+    simulator = SensorSimulator(device_ids)
+    started = time.monotonic()
+    sent = 0
+    while time.monotonic() - started < seconds:
+        try:
+            send(simulator.readings(batch))
+        except (OSError, RuntimeError) as e:
+            raise click.ClickException(str(e))
+        sent += batch
+        ahead = sent / rate - (time.monotonic() - started)
+        if ahead > 0:
+            time.sleep(ahead)
+    elapsed = time.monotonic() - started
+    click.echo(f"{sent} readings in {elapsed:.2f}s ({sent / elapsed:,.0f}/s)")
+
+
+@app.cli.group("rules")
+def rules_cli():
+    """Automation rule commands."""
+
+
+@rules_cli.command("scheduler")
+def rules_scheduler():
+    """Run time-triggered rules in the foreground; use instead of RULES_SCHEDULER_ENABLED."""
+    click.echo(f"{rule_engine.sync()} automation rules loaded")
+    scheduler = RuleScheduler(app, rule_engine)
+    scheduler.start()
+    try:
+        scheduler.join()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+@app.cli.group("retention")
+def retention_cli():
+    """Device log retention and compaction."""
+
+
+@retention_cli.command("run")
+@click.option("--chunk-size", type=int, default=5000, show_default=True, help="Rows deleted per transaction.")
+def retention_run(chunk_size):
+    """Compact old device logs into daily summaries and purge expired rows."""
+    from retention import run_retention
+
+    report = run_retention(app.config, chunk_size=chunk_size)
+    for name, count in report.items():
+        click.echo(f"{name}: {count}")
+
+
+@retention_cli.command("purge")
+@click.option("--days", type=int, required=True, help="Delete raw device logs older than this.")
+@click.option("--chunk-size", type=int, default=5000, show_default=True)
+def retention_purge(days, chunk_size):
+    """Delete raw device logs older than --days, in chunks."""
+    from datetime import datetime, timedelta
+    from retention import purge_before
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    purged = 0
+    for shard in shard_names(app.config):
+        with use_shard(shard):
+            purged += purge_before(DeviceLog, DeviceLog.timestamp, cutoff, chunk_size)
+    click.echo(f"device_log_purged: {purged}")
+
+
+@retention_cli.command("compact")
+@click.option("--days", type=int, required=True, help="Compact raw device logs older than this.")
+def retention_compact(days):
+    """Roll raw device logs older than --days into per-device daily summaries."""
+    from datetime import datetime, timedelta
+    from retention import compact_device_logs
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    compacted_days = rows = 0
+    for shard in shard_names(app.config):
+        with use_shard(shard):
+            shard_days, shard_rows = compact_device_logs(cutoff)
+        compacted_days += shard_days
+        rows += shard_rows
+    click.echo(f"device_log_compacted_days: {compacted_days}\ndevice_log_compacted_rows: {rows}")
+
+
+@app.cli.group("devices")
+def devices_cli():
+    """Bulk device and device log import/export."""
+
+
+def import_file(user_id, file, fmt, validate, model, chunk_size, on_chunk=None):
+    try:
+        fmt = detect_format(fmt, filename=file.name)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with use_shard(shard_for_user(user_id)):
+        report = import_rows(read_rows(file, fmt), validate, model, chunk_size=chunk_size, on_chunk=on_chunk)
+    click.echo(
+        f"imported: {report['imported']}\nrejected: {report['rejected']}\n"
+        f"seconds: {report['seconds']}\nrows_per_second: {report['rows_per_second']}"
+    )
+    for error in report["errors"]:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+
+
+@devices_cli.command("import")
+@click.argument("file", type=click.File("rb"))
+@click.option("--user-id", type=int, required=True, help="Owner of the imported devices.")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default=None, help="Defaults to the file extension.")
+@click.option("--chunk-size", type=int, default=5000, show_default=True, help="Rows per transaction.")
+def devices_import(file, user_id, fmt, chunk_size):
+    """Create devices from a CSV or NDJSON file (name, device_type, location, status); '-' reads stdin."""
+    import_file(
+        user_id, file, fmt, device_validator(user_id), MockIoTDevice, chunk_size, lambda: bump_device_version(user_id)
+    )
+
+
+@devices_cli.command("import-logs")
+@click.argument("file", type=click.File("rb"))
+@click.option("--user-id", type=int, required=True, help="Owner of the devices the logs belong to.")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default=None, help="Defaults to the file extension.")
+@click.option("--chunk-size", type=int, default=5000, show_default=True, help="Rows per transaction.")
+def devices_import_logs(file, user_id, fmt, chunk_size):
+    """Add device logs from a CSV or NDJSON file (device_id, action, timestamp); '-' reads stdin."""
+    import_file(user_id, file, fmt, log_validator(user_id), DeviceLog, chunk_size)
+
+
+@devices_cli.command("export")
+@click.option("--user-id", type=int, required=True)
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--output", type=click.File("w"), default="-", help="Defaults to stdout.")
+def devices_export(user_id, fmt, output):
+    """Write a user's devices as CSV or NDJSON."""
+    with use_shard(shard_for_user(user_id)):
+        query = (
+            MockIoTDevice.query.with_entities(*(getattr(MockIoTDevice, field) for field in DEVICE_EXPORT_FIELDS))
+            .filter_by(user_id=user_id)
+            .order_by(MockIoTDevice.id)
+        )
+        output.writelines(export_rows(query, DEVICE_EXPORT_FIELDS, fmt))
+
+
+@devices_cli.command("export-logs")
+@click.option("--user-id", type=int, required=True)
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default="csv", show_default=True)
+@click.option("--output", type=click.File("w"), default="-", help="Defaults to stdout.")
+def devices_export_logs(user_id, fmt, output):
+    """Write the device logs of a user's devices as CSV or NDJSON."""
+    with use_shard(shard_for_user(user_id)):
+        devices = MockIoTDevice.query.with_entities(MockIoTDevice.id).filter_by(user_id=user_id).statement
+        query = (
+            DeviceLog.query.with_entities(*(getattr(DeviceLog, field) for field in LOG_EXPORT_FIELDS))
+            .filter(DeviceLog.device_id.in_(devices))
+            .order_by(DeviceLog.id)
+        )
+        output.writelines(export_rows(query, LOG_EXPORT_FIELDS, fmt))
+
+
+@app.cli.group("households")
+def households_cli():
+    """Household and shard commands."""
+
+
+@households_cli.command("list")
+def households_list():
+    """Print every household with its shard and member count."""
+    rows = (
+        db.session.query(Household, db.func.count(User.id))
+        .outerjoin(User, User.household_id == Household.id)
+        .group_by(Household.id)
+        .order_by(Household.id)
+    )
+    for household, members in rows:
+        click.echo(f"{household.id}\t{household.shard}\t{members} members\t{household.name}")
+
+
+@households_cli.command("create")
+@click.option("--name", required=True)
+@click.option("--shard", default=None, help="Defaults to HOUSEHOLD_DEFAULT_SHARD.")
+def households_create(name, shard):
+    """Create an empty household."""
+    shard = shard or app.config["HOUSEHOLD_DEFAULT_SHARD"]
+    if shard not in shard_names(app.config):
+        raise click.ClickException(f"Unknown shard '{shard}'; add it to HOUSEHOLD_SHARDS")
+    household = Household(name=name, shard=shard)
+    db.session.add(household)
+    db.session.commit()
+    click.echo(f"Household {household.id} created on shard '{shard}'")
+
+
+@households_cli.command("assign")
+@click.option("--user-id", type=int, required=True)
+@click.option("--household-id", type=int, required=True)
+def households_assign(user_id, household_id):
+    """Make a user a member of another household on the same shard."""
+    user = User.query.get(user_id)
+    household = Household.query.get(household_id)
+    if user is None or household is None:
+        raise click.ClickException("User or household not found")
+    current = user.household.shard if user.household else DEFAULT_SHARD
+    if current != household.shard:
+        raise click.ClickException(
+            f"User {user_id}'s data is on shard '{current}'; move that household to '{household.shard}' first"
+        )
+    user.household = household
+    db.session.commit()
+    user_cache.invalidate(user_id)
+    click.echo(f"User {user_id} assigned to household {household_id}")
+
+
+@households_cli.command("init-shard")
+@click.argument("shard")
+def households_init_shard(shard):
+    """Create the household tables in a shard's database."""
+    from tenancy import create_shard_schema
+
+    if shard not in shard_names(app.config):
+        raise click.ClickException(f"Unknown shard '{shard}'; add it to HOUSEHOLD_SHARDS")
+    engine = create_shard_schema(db, app, shard)
+    click.echo(f"Household tables created in {engine.url!r}")
+
+
+@households_cli.command("move")
+@click.argument("household_id", type=int)
+@click.argument("shard")
+@click.option("--chunk-size", type=int, default=500, show_default=True, help="Devices copied per batch.")
+def households_move(household_id, shard, chunk_size):
+    """Move a household's devices, history and rules to another shard."""
+    from tenancy import move_household
+
+    household = Household.query.get(household_id)
+    if household is None:
+        raise click.ClickException(f"Household {household_id} not found")
+    if shard not in shard_names(app.config):
+        raise click.ClickException(f"Unknown shard '{shard}'; add it to HOUSEHOLD_SHARDS")
+    try:
+        copied = move_household(db, app, household, shard, chunk_size=chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for member in household.members:
+        user_cache.invalidate(member.id)
+    for name, count in copied.items():
+        click.echo(f"{name}: {count}")
+
+
+@app.cli.group("audit")
+def audit_cli():
+    """Schema and query checks."""
+
+
+@audit_cli.command("query-plans")
+@click.option("--database-url", default=None, help="Audit this database instead of a seeded in-memory SQLite one.")
+@click.option("--show-sql", is_flag=True, help="Also print each statement compiled for PostgreSQL.")
+def audit_query_plans(database_url, show_sql):
+    """Fail if any hot-path query needs a full table scan or an unindexed sort."""
+    from sqlalchemy.dialects import postgresql
+    from query_audit import audit, hot_queries
+
+    failed = 0
+    for name, plan, scans in audit(database_url):
+        failed += bool(scans)
+        click.echo(f"{'FULL SCAN' if scans else 'ok':<9} {name}")
+        for line in plan:
+            click.echo(f"          {line}")
+    if show_sql:
+        for name, statement in hot_queries():
+            click.echo(f"-- {name}\n{statement.compile(dialect=postgresql.dialect(), compile_kwargs={'render_postcompile': True})};")
+    if failed:
+        raise click.ClickException(f"{failed} hot queries fall back to a full scan or sort")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,53 @@
+"""Throughput of POST /mock/devices/control against one request per device.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_bulk_control --devices 200
+"""
+import argparse
+
+from benchmarks.common import bench_app, seed_user, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=200)
+    args = parser.parse_args()
+
+    app, db = bench_app()
+    from models import MockIoTDevice
+
+    user_id, headers = seed_user(app, db)
+    with app.app_context():
+        db.session.add_all(
+            MockIoTDevice(name=f"device-{i}", device_type="light", location="bench", user_id=user_id)
+            for i in range(args.devices)
+        )
+        db.session.commit()
+        device_ids = [device_id for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id)]
+
+    client = app.test_client()
+
+    def single_calls():
+        for device_id in device_ids:
+            client.post(f"/mock/devices/{device_id}/control", json={"action": "turn_on"}, headers=headers)
+
+    def bulk_call():
+        commands = [{"device_id": device_id, "action": "turn_off"} for device_id in device_ids]
+        client.post("/mock/devices/control", json={"commands": commands}, headers=headers)
+
+    def selector_call():
+        client.post(
+            "/mock/devices/control",
+            json={"selector": {"location": "bench"}, "action": "turn_on"},
+            headers=headers,
+        )
+
+    print(f"{'mode':<10} {'seconds':>9} {'devices/s':>11}")
+    for name, fn in (("single", single_calls), ("bulk", bulk_call), ("selector", selector_call)):
+        elapsed, _ = timed(fn)
+        print(f"{name:<10} {elapsed:>9.3f} {args.devices / elapsed:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
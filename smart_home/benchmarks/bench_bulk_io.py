@@ -0,0 +1,100 @@
+"""Bulk import and export of devices and device logs through the HTTP API.
+
+Writes ``--devices`` devices and ``--logs`` logs to CSV or NDJSON files,
+streams them into POST /mock/devices/import and POST /logs/import, then
+streams them back out of the export endpoints. Reports rows/s for each step
+and the process's peak RSS after each step, which should stay flat as the
+row counts grow.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_bulk_io --devices 1000000 --logs 1000000 --format csv
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import time
+
+from benchmarks.common import bench_app, seed_user, timed
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def write_file(path, fmt, fields, rows):
+    with open(path, "w", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(fields, row))) + "\n")
+
+
+def post_file(client, url, path, headers):
+    with open(path, "rb") as f:
+        response = client.post(
+            url, input_stream=f, content_length=os.path.getsize(path), headers=headers
+        )
+    assert response.status_code == 200, response.data[:500]
+    return response.json
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--logs", type=int, default=100_000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    args = parser.parse_args()
+
+    app, db = bench_app()
+    user_id, headers = seed_user(app, db)
+    client = app.test_client()
+    fmt = args.format
+    print(f"{'step':<16} {'rows':>10} {'seconds':>9} {'rows/s':>10} {'peak RSS MB':>12}")
+    print(f"{'start':<16} {'':>10} {'':>9} {'':>10} {peak_rss_mb():>12.0f}")
+
+    devices_path = os.path.abspath(f"devices.{fmt}")
+    write_file(
+        devices_path,
+        fmt,
+        ("name", "device_type", "location", "status"),
+        ((f"device-{i}", "light", f"room-{i % 50}", "off") for i in range(args.devices)),
+    )
+    elapsed, report = timed(post_file, client, f"/mock/devices/import?format={fmt}", devices_path, headers)
+    print(
+        f"{'import devices':<16} {report['imported']:>10,} {elapsed:>9.2f} "
+        f"{report['imported'] / elapsed:>10,.0f} {peak_rss_mb():>12.0f}"
+    )
+
+    logs_path = os.path.abspath(f"logs.{fmt}")
+    write_file(
+        logs_path,
+        fmt,
+        ("device_id", "action", "timestamp"),
+        ((i % args.devices + 1, "Device turned on", f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}") for i in range(args.logs)),
+    )
+    elapsed, report = timed(post_file, client, f"/logs/import?format={fmt}", logs_path, headers)
+    print(
+        f"{'import logs':<16} {report['imported']:>10,} {elapsed:>9.2f} "
+        f"{report['imported'] / elapsed:>10,.0f} {peak_rss_mb():>12.0f}"
+    )
+
+    for name, url, rows in (
+        ("export devices", f"/mock/devices/export?format={fmt}", args.devices),
+        ("export logs", f"/logs/export?format={fmt}", args.logs),
+    ):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<16} {rows:>10,} {elapsed:>9.2f} {rows / elapsed:>10,.0f} {peak_rss_mb():>12.0f}  ({size / 1e6:,.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Device commands through the async command queue and a simulated driver.
+
+Sends ``--requests`` POST /mock/devices/<id>/control calls spread over
+``--devices`` devices with the queue enabled and reports:
+
+- request latency: what the HTTP caller waits for (enqueue only);
+- completion: time until every command was acknowledged by the driver and
+  applied, against sending the same commands one at a time in the request
+  (measured on ``--inline`` commands and scaled up).
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_commands --latency-ms 50 --workers 8
+"""
+import argparse
+import os
+import time
+from collections import Counter
+
+from benchmarks.common import bench_app, percentiles, seed_user, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=int, default=50, help="Simulated device acknowledgement time.")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--inline", type=int, default=50, help="Commands sent inline for the comparison.")
+    args = parser.parse_args()
+
+    os.environ.update(
+        DEVICE_COMMAND_QUEUE_ENABLED="1",
+        DEVICE_COMMAND_WORKERS=str(args.workers),
+        DEVICE_COMMAND_RETRY_BACKOFF_MS="1",
+        SIMULATED_DRIVER_LATENCY_MS=str(args.latency_ms),
+        SIMULATED_DRIVER_FAILURE_RATE=str(args.failure_rate),
+    )
+    app, db = bench_app()
+    from app import command_queue
+    from command_queue import QueuedCommand
+    from device_control import control_devices
+    from drivers import DriverError
+    from models import DeviceCommand, MockIoTDevice
+
+    user_id, headers = seed_user(app, db)
+    with app.app_context():
+        db.session.add_all(
+            MockIoTDevice(name=f"device-{i}", device_type="light", location="bench", user_id=user_id)
+            for i in range(args.devices)
+        )
+        db.session.commit()
+        device_ids = [device_id for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id)]
+
+    client = app.test_client()
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.requests):
+        action = "turn_on" if i % 2 else "turn_off"
+        request_started = time.perf_counter()
+        client.post(f"/mock/devices/{device_ids[i % len(device_ids)]}/control", json={"action": action}, headers=headers)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+    submitted = time.perf_counter() - started
+    command_queue.flush()
+    completed = time.perf_counter() - started
+
+    with app.app_context():
+        outcomes = Counter(status for status, in DeviceCommand.query.with_entities(DeviceCommand.status))
+    print(f"request latency ms {percentiles(latencies)}; {args.requests / submitted:,.0f} requests/s")
+    print(
+        f"queued:  {completed:>8.2f}s until all applied, {args.requests / completed:>8,.0f} commands/s "
+        f"with {args.workers} workers ({dict(outcomes)})"
+    )
+
+    def inline():
+        with app.app_context():
+            for i in range(args.inline):
+                command = QueuedCommand(None, "default", user_id, device_ids[i % len(device_ids)], "turn_on", None, "api")
+                try:
+                    command_queue.driver.send(command, command_queue.timeout)
+                except DriverError:
+                    continue
+                control_devices(user_id, [(command.device_id, command.action, command.value)])
+
+    elapsed, _ = timed(inline)
+    print(
+        f"inline:  {elapsed * args.requests / args.inline:>8.2f}s estimated, "
+        f"{args.inline / elapsed:>8,.0f} commands/s, each request waiting on its device"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Device-control write throughput under concurrent clients, per config profile.
+
+Each profile runs in its own process (the profile is read at import time)
+against a fresh SQLite file served by a threaded WSGI server.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_concurrent_writes --clients 32 --seconds 10
+
+``--write-behind`` repeats each profile with DEVICE_LOG_WRITE_BEHIND on.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def run_profile(clients, seconds):
+    from benchmarks.bench_login_storm import request
+    from benchmarks.common import bench_app, percentiles, seed_user, serve
+
+    app, db = bench_app()
+    from models import MockIoTDevice
+
+    user_id, headers = seed_user(app, db)
+    with app.app_context():
+        devices = [
+            MockIoTDevice(name=f"device-{i}", device_type="light", location="bench", user_id=user_id)
+            for i in range(clients)
+        ]
+        db.session.add_all(devices)
+        db.session.commit()
+        device_ids = [device.id for device in devices]
+    base, server = serve(app)
+
+    stop = threading.Event()
+    statuses = Counter()
+    latencies = []
+
+    def client(device_id):
+        url = f"{base}/mock/devices/{device_id}/control"
+        action = "turn_on"
+        while not stop.is_set():
+            start = time.perf_counter()
+            statuses[request(url, "POST", {"action": action}, headers)] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+            action = "turn_off" if action == "turn_on" else "turn_on"
+
+    threads = [threading.Thread(target=client, args=(device_id,)) for device_id in device_ids]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    return {
+        "profile": os.environ.get("APP_PROFILE", "dev"),
+        "write_behind": app.config["DEVICE_LOG_WRITE_BEHIND"],
+        "writes_per_second": round(statuses[200] / seconds, 1),
+        "status": dict(statuses),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--profiles", nargs="+", default=["dev", "sqlite"])
+    parser.add_argument("--write-behind", action="store_true", help="Also run with write-behind device logs.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_profile(args.clients, args.seconds)))
+        return
+
+    results = []
+    variants = [(profile, write_behind) for profile in args.profiles for write_behind in ("0", "1")]
+    if not args.write_behind:
+        variants = [(profile, "0") for profile in args.profiles]
+    for profile, write_behind in variants:
+        env = {
+            **os.environ,
+            "APP_PROFILE": profile,
+            "DEVICE_LOG_WRITE_BEHIND": write_behind,
+            "PASSWORD_HASH_WORKERS": "0",
+        }
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_concurrent_writes", "--child",
+             "--clients", str(args.clients), "--seconds", str(args.seconds)],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Latency of GET /mock/devices/<id>/status for a short and a long log history.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_device_status --long 1000000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import bench_app, seed_user, timed
+
+
+def seed_logs(db, device_id, count, chunk=50_000):
+    from models import DeviceLog
+
+    start = datetime(2024, 1, 1)
+    for offset in range(0, count, chunk):
+        db.session.execute(
+            DeviceLog.__table__.insert(),
+            [
+                {"device_id": device_id, "action": "Device turned on", "timestamp": start + timedelta(seconds=i)}
+                for i in range(offset, min(offset + chunk, count))
+            ],
+        )
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--short", type=int, default=10)
+    parser.add_argument("--long", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    app, db = bench_app()
+    from models import MockIoTDevice
+
+    user_id, headers = seed_user(app, db)
+    device_ids = {}
+    with app.app_context():
+        for label, count in (("short", args.short), ("long", args.long)):
+            device = MockIoTDevice(name=label, device_type="light", location="bench", user_id=user_id)
+            db.session.add(device)
+            db.session.commit()
+            seed_logs(db, device.id, count)
+            device_ids[label] = (device.id, count)
+
+    client = app.test_client()
+    print(f"{'logs':>10} {'ms/request':>11}")
+    for label, (device_id, count) in device_ids.items():
+        url = f"/mock/devices/{device_id}/status"
+        client.get(url, headers=headers)
+        elapsed, _ = timed(lambda: [client.get(url, headers=headers) for _ in range(args.requests)])
+        print(f"{count:>10,} {elapsed / args.requests * 1000:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
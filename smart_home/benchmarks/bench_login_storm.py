@@ -0,0 +1,110 @@
+"""Latency of non-auth endpoints while /login is saturated.
+
+Starts the app on a local threaded WSGI server, or with ``--gunicorn
+WORKERSxTHREADS`` under gunicorn (``gunicorn.conf.py``, ``--worker-class``),
+measures GET / and GET /users/me alone, then again while ``--storm``
+clients hammer /login. Logins beyond PASSWORD_HASH_MAX_PENDING are shed
+with 503.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_login_storm --storm 64 --seconds 10
+    python -m benchmarks.bench_login_storm --gunicorn 1x8 --worker-class gthread
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from benchmarks.common import bench_app, percentiles, seed_user, serve
+
+
+def request(url, method="GET", body=None, headers=None):
+    """Send ``body`` as JSON, or as is if it is ``bytes``; returns the status code."""
+    data = body if body is None or isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, method=method, headers=dict(headers or {}))
+    if data is not None and not isinstance(body, bytes):
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def probe(url, headers, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        request(url, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+def storm(url, stop, outcomes):
+    while not stop.is_set():
+        outcomes[request(url, "POST", {"username": "bench", "password": "bench"})] += 1
+
+
+def run_phase(base, headers, seconds, storm_clients):
+    stop = threading.Event()
+    samples = {"/": [], "/users/me": []}
+    outcomes = Counter()
+    threads = [threading.Thread(target=probe, args=(base + path, headers, stop, samples[path])) for path in samples]
+    threads += [threading.Thread(target=storm, args=(base + "/login", stop, outcomes)) for _ in range(storm_clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {path: percentiles(values) for path, values in samples.items()}, dict(outcomes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--storm", type=int, default=64, help="Concurrent login clients.")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--gunicorn", metavar="WORKERSxTHREADS", help="Serve with gunicorn instead.")
+    parser.add_argument("--worker-class", default="gevent", choices=["gevent", "gthread"])
+    args = parser.parse_args()
+
+    if args.gunicorn:
+        # Read by config.py in the gunicorn workers as well as here
+        os.environ.update(WEB_WORKER_CLASS=args.worker_class, WEB_THREADS=args.gunicorn.lower().split("x")[1])
+    app, db = bench_app()
+    _, headers = seed_user(app, db)
+
+    from app import password_hasher
+
+    if args.gunicorn:
+        from benchmarks.bench_workers import free_port, start_server
+
+        workers, threads = (int(n) for n in args.gunicorn.lower().split("x"))
+        port = free_port()
+        server, _ = start_server(os.getcwd(), port, workers, threads, True, args.worker_class)
+        base = f"http://127.0.0.1:{port}"
+    else:
+        base, server = serve(app)
+        password_hasher.warm()
+
+    report = {"max_pending": app.config["PASSWORD_HASH_MAX_PENDING"]}
+    try:
+        for phase, clients in (("idle", 0), ("login_storm", args.storm)):
+            latency, logins = run_phase(base, headers, args.seconds, clients)
+            report[phase] = {"latency_ms": latency, "login_status": logins}
+    finally:
+        if args.gunicorn:
+            server.terminate()
+            server.wait()
+        else:
+            server.shutdown()
+        password_hasher.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Cost of shedding requests over their rate limit.
+
+Sends ``--requests`` POST /login calls with a wrong password from one
+client, with rate limiting on, and compares the latency of the 429s with
+the logins that got through to the database and bcrypt. Also reports the
+raw ``take`` rate of the in-memory bucket store over ``--keys`` clients.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_rate_limit --requests 500
+"""
+import argparse
+import os
+import time
+
+from benchmarks.common import bench_app, percentiles, seed_user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--takes", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    os.environ.update(RATE_LIMIT_ENABLED="1", RATE_LIMIT_DEFAULT="")
+    app, db = bench_app()
+    from ratelimit import MemoryBuckets
+
+    seed_user(app, db)
+    client = app.test_client()
+    latencies = {}
+    for _ in range(args.requests):
+        started = time.perf_counter()
+        response = client.post("/login", json={"username": "bench", "password": "wrong"})
+        latencies.setdefault(response.status_code, []).append((time.perf_counter() - started) * 1000)
+    for status, samples in sorted(latencies.items()):
+        print(f"status {status}: {len(samples):>6} requests, latency ms {percentiles(samples)}")
+
+    buckets = MemoryBuckets()
+    started = time.perf_counter()
+    for i in range(args.takes):
+        buckets.take(f"ip:{i % args.keys}", 10, 600)
+    elapsed = time.perf_counter() - started
+    print(f"memory buckets: {args.takes / elapsed:,.0f} takes/s over {len(buckets):,} keys")
+
+
+if __name__ == "__main__":
+    main()
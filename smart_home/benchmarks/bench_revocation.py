@@ -0,0 +1,47 @@
+"""Lookup latency of the in-memory JWT revocation index.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_revocation --sizes 10 1000 100000 10000000
+"""
+import argparse
+import itertools
+import time
+import uuid
+
+from revocation import RevocationIndex
+
+
+def measure(index, keys, rounds):
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        for key in keys:
+            index.is_revoked(key)
+    return (time.perf_counter_ns() - start) / (rounds * len(keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    # Never resync from the database during the benchmark.
+    index = RevocationIndex(sync_interval=float("inf"))
+    index._last_sync = time.monotonic()
+    exp = time.time() + 3600
+    probes_miss = [str(uuid.uuid4()) for _ in range(args.lookups)]
+
+    print(f"{'revoked':>12} {'hit ns/op':>10} {'miss ns/op':>11}")
+    for size in sorted(args.sizes):
+        while len(index) < size:
+            index.add(str(uuid.uuid4()), exp)
+        probes_hit = list(itertools.islice(index._expiry, args.lookups))
+        hit = measure(index, probes_hit, args.rounds)
+        miss = measure(index, probes_miss, args.rounds)
+        print(f"{size:>12,} {hit:>10.0f} {miss:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Automation rule evaluation with many rules and a high event rate.
+
+Indexes ``--rules`` rules spread over ``--users`` users (a mix of sensor,
+device and time triggers) and measures:
+
+- evaluation only: sensor readings and device changes per second through
+  ``RuleEngine`` with a no-op dispatch, against a linear scan of every rule;
+- end to end: POST /sensors/readings batches through the Flask test client,
+  with the rules stored in the database and matching actions dispatched.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_rules --rules 100000 --events 200000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from benchmarks.common import bench_app, percentiles, seed_user, timed
+
+KINDS = ("temperature", "humidity")
+
+
+def rule_rows(count, users, devices_per_user, rng):
+    """Synthetic ``AutomationRule``-shaped rows; user ``u`` owns devices ``u*k+1 .. u*k+k``."""
+    rows = []
+    now = datetime.utcnow()
+    for i in range(1, count + 1):
+        user_id = rng.randrange(users) + 1
+        device_id = (user_id - 1) * devices_per_user + rng.randrange(devices_per_user) + 1
+        trigger = rng.random()
+        row = dict(
+            id=i,
+            user_id=user_id,
+            name=f"rule-{i}",
+            enabled=True,
+            trigger_type="sensor",
+            trigger_device_id=None,
+            trigger_kind=None,
+            trigger_operator=None,
+            trigger_value=None,
+            trigger_status=None,
+            trigger_time=None,
+            timezone=None,
+            action="turn_on",
+            action_value=None,
+            target_device_id=device_id,
+            target_location=None,
+            target_device_type=None,
+            created_at=now,
+            updated_at=now,
+            deleted_at=None,
+        )
+        if trigger < 0.7:
+            row.update(
+                trigger_kind=rng.choice(KINDS),
+                trigger_operator=rng.choice((">", "<")),
+                trigger_value=rng.uniform(15, 30),
+                trigger_device_id=device_id if rng.random() < 0.5 else None,
+            )
+        elif trigger < 0.9:
+            row.update(trigger_type="device", trigger_device_id=device_id, trigger_status=rng.choice(("on", "off")))
+        else:
+            row.update(trigger_type="time", trigger_time=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}")
+        rows.append(row)
+    return rows
+
+
+def linear_scan(rules, user_id, reading):
+    """What evaluation costs without an index: test every rule against the event."""
+    return [
+        rule
+        for rule in rules
+        if rule.trigger_type == "sensor"
+        and rule.user_id == user_id
+        and rule.kind == reading["kind"]
+        and rule.device_id in (None, reading["device_id"])
+        and rule.compare(reading["value"], rule.threshold)
+    ]
+
+
+def bench_evaluation(app, rows, args, rng):
+    from rules import Rule, RuleEngine
+
+    engine = RuleEngine(dispatch=lambda fired: None, sync_interval=float("inf"))
+    with app.app_context():
+        engine.sync()  # Empty table; marks the index as loaded
+    elapsed, _ = timed(lambda: [engine.add(Rule(SimpleNamespace(**row))) for row in rows])
+    print(f"indexed {len(engine):,} rules in {elapsed:.2f}s")
+
+    events = []
+    for _ in range(args.events):
+        user_id = rng.randrange(args.users) + 1
+        device_id = (user_id - 1) * args.devices_per_user + rng.randrange(args.devices_per_user) + 1
+        events.append((user_id, {"device_id": device_id, "kind": rng.choice(KINDS), "value": rng.uniform(10, 35)}))
+
+    fired = 0
+    started = time.perf_counter()
+    for user_id, reading in events:
+        fired += len(engine.on_sensor_readings(user_id, [reading]))
+    elapsed = time.perf_counter() - started
+    print(f"sensor events:  {args.events / elapsed:>12,.0f}/s indexed ({fired:,} rules fired)")
+
+    started = time.perf_counter()
+    for user_id, reading in events:
+        engine.on_device_changes(user_id, [(reading["device_id"], "on" if reading["value"] > 22 else "off")])
+    elapsed = time.perf_counter() - started
+    print(f"device events:  {args.events / elapsed:>12,.0f}/s indexed")
+
+    elapsed, _ = timed(engine.on_minute, datetime(2024, 1, 1, 22, 0, tzinfo=timezone.utc))
+    print(f"minute tick:    {elapsed * 1000:>12.3f} ms")
+
+    rules = list(engine._rules.values())
+    sample = events[: max(1, args.events // 1000)]
+    elapsed, _ = timed(lambda: [linear_scan(rules, user_id, reading) for user_id, reading in sample])
+    print(f"sensor events:  {len(sample) / elapsed:>12,.0f}/s linear scan")
+
+
+def bench_end_to_end(app, db, rows, args, rng):
+    from app import rule_engine
+    from models import AutomationRule, MockIoTDevice, User
+
+    user_id, headers = seed_user(app, db, username="owner")
+    with app.app_context():
+        db.session.execute(
+            User.__table__.insert(),
+            [{"id": uid, "username": f"user-{uid}", "password": "x"} for uid in range(2, args.users + 1)],
+        )
+        db.session.execute(
+            MockIoTDevice.__table__.insert(),
+            [
+                {
+                    "id": device_id,
+                    "name": f"device-{device_id}",
+                    "device_type": "sensor",
+                    "location": "bench",
+                    "user_id": (device_id - 1) // args.devices_per_user + 1,
+                }
+                for device_id in range(1, args.users * args.devices_per_user + 1)
+            ],
+        )
+        for offset in range(0, len(rows), 50_000):
+            db.session.execute(AutomationRule.__table__.insert(), rows[offset : offset + 50_000])
+        db.session.commit()
+        elapsed, loaded = timed(rule_engine.sync)
+    print(f"loaded {loaded:,} rules from the database in {elapsed:.2f}s")
+
+    client = app.test_client()
+    device_ids = list(range(1, args.devices_per_user + 1))  # The owner's devices
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        body = {
+            "readings": [
+                {"device_id": rng.choice(device_ids), "kind": rng.choice(KINDS), "value": rng.uniform(10, 35)}
+                for _ in range(args.batch)
+            ]
+        }
+        request_started = time.perf_counter()
+        client.post("/sensors/readings", json=body, headers=headers)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+    elapsed = time.perf_counter() - started
+    print(
+        f"end to end:     {args.requests * args.batch / elapsed:>12,.0f} readings/s "
+        f"in batches of {args.batch}, latency ms {percentiles(latencies)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--devices-per-user", type=int, default=20)
+    parser.add_argument("--events", type=int, default=200_000, help="Events for the evaluation-only run.")
+    parser.add_argument("--requests", type=int, default=500, help="POST /sensors/readings calls end to end.")
+    parser.add_argument("--batch", type=int, default=50, help="Readings per request end to end.")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    app, db = bench_app()
+    rows = rule_rows(args.rules, args.users, args.devices_per_user, rng)
+    bench_evaluation(app, rows, args, rng)
+    bench_end_to_end(app, db, rows, args, rng)
+
+
+if __name__ == "__main__":
+    main()
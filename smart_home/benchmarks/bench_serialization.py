@@ -0,0 +1,94 @@
+"""Cost of turning ``--rows`` device log rows into a JSON response body.
+
+Seeds the logs once, then times each way of serializing them, split into
+fetching the rows, building the payload and encoding it:
+
+- ``orm / flask``: full ``DeviceLog`` instances, dicts built by hand and
+  Flask's own encoder (how the handlers used to work)
+- ``tuples``: only the needed columns as rows, ``serialize_rows`` records
+- ``columns``: the same rows in the columnar layout (``?layout=columns``)
+
+the last two through ``serializers.json_encoder`` with the stdlib and, when
+installed, orjson.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_serialization --rows 100000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from flask import json
+from flask.json import JSONEncoder
+
+from benchmarks.common import bench_app, seed_user, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs per case.")
+    parser.add_argument("--datetime-format", choices=("http", "iso"), default="http")
+    args = parser.parse_args()
+
+    app, db = bench_app()
+    from models import DeviceLog, MockIoTDevice
+    from serializers import LOG_FIELDS, columns, json_encoder, orjson, serialize_rows
+
+    user_id, _ = seed_user(app, db)
+    with app.app_context():
+        device = MockIoTDevice(name="bench", device_type="light", location="bench", user_id=user_id)
+        db.session.add(device)
+        db.session.commit()
+        start = datetime(2024, 1, 1)
+        db.session.bulk_insert_mappings(
+            DeviceLog,
+            (
+                {"device_id": device.id, "action": "Device turned on", "timestamp": start + timedelta(seconds=i)}
+                for i in range(args.rows)
+            ),
+        )
+        db.session.commit()
+
+    def orm():
+        logs = DeviceLog.query.all()
+        return lambda: [
+            {"id": log.id, "action": log.action, "timestamp": log.timestamp, "device_id": log.device_id}
+            for log in logs
+        ]
+
+    def tuples(layout):
+        def fetch():
+            rows = DeviceLog.query.with_entities(*columns(DeviceLog, LOG_FIELDS)).all()
+            return lambda: serialize_rows(rows, LOG_FIELDS, layout)
+
+        return fetch
+
+    backends = ["stdlib"] + (["orjson"] if orjson is not None else [])
+    cases = [("orm / flask", orm, JSONEncoder)] + [
+        (f"{name} / {backend}", fetch, json_encoder(backend, args.datetime_format))
+        for name, fetch in (("tuples", tuples("records")), ("columns", tuples("columns")))
+        for backend in backends
+    ]
+    print(f"{args.rows:,} log rows, {args.datetime_format} datetimes, best of {args.repeat}")
+    print(f"{'case':<20} {'fetch ms':>9} {'build ms':>9} {'encode ms':>10} {'total ms':>9} {'MB':>6}")
+    for name, fetch, encoder in cases:
+        app.json_encoder = encoder
+        best = None
+        for _ in range(args.repeat):
+            with app.app_context():
+                fetched, build = timed(fetch)
+                built, payload = timed(build)
+                encoded, body = timed(json.dumps, payload)
+                db.session.remove()
+            run = (fetched, built, encoded)
+            if best is None or sum(run) < sum(best):
+                best = run
+        print(
+            f"{name:<20} {best[0] * 1000:>9.1f} {best[1] * 1000:>9.1f} "
+            f"{best[2] * 1000:>10.1f} {sum(best) * 1000:>9.1f} {len(body) / 1e6:>6.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
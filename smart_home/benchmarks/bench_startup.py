@@ -0,0 +1,120 @@
+"""Cold start: importing the app, serving the first request, and where the import time goes.
+
+Each scenario runs in a fresh interpreter, ``--runs`` times (interleaved,
+so drift in the machine's load hits them alike), and the median is
+reported:
+
+- ``import app``: what every worker, CLI command and test run pays first
+- ``import app + prewarm``: the same plus ``app.prewarm()``, which a
+  preloading server pays once, before it forks
+- ``first request``: a login and a JWT-protected device listing through
+  the test client right after the import, against a database seeded
+  beforehand, which pays for whatever was left to initialize lazily
+- ``first request, prewarmed``: the same after ``app.prewarm()``
+
+then a ``-X importtime`` breakdown of the import by top-level package
+(cumulative microseconds, as the interpreter reports them).
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_startup --runs 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+from benchmarks.common import SMART_HOME
+
+SETUP = f"""
+import os, sys, time
+sys.path.insert(0, {SMART_HOME!r})
+started = time.perf_counter()
+"""
+
+SEED = """
+import app
+with app.app.app_context():
+    app.db.create_all()
+    app.db.session.add(app.User(username="bench", password=app.password_hasher.hash("bench")))
+    app.db.session.commit()
+"""
+
+FIRST_REQUEST = """
+started = time.perf_counter()
+client = app.app.test_client()
+token = client.post("/login", json={"username": "bench", "password": "bench"}).json["access_token"]
+assert client.get("/mock/devices", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+print((time.perf_counter() - started) * 1000)
+"""
+
+SCENARIOS = {
+    "import app": "import app\nprint((time.perf_counter() - started) * 1000)",
+    "import app + prewarm": "import app\napp.prewarm()\nprint((time.perf_counter() - started) * 1000)",
+    "first request": "import app\n" + FIRST_REQUEST,
+    "first request, prewarmed": "import app\napp.prewarm()\n" + FIRST_REQUEST,
+}
+
+
+def run(code, env, cwd, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", SETUP + code],
+        env=env,
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_breakdown(env, cwd, runs, top):
+    """Median cumulative import time per top-level package imported by ``app``."""
+    samples = defaultdict(list)
+    for _ in range(runs):
+        stderr = run("import app", env, cwd, "-X", "importtime").stderr
+        totals = defaultdict(int)
+        for line in stderr.splitlines()[1:]:
+            try:
+                _, cumulative, name = line.split("|")
+            except ValueError:
+                continue
+            if name.startswith("   ") and not name.startswith("    "):  # Imported directly by app
+                totals[name.strip().split(".")[0]] += int(cumulative)
+        for package, micros in totals.items():
+            samples[package].append(micros)
+    medians = {package: statistics.median(values) for package, values in samples.items()}
+    return sorted(medians.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--top", type=int, default=15, help="Packages to list in the import breakdown.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="smart_home_bench_")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        PASSWORD_HASH_WORKERS="0",
+        BCRYPT_LOG_ROUNDS=os.environ.get("BCRYPT_LOG_ROUNDS", "4"),
+    )
+    run(SEED, env, workdir)
+    samples = defaultdict(list)
+    for _ in range(args.runs):
+        for name, code in SCENARIOS.items():
+            samples[name].append(float(run(code, env, workdir).stdout.split()[-1]))
+    print(f"{'scenario':<26} {'median ms':>10} {'min ms':>8}")
+    for name in SCENARIOS:
+        print(f"{name:<26} {statistics.median(samples[name]):>10.1f} {min(samples[name]):>8.1f}")
+
+    print(f"\nimport app, cumulative ms by package (median of {args.runs}):")
+    for package, micros in import_breakdown(env, workdir, args.runs, args.top):
+        print(f"  {package:<24} {micros / 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
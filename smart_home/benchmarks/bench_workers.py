@@ -0,0 +1,194 @@
+"""Worker and thread sizing for gunicorn (``gunicorn.conf.py``).
+
+Seeds a scratch database, then for each ``WORKERSxTHREADS`` in ``--grid``
+starts gunicorn on it and drives a read-heavy mix of device listings, log
+pages, device status and device control from ``--clients`` keep-alive
+client threads for ``--seconds``. Reports requests/s, latency percentiles,
+errors, the boot time until the first response and the memory of the
+workers (proportional set size, so code shared through preloading is
+counted once).
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.bench_workers --grid 1x1 1x4 1x8 2x4 4x4 --clients 16
+
+Pick the smallest grid point within a few percent of the best requests/s
+whose p95 is acceptable; more workers cost memory, more threads cost
+latency once the CPU is saturated. ``THREADS`` only applies with
+``--worker-class gthread``; gevent workers take any number of
+connections. With ``--no-preload`` each worker imports the app itself,
+which shows what preloading saves in boot time and memory.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+
+from benchmarks.common import SMART_HOME, bench_app, percentiles, seed_user
+
+MIX = (
+    # (weight, method, path template, body)
+    (4, "GET", "/mock/devices", None),
+    (3, "GET", "/logs?limit=50", None),
+    (2, "GET", "/mock/devices/{device_id}/status", None),
+    (1, "POST", "/mock/devices/{device_id}/control", {"action": "turn_on"}),
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_pss_mb(master_pid):
+    """Summed proportional set size of the master's children, from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            pids = f.read().split()
+    except OSError:
+        return None
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+def start_server(workdir, port, workers, threads, preload, worker_class):
+    env = dict(
+        os.environ,
+        WEB_BIND=f"127.0.0.1:{port}",
+        WEB_CONCURRENCY=str(workers),
+        WEB_THREADS=str(threads),
+        WEB_WORKER_CLASS=worker_class,
+        WEB_PRELOAD="1" if preload else "0",
+        LOG_FILE=os.path.join(workdir, f"app-{port}.log"),
+    )
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        ["gunicorn", "-c", os.path.join(SMART_HOME, "gunicorn.conf.py"), "--pythonpath", SMART_HOME],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=open(os.path.join(workdir, f"gunicorn-{port}.log"), "w"),
+    )
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {server.returncode}, see gunicorn-{port}.log in {workdir}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return server, time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+
+
+def drive(port, headers, device_ids, clients, seconds):
+    weights = [weight for weight, *_ in MIX]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            _, method, path, body = rng.choices(MIX, weights)[0]
+            path = path.format(device_id=rng.choice(device_ids))
+            started = time.perf_counter()
+            try:
+                conn.request(
+                    method,
+                    path,
+                    body=json.dumps(body) if body is not None else None,
+                    headers={**headers, "Content-Type": "application/json"},
+                )
+                response = conn.getresponse()
+                response.read()
+                failed += response.status >= 500
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append((time.perf_counter() - started) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--grid", nargs="+", default=["1x1", "1x4", "1x8", "2x4"], metavar="WORKERSxTHREADS")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--logs", type=int, default=20_000)
+    parser.add_argument("--worker-class", default="gevent", choices=["gevent", "gthread"])
+    parser.add_argument("--no-preload", action="store_true")
+    args = parser.parse_args()
+
+    app, db = bench_app()
+    workdir = os.getcwd()
+    from models import DeviceLog, MockIoTDevice
+
+    user_id, headers = seed_user(app, db)
+    with app.app_context():
+        db.session.add_all(
+            MockIoTDevice(name=f"device-{i}", device_type="light", location=f"room-{i % 10}", user_id=user_id)
+            for i in range(args.devices)
+        )
+        db.session.commit()
+        device_ids = [device_id for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id)]
+        db.session.bulk_insert_mappings(
+            DeviceLog, ({"device_id": device_ids[i % len(device_ids)], "action": "Device turned on"} for i in range(args.logs))
+        )
+        db.session.commit()
+    db.engine.dispose()
+
+    print(
+        f"{args.worker_class} workers, {args.clients} clients, {args.seconds:.0f}s per point, "
+        f"preload {'off' if args.no_preload else 'on'}"
+    )
+    print(f"{'grid':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'boot s':>7} {'PSS MB':>7}")
+    for point in args.grid:
+        workers, threads = (int(n) for n in point.lower().split("x"))
+        port = free_port()
+        server, boot = start_server(workdir, port, workers, threads, not args.no_preload, args.worker_class)
+        try:
+            drive(port, headers, device_ids, args.clients, 1)  # Warm up every worker's caches
+            latencies, errors = drive(port, headers, device_ids, args.clients, args.seconds)
+            pss = worker_pss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        p = percentiles(latencies)
+        print(
+            f"{point:<6} {len(latencies) / args.seconds:>8,.0f} {p['p50']:>8.1f} {p['p95']:>8.1f} {p['p99']:>8.1f} "
+            f"{errors:>7} {boot:>7.2f} {pss if pss is not None else float('nan'):>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Shared setup for benchmarks that drive the Flask app.
+
+Importing ``app`` configures file logging relative to the working directory
+and binds the database from ``DATABASE_URL``, so ``bench_app`` switches to a
+scratch directory with its own SQLite file before the first import.
+"""
+import os
+import sys
+import tempfile
+import time
+
+SMART_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_app(database_url=None):
+    """Import the app against a fresh scratch database; returns ``(app, db)``."""
+    workdir = tempfile.mkdtemp(prefix="smart_home_bench_")
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.chdir(workdir)
+    if SMART_HOME not in sys.path:
+        sys.path.insert(0, SMART_HOME)
+
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+    return app, db
+
+
+def seed_user(app, db, username="bench", password="bench", is_admin=False):
+    """Create a user and return Authorization headers for it."""
+    from app import password_hasher
+    from flask_jwt_extended import create_access_token
+    from models import User
+
+    with app.app_context():
+        user = User(
+            username=username,
+            password=password_hasher.hash(password),
+            is_admin=is_admin,
+        )
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.id)
+        return user.id, {"Authorization": f"Bearer {token}"}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Nearest-rank percentiles of ``samples``, in the same unit."""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    return {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3) for p in points}
+
+
+def serve(app, host="127.0.0.1", port=0):
+    """Run ``app`` on a threaded Werkzeug server in the background; returns its base URL."""
+    import threading
+
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}", server
@@ -0,0 +1,468 @@
+"""Per-endpoint throughput and latency for the whole API, with baseline comparison.
+
+Seeds synthetic users, devices and logs at ``--scale`` (or explicit
+``--users/--devices/--logs``), then drives every route through the Flask
+test client (``--transport client``) or a threaded WSGI server with
+``--concurrency`` clients (``--transport wsgi``). The report is JSON: one
+entry per endpoint with requests, errors, requests/s and p50/p95/p99 in ms.
+
+Run from ``smart_home/``:
+
+    python -m benchmarks.suite --scale 100k --output report.json
+    python -m benchmarks.suite --scale 100k --save-baseline baseline.json
+    python -m benchmarks.suite --scale 100k --baseline baseline.json
+
+With ``--baseline`` the run exits with status 1 when an endpoint's p95 grows,
+or its throughput drops, by more than ``--tolerance`` (a fraction) against the
+stored report. Baselines are only comparable on the same machine and scale.
+
+Every route in the app's URL map must have an entry in ``endpoints`` or
+``UNMEASURED``; the suite exits before seeding when one is missing. GET
+/metrics answers 404 unless ``INSTRUMENTATION_ENABLED`` is set.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.common import bench_app, percentiles, seed_user, serve
+
+SCALES = {
+    # name: (users, devices, logs)
+    "1k": (10, 100, 1_000),
+    "100k": (100, 1_000, 100_000),
+    "1m": (1_000, 10_000, 1_000_000),
+    "10m": (10_000, 100_000, 10_000_000),
+}
+LOCATIONS = ("kitchen", "bedroom", "living_room", "bathroom")
+DEVICE_TYPES = ("light", "thermostat", "fan", "door")
+SEED_CHUNK = 50_000
+IMPORT_ROWS = 100
+UNMEASURED = {
+    "GET /events": "a long-lived stream, not a request/response",
+    "GET /static/<filename>": "Flask's static files",
+}
+
+
+class Context:
+    """What endpoint specs need to build requests: ids, tokens and a way to create rows."""
+
+    def __init__(self, app, db, user_id, headers, device_ids):
+        self.app = app
+        self.db = db
+        self.user_id = user_id
+        self.headers = headers
+        self.device_ids = device_ids
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def unique(self):
+        with self._lock:
+            return next(self._counter)
+
+    def device_id(self):
+        return self.device_ids[self.unique() % len(self.device_ids)]
+
+    def token_headers(self, refresh=False):
+        from flask_jwt_extended import create_access_token, create_refresh_token
+
+        create = create_refresh_token if refresh else create_access_token
+        with self.app.app_context():
+            return {"Authorization": f"Bearer {create(identity=self.user_id)}"}
+
+    def new_device(self):
+        from models import MockIoTDevice
+
+        with self.app.app_context():
+            result = self.db.session.execute(
+                MockIoTDevice.__table__.insert(),
+                {"name": "scratch", "device_type": "light", "location": "scratch", "user_id": self.user_id},
+            )
+            self.db.session.commit()
+            return result.inserted_primary_key[0]
+
+    def new_user(self):
+        from models import User
+
+        with self.app.app_context():
+            result = self.db.session.execute(
+                User.__table__.insert(), {"username": f"scratch-{self.unique()}", "password": "x"}
+            )
+            self.db.session.commit()
+            return result.inserted_primary_key[0]
+
+    def new_rule(self):
+        from models import AutomationRule
+
+        with self.app.app_context():
+            # A time rule: nothing the other endpoints do can fire it
+            result = self.db.session.execute(
+                AutomationRule.__table__.insert(),
+                {
+                    "user_id": self.user_id,
+                    "name": "scratch",
+                    "trigger_type": "time",
+                    "trigger_time": "03:00",
+                    "action": "turn_on",
+                    "target_device_id": self.device_id(),
+                },
+            )
+            self.db.session.commit()
+            return result.inserted_primary_key[0]
+
+    def new_command(self):
+        from models import DeviceCommand
+
+        with self.app.app_context():
+            result = self.db.session.execute(
+                DeviceCommand.__table__.insert(),
+                {"user_id": self.user_id, "device_id": self.device_id(), "action": "turn_on", "status": "succeeded"},
+            )
+            self.db.session.commit()
+            return result.inserted_primary_key[0]
+
+    def ndjson(self, rows):
+        """``(body, headers)`` of an NDJSON upload of ``rows``."""
+        body = "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+        return body, {**self.headers, "Content-Type": "application/x-ndjson"}
+
+
+def route_names(app):
+    """``"METHOD /path"`` of every route in ``app.url_map``, named like ``endpoints`` (no converters)."""
+    names = set()
+    for rule in app.url_map.iter_rules():
+        path = re.sub(r"<(?:[^<>:]+:)?([^<>:]+)>", r"<\1>", rule.rule)
+        names.update(f"{method} {path}" for method in rule.methods - {"HEAD", "OPTIONS"})
+    return names
+
+
+def missing_routes(app, ctx):
+    """Routes that have neither an ``endpoints`` entry nor an ``UNMEASURED`` reason."""
+    return sorted(route_names(app) - {name for name, _, _ in endpoints(ctx)} - set(UNMEASURED))
+
+
+def endpoints(ctx):
+    """``(name, weight, prepare)`` per route; ``prepare()`` returns ``(method, path, body, headers)``.
+
+    ``prepare`` runs outside the timed section, so rows a request consumes
+    (a device to delete, a token to revoke) are created there. ``weight``
+    scales the request count down for routes bound by password hashing.
+    """
+    auth = ctx.headers
+    bench_login = {"username": "bench", "password": "bench"}
+    time_rule = {"name": "bench", "trigger": {"type": "time", "at": "03:00"}}  # Never fires during the run
+
+    def import_devices():
+        rows = ({"name": "imported", "device_type": "light", "location": "scratch"} for _ in range(IMPORT_ROWS))
+        return ("POST", "/mock/devices/import?format=ndjson", *ctx.ndjson(rows))
+
+    def import_logs():
+        device_id = ctx.device_id()
+        rows = ({"device_id": device_id, "action": "Device turned on"} for _ in range(IMPORT_ROWS))
+        return ("POST", "/logs/import?format=ndjson", *ctx.ndjson(rows))
+
+    return [
+        ("GET /", 1, lambda: ("GET", "/", None, {})),
+        ("GET /metrics", 1, lambda: ("GET", "/metrics", None, {})),
+        ("POST /register", 0.1, lambda: ("POST", "/register", {"username": f"reg-{ctx.unique()}", "password": "bench"}, {})),
+        ("POST /login", 0.1, lambda: ("POST", "/login", bench_login, {})),
+        ("POST /refresh", 1, lambda: ("POST", "/refresh", None, ctx.token_headers(refresh=True))),
+        ("DELETE /logout", 1, lambda: ("DELETE", "/logout", None, ctx.token_headers())),
+        ("GET /users", 0.2, lambda: ("GET", "/users", None, auth)),
+        ("GET /users/<id>", 1, lambda: ("GET", f"/users/{ctx.user_id}", None, auth)),
+        ("GET /users/me", 1, lambda: ("GET", "/users/me", None, auth)),
+        ("PUT /users/<id>", 1, lambda: ("PUT", f"/users/{ctx.user_id}", {"username": "bench"}, auth)),
+        ("DELETE /users/<id>", 1, lambda: ("DELETE", f"/users/{ctx.new_user()}", None, auth)),
+        ("PUT /update-user", 1, lambda: ("PUT", "/update-user", {"username": "bench"}, auth)),
+        ("POST /verify-password", 0.1, lambda: ("POST", "/verify-password", {"currentPassword": "bench"}, auth)),
+        (
+            "POST /parental-control/settings",
+            1,
+            lambda: ("POST", "/parental-control/settings", {"settings": {"screen_time": ctx.unique() % 240}}, auth),
+        ),
+        ("GET /parental-control/settings", 1, lambda: ("GET", "/parental-control/settings", None, auth)),
+        (
+            "POST /mock/devices",
+            1,
+            lambda: ("POST", "/mock/devices", {"name": "bench", "device_type": "light", "location": "bench"}, auth),
+        ),
+        ("GET /mock/devices", 1, lambda: ("GET", "/mock/devices", None, auth)),
+        ("GET /mock/devices/location/<location>", 1, lambda: ("GET", "/mock/devices/location/kitchen", None, auth)),
+        (
+            "POST /mock/devices/<id>/control",
+            1,
+            lambda: ("POST", f"/mock/devices/{ctx.device_id()}/control", {"action": "turn_on"}, auth),
+        ),
+        (
+            "POST /mock/devices/control",
+            1,
+            lambda: (
+                "POST",
+                "/mock/devices/control",
+                {"commands": [{"device_id": ctx.device_id(), "action": "turn_off"} for _ in range(10)]},
+                auth,
+            ),
+        ),
+        ("GET /mock/devices/<id>/status", 1, lambda: ("GET", f"/mock/devices/{ctx.device_id()}/status", None, auth)),
+        ("GET /commands/<id>", 1, lambda: ("GET", f"/commands/{ctx.new_command()}", None, auth)),
+        ("POST /mock/devices/import", 0.2, import_devices),
+        ("GET /mock/devices/export", 0.2, lambda: ("GET", "/mock/devices/export?format=ndjson", None, auth)),
+        (
+            "PUT /mock/devices/<id>",
+            1,
+            lambda: ("PUT", f"/mock/devices/{ctx.device_id()}", {"name": f"device-{ctx.unique()}"}, auth),
+        ),
+        ("DELETE /mock/devices/<id>", 1, lambda: ("DELETE", f"/mock/devices/{ctx.new_device()}", None, auth)),
+        (
+            "POST /sensors/readings",
+            1,
+            lambda: (
+                "POST",
+                "/sensors/readings",
+                {"readings": [{"device_id": ctx.device_id(), "value": 20 + ctx.unique() % 5} for _ in range(10)]},
+                auth,
+            ),
+        ),
+        ("GET /temperature", 1, lambda: ("GET", "/temperature", None, auth)),
+        ("GET /temperature/history", 1, lambda: ("GET", "/temperature/history", None, auth)),
+        (
+            "POST /rules",
+            1,
+            lambda: ("POST", "/rules", {**time_rule, "action": {"action": "turn_on", "device_id": ctx.device_id()}}, auth),
+        ),
+        ("GET /rules", 1, lambda: ("GET", "/rules", None, auth)),
+        ("PUT /rules/<id>", 1, lambda: ("PUT", f"/rules/{ctx.new_rule()}", {"enabled": False}, auth)),
+        ("DELETE /rules/<id>", 1, lambda: ("DELETE", f"/rules/{ctx.new_rule()}", None, auth)),
+        ("GET /logs", 1, lambda: ("GET", "/logs", None, auth)),
+        ("GET /logs/<device_id>", 1, lambda: ("GET", f"/logs/{ctx.device_id()}", None, auth)),
+        ("POST /logs/import", 0.2, import_logs),
+        ("GET /logs/export", 0.2, lambda: ("GET", "/logs/export?format=ndjson", None, auth)),
+    ]
+
+
+def seed(app, db, users, devices, logs):
+    """Bulk-insert synthetic data; the bench user (an admin) owns every ``users``-th device."""
+    from app import password_hasher
+    from models import DeviceLog, MockIoTDevice, User
+
+    user_id, headers = seed_user(app, db, is_admin=True)
+    with app.app_context():
+        password = password_hasher.hash("bench")
+        db.session.execute(
+            User.__table__.insert(),
+            [{"username": f"user-{i}", "password": password} for i in range(1, users)],
+        )
+        user_ids = [user_id] + [uid for uid, in db.session.query(User.id).filter(User.id != user_id)]
+        for offset in range(0, devices, SEED_CHUNK):
+            db.session.execute(
+                MockIoTDevice.__table__.insert(),
+                [
+                    {
+                        "name": f"device-{i}",
+                        "device_type": DEVICE_TYPES[i % len(DEVICE_TYPES)],
+                        "location": LOCATIONS[i % len(LOCATIONS)],
+                        "user_id": user_ids[i % len(user_ids)],
+                    }
+                    for i in range(offset, min(offset + SEED_CHUNK, devices))
+                ],
+            )
+        all_devices = [device_id for device_id, in db.session.query(MockIoTDevice.id).order_by(MockIoTDevice.id)]
+        own_devices = [
+            device_id
+            for device_id, in db.session.query(MockIoTDevice.id).filter_by(user_id=user_id).order_by(MockIoTDevice.id)
+        ]
+        start = datetime.utcnow() - timedelta(seconds=logs)
+        for offset in range(0, logs, SEED_CHUNK):
+            db.session.execute(
+                DeviceLog.__table__.insert(),
+                [
+                    {
+                        "device_id": all_devices[i % len(all_devices)],
+                        "action": "Device turned on" if i % 2 else "Device turned off",
+                        "timestamp": start + timedelta(seconds=i),
+                    }
+                    for i in range(offset, min(offset + SEED_CHUNK, logs))
+                ],
+            )
+        db.session.commit()
+    return Context(app, db, user_id, headers, own_devices)
+
+
+class ClientTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def __call__(self, method, path, body, headers):
+        if isinstance(body, bytes):
+            response = self.client.open(path, method=method, data=body, headers=headers)
+        else:
+            response = self.client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class WsgiTransport:
+    def __init__(self, app):
+        from benchmarks.bench_login_storm import request
+
+        self._request = request
+        self.base, self.server = serve(app)
+
+    def __call__(self, method, path, body, headers):
+        return self._request(self.base + path, method, body, headers)
+
+    def close(self):
+        self.server.shutdown()
+
+
+def measure(transport, prepare, count, concurrency):
+    """Issue ``count`` requests from ``concurrency`` threads; returns the endpoint's report entry."""
+    latencies = []
+    statuses = Counter()
+    remaining = itertools.count(count, -1)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if next(remaining) <= 0:
+                    return
+            method, path, body, headers = prepare()
+            start = time.perf_counter()
+            status = transport(method, path, body, headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    errors = sum(n for status, n in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status": {str(status): n for status, n in sorted(statuses.items())},
+        "requests_per_second": round(len(latencies) / wall, 1) if wall else None,
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Return one line per endpoint that regressed against ``baseline``."""
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        old_p95, new_p95 = previous["latency_ms"]["p95"], current["latency_ms"]["p95"]
+        if old_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old_p95} ms -> {new_p95} ms")
+        old_rps, new_rps = previous["requests_per_second"], current["requests_per_second"]
+        if old_rps and new_rps < old_rps * (1 - tolerance):
+            regressions.append(f"{name}: {old_rps} req/s -> {new_rps} req/s")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: {previous['errors']} errors -> {current['errors']} errors")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--users", type=int, help="Override the scale's user count.")
+    parser.add_argument("--devices", type=int, help="Override the scale's device count.")
+    parser.add_argument("--logs", type=int, help="Override the scale's log count.")
+    parser.add_argument("--transport", choices=("client", "wsgi"), default="client")
+    parser.add_argument("--concurrency", type=int, default=1, help="Client threads (wsgi transport).")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint before weighting.")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per endpoint.")
+    parser.add_argument("--only", nargs="+", metavar="SUBSTRING", help="Only endpoints whose name contains one.")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    parser.add_argument("--baseline", help="Fail if this run regressed against the report in this file.")
+    parser.add_argument("--save-baseline", help="Also write the report here, as the next baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    users, devices, logs = SCALES[args.scale]
+    users, devices, logs = args.users or users, args.devices or devices, args.logs or logs
+    concurrency = args.concurrency if args.transport == "wsgi" else 1
+
+    os.environ["RATE_LIMIT_ENABLED"] = "0"  # The suite drives each route far past its limits
+    app, db = bench_app()
+    missing = missing_routes(app, Context(app, db, None, {}, []))
+    if missing:
+        sys.exit(f"Routes the suite does not measure: {', '.join(missing)}; add them to endpoints() or UNMEASURED")
+    seed_started = time.perf_counter()
+    ctx = seed(app, db, users, devices, logs)
+    seed_seconds = time.perf_counter() - seed_started
+    transport = ClientTransport(app) if args.transport == "client" else WsgiTransport(app)
+
+    from app import password_hasher
+
+    password_hasher.warm()
+    results = {}
+    for name, weight, prepare in endpoints(ctx):
+        if args.only and not any(part in name for part in args.only):
+            continue
+        measure(transport, prepare, args.warmup, 1)
+        results[name] = measure(transport, prepare, max(1, int(args.requests * weight)), concurrency)
+        print(
+            f"{name:<40} {results[name]['requests_per_second']:>9} req/s  p95 {results[name]['latency_ms']['p95']} ms",
+            file=sys.stderr,
+        )
+    transport.close()
+    password_hasher.shutdown()
+
+    report = {
+        "meta": {
+            "scale": {"users": users, "devices": devices, "logs": logs},
+            "transport": args.transport,
+            "concurrency": concurrency,
+            "requests": args.requests,
+            "seed_seconds": round(seed_seconds, 1),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "profile": os.environ.get("APP_PROFILE", "dev"),
+        },
+        "endpoints": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("scale", "transport", "concurrency"):
+            if baseline["meta"][key] != report["meta"][key]:
+                print(f"Warning: baseline was recorded with a different {key}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
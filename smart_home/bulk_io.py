@@ -0,0 +1,264 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+FORMATS = ("csv", "ndjson")
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+DEVICE_EXPORT_FIELDS = ("id", "name", "device_type", "location", "status", "last_action")
+LOG_EXPORT_FIELDS = ("id", "device_id", "action", "timestamp")
+MAX_REPORTED_ERRORS = 100
+EXPORT_CHUNK_BYTES = 64 * 1024
+NOT_UTF8 = "Line is not valid UTF-8"
+
+
+def detect_format(requested=None, mimetype=None, filename=None):
+    """The upload format from ``?format=``, else the content type, else the file extension."""
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown format '{requested}', expected one of {', '.join(FORMATS)}")
+        return requested
+    for fmt, known in MIMETYPES.items():
+        if mimetype == known:
+            return fmt
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    raise ValueError("Could not tell the format; pass ?format=csv or ?format=ndjson")
+
+
+class Unreadable:
+    """Stands in for a row that could not be parsed; validation rejects it with ``reason``."""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+
+class _Lines:
+    """Decoded lines, counted as they are read; ``invalid`` notes lines that were not UTF-8."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self.number = 0
+        self.invalid = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        self.number += 1
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                line = line.decode("utf-8", "replace")
+                self.invalid = True
+        return line.lstrip("\ufeff") if self.number == 1 else line
+
+
+def read_rows(lines, fmt):
+    """Yield ``(line_number, row)`` from an iterable of lines, parsing as they are read.
+
+    CSV needs a header row. A line that is not valid UTF-8, is not valid
+    JSON, or has a CSV field over the ``csv`` module's size limit yields an
+    ``Unreadable`` row, so validation rejects it with its line number.
+    """
+    text = _Lines(lines)
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        while True:
+            try:
+                reader.fieldnames  # read the header first, so its bytes do not taint the first row
+                text.invalid = False
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield text.number, Unreadable(f"Unreadable CSV: {e}")
+                continue
+            yield reader.line_num, Unreadable(NOT_UTF8) if text.invalid else row
+    for line in text:
+        if text.invalid:
+            text.invalid = False
+            yield text.number, Unreadable(NOT_UTF8)
+        elif line.strip():
+            try:
+                yield text.number, json.loads(line)
+            except ValueError:
+                yield text.number, Unreadable("Malformed JSON")
+
+
+def _object(row):
+    if isinstance(row, Unreadable):
+        raise ValueError(row.reason)
+    if not isinstance(row, dict):
+        raise ValueError("Expected a JSON object")
+    return row
+
+
+def _text(row, key, limit, required=True):
+    value = row.get(key)
+    if value is None or str(value).strip() == "":
+        if required:
+            raise ValueError(f"{key} is required")
+        return None
+    value = str(value).strip()
+    if len(value) > limit:
+        raise ValueError(f"{key} is longer than {limit} characters")
+    return value
+
+
+def _device_mapping(row, user_id):
+    row = _object(row)
+    status = _text(row, "status", 10, required=False) or "off"
+    if status not in ("on", "off"):
+        raise ValueError("status must be 'on' or 'off'")
+    return {
+        "name": _text(row, "name", 150),
+        "device_type": _text(row, "device_type", 50),
+        "location": _text(row, "location", 50),
+        "status": status,
+        "user_id": user_id,
+    }
+
+
+def _log_mapping(row):
+    row = _object(row)
+    try:
+        device_id = int(row.get("device_id"))
+    except (TypeError, ValueError):
+        raise ValueError("device_id must be an integer")
+    timestamp = _text(row, "timestamp", 40, required=False)
+    if timestamp is None:
+        timestamp = datetime.utcnow()
+    else:
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            raise ValueError("timestamp must be ISO 8601")
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return {"device_id": device_id, "action": _text(row, "action", 50), "timestamp": timestamp}
+
+
+def device_validator(user_id):
+    """Chunk validator for ``import_rows`` creating devices owned by ``user_id``."""
+
+    def validate(chunk):
+        mappings = []
+        errors = []
+        for line, row in chunk:
+            try:
+                mappings.append(_device_mapping(row, user_id))
+            except ValueError as e:
+                errors.append((line, str(e)))
+        return mappings, errors
+
+    return validate
+
+
+def log_validator(user_id):
+    """Chunk validator for ``import_rows`` adding logs to devices owned by ``user_id``.
+
+    Ownership is checked with one query per chunk.
+    """
+    from models import MockIoTDevice
+
+    def validate(chunk):
+        parsed = []
+        errors = []
+        for line, row in chunk:
+            try:
+                parsed.append((line, _log_mapping(row)))
+            except ValueError as e:
+                errors.append((line, str(e)))
+        device_ids = {mapping["device_id"] for _, mapping in parsed}
+        owned = set()
+        if device_ids:
+            owned = {
+                device_id
+                for device_id, in MockIoTDevice.query.with_entities(MockIoTDevice.id).filter(
+                    MockIoTDevice.user_id == user_id, MockIoTDevice.id.in_(device_ids)
+                )
+            }
+        mappings = []
+        for line, mapping in parsed:
+            if mapping["device_id"] in owned:
+                mappings.append(mapping)
+            else:
+                errors.append((line, "Device not found"))
+        errors.sort()
+        return mappings, errors
+
+    return validate
+
+
+def import_rows(rows, validate, model, chunk_size=5000, on_chunk=None):
+    """Validate and insert ``(line, row)`` pairs with one transaction per chunk; returns a report dict.
+
+    Only ``chunk_size`` rows are held at a time, so memory stays flat
+    however large the upload is. Rejected rows are counted and the first
+    ``MAX_REPORTED_ERRORS`` are reported with their line numbers. Chunks
+    already committed stay if a later one fails. ``on_chunk`` runs in each
+    chunk's transaction, before the commit.
+    """
+    from extensions import db
+
+    report = {"imported": 0, "rejected": 0, "errors": []}
+    started = time.perf_counter()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        mappings, errors = validate(chunk)
+        if mappings:
+            db.session.bulk_insert_mappings(model, mappings)
+            if on_chunk is not None:
+                on_chunk()
+            db.session.commit()
+        report["imported"] += len(mappings)
+        report["rejected"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report["errors"])
+        report["errors"].extend({"line": line, "error": error} for line, error in errors[:room])
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["imported"] / elapsed) if elapsed else None
+    return report
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_rows(query, fields, fmt, batch_size=1000):
+    """Yield ``query``'s rows as CSV (with a header) or NDJSON text in ~64 KiB chunks.
+
+    Rows are fetched ``batch_size`` at a time, so memory does not grow with the export.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(fields)
+    for row in query.yield_per(batch_size):
+        if writer is not None:
+            writer.writerow([_csv_value(value) for value in row])
+        else:
+            buffer.write(json.dumps(dict(zip(fields, map(_json_value, row)))) + "\n")
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,247 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from drivers import DriverError, DriverTimeout
+from tenancy import current_shard, use_shard
+
+QueuedCommand = namedtuple("QueuedCommand", "id shard user_id device_id action value source")
+
+
+class CommandQueueFull(Exception):
+    """Raised when ``max_pending`` commands are already waiting for a driver."""
+
+
+def command_to_dict(row):
+    return {
+        "id": row.id,
+        "device_id": row.device_id,
+        "action": row.action,
+        "value": row.value,
+        "source": row.source,
+        "status": row.status,
+        "attempts": row.attempts,
+        "error": row.error,
+        "created_at": row.created_at,
+        "completed_at": row.completed_at,
+    }
+
+
+class CommandQueue:
+    """Sends device commands through a driver on background worker threads.
+
+    ``submit`` records commands as ``DeviceCommand`` rows and returns their
+    ids at once; the workers then deliver them:
+
+    - ordering: every command for a device goes to the same worker, which
+      handles them one at a time, so a device sees commands in submit order
+      (retries included)
+    - timeouts: each attempt gets ``timeout`` seconds, passed to the driver;
+      a driver still running after that is left behind and the attempt fails
+      with ``DriverTimeout``. An abandoned send may still reach the device
+      later, so drivers should give up on their own within ``timeout``
+    - retries: ``DriverError`` (timeouts included) is retried up to
+      ``max_attempts`` times, waiting ``retry_backoff`` seconds doubled per retry;
+      any other exception fails the command immediately
+    - status: ``queued``, then ``retrying`` after a failed attempt, then
+      ``succeeded`` or ``failed``
+    - outcome: once the driver acknowledges, the device state, log entry and
+      ``succeeded`` status are committed together through ``control_devices``;
+      otherwise the command is marked ``failed`` with the error. Either way
+      ``on_complete(command, result)`` is called with a ``control_devices``-style result.
+
+    Queues live in memory and are started on first use in each process. A
+    command whose process exits before it is sent stays ``queued``.
+    """
+
+    def __init__(
+        self,
+        app,
+        driver,
+        on_complete=None,
+        workers=4,
+        max_pending=10000,
+        timeout=2.0,
+        max_attempts=3,
+        retry_backoff=0.1,
+        log_buffer=None,
+    ):
+        self.app = app
+        self.driver = driver
+        self.on_complete = on_complete
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.log_buffer = log_buffer
+        self._queues = []
+        self._threads = []
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._queues = [queue.Queue() for _ in range(self.workers)]
+            self._threads = [
+                threading.Thread(target=self._run, args=(commands,), name=f"device-command-{i}", daemon=True)
+                for i, commands in enumerate(self._queues)
+            ]
+            self._pid = os.getpid()
+            self._pending = 0
+            for thread in self._threads:
+                thread.start()
+            atexit.register(self.close)
+
+    def submit(self, user_id, commands, source="api"):
+        """Queue ``(device_id, action, value)`` commands for the user's devices; returns their ids.
+
+        Commands are expected to be validated already (``device_control.command_error``).
+        Raises ``CommandQueueFull`` without recording anything if they do not all fit.
+        """
+        from extensions import db
+        from models import DeviceCommand
+
+        self._ensure_started()
+        with self._lock:
+            if self._pending + len(commands) > self.max_pending:
+                raise CommandQueueFull()
+            self._pending += len(commands)
+        try:
+            rows = [
+                DeviceCommand(
+                    user_id=user_id,
+                    device_id=device_id,
+                    action=action,
+                    value=None if value is None else str(value),
+                    source=source,
+                )
+                for device_id, action, value in commands
+            ]
+            db.session.add_all(rows)
+            db.session.flush()
+            queued = [
+                QueuedCommand(row.id, current_shard(), user_id, row.device_id, row.action, row.value, source)
+                for row in rows
+            ]
+            db.session.commit()
+        except Exception:
+            with self._lock:
+                self._pending -= len(commands)
+            raise
+        for command in queued:
+            self._queues[hash((command.shard, command.device_id)) % self.workers].put(command)
+        return [command.id for command in queued]
+
+    def pending(self):
+        """Commands submitted by this process and not finished yet."""
+        return self._pending if self._pid == os.getpid() else 0
+
+    def flush(self):
+        """Block until every command submitted so far has finished."""
+        if self._pid == os.getpid():
+            for commands in self._queues:
+                commands.join()
+
+    def close(self):
+        if not self._threads or self._pid != os.getpid():
+            return
+        for commands in self._queues:
+            commands.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _run(self, commands):
+        while True:
+            command = commands.get()
+            if command is None:
+                commands.task_done()
+                return
+            try:
+                with self.app.app_context(), use_shard(command.shard):
+                    self._process(command)
+            except Exception:
+                logging.exception("Failed to process device command %s", command.id)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                commands.task_done()
+
+    def _send(self, command):
+        """Call ``driver.send`` on a thread of its own and wait at most ``timeout`` for it."""
+        outcome = []
+
+        def send():
+            try:
+                self.driver.send(command, self.timeout)
+                outcome.append(None)
+            except Exception as e:
+                outcome.append(e)
+
+        sender = threading.Thread(target=send, name=f"device-command-send-{command.id}", daemon=True)
+        sender.start()
+        sender.join(self.timeout)
+        if not outcome:
+            raise DriverTimeout(f"Device {command.device_id} did not respond within {self.timeout * 1000:.0f} ms")
+        if outcome[0] is not None:
+            raise outcome[0]
+
+    def _process(self, command):
+        from extensions import db
+        from device_control import control_devices
+        from models import DeviceCommand
+
+        def mark(**values):
+            DeviceCommand.query.filter_by(id=command.id).update(values, synchronize_session=False)
+
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self._send(command)
+                error = None
+                break
+            except DriverError as e:
+                error = str(e)
+                logging.warning(
+                    "Device command %s attempt %s/%s failed: %s", command.id, attempt, self.max_attempts, error
+                )
+            except Exception as e:
+                logging.exception("Driver failed on device command %s", command.id)
+                error = f"Driver error: {e}"
+                break
+            if attempt < self.max_attempts:
+                # Only retries are recorded on their own; the common path commits once
+                mark(status="retrying", attempts=attempt, error=error[:200])
+                db.session.commit()
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+
+        result = None
+        if error is None:
+            # Committed by control_devices together with the new device state
+            mark(status="succeeded", attempts=attempt, error=None, completed_at=datetime.utcnow())
+            result = control_devices(
+                command.user_id,
+                [(command.device_id, command.action, command.value)],
+                log_buffer=self.log_buffer,
+            )[0]
+            if "error" in result:  # The device was removed while the command was in flight
+                db.session.rollback()
+                error = result["error"]
+        if error is not None:
+            mark(status="failed", attempts=attempt, error=error[:200], completed_at=datetime.utcnow())
+            db.session.commit()
+            result = {"device_id": command.device_id, "error": error}
+
+        if self.on_complete is not None:
+            self.on_complete(command, result)
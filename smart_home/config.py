@@ -1,6 +1,138 @@
 import os
 
+from sqlalchemy.pool import QueuePool
+
+
+def _shards(value):
+    """Parse ``name=url;name=url`` (HOUSEHOLD_SHARDS) into a dict."""
+    shards = {}
+    for entry in (value or '').split(';'):
+        if entry.strip():
+            name, _, url = entry.partition('=')
+            shards[name.strip()] = url.strip()
+    return shards
+
+
+def _hash_max_pending():
+    """Default PASSWORD_HASH_MAX_PENDING for the gunicorn worker class (``gunicorn.conf.py``).
+
+    A gthread worker blocks one of its ``WEB_THREADS`` on every hash, so all
+    but two may wait on one and other routes keep a thread; a gevent worker
+    only parks a greenlet.
+    """
+    if (os.environ.get('WEB_WORKER_CLASS') or 'gevent') == 'gthread':
+        return max(int(os.environ.get('WEB_THREADS') or 8) - 2, 1)
+    return 64
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'super_secret_key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///database.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JWT_REVOCATION_SYNC_SECONDS = int(os.environ.get('JWT_REVOCATION_SYNC_SECONDS') or 5)
+    USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS') or 30)
+    EVENT_STREAM_QUEUE_SIZE = int(os.environ.get('EVENT_STREAM_QUEUE_SIZE') or 100)
+    EVENT_STREAM_KEEPALIVE_SECONDS = int(os.environ.get('EVENT_STREAM_KEEPALIVE_SECONDS') or 15)
+    EVENT_BROKER_BACKEND = os.environ.get('EVENT_BROKER_BACKEND') or 'memory'  # 'memory' (per process), 'redis' or 'module:factory'
+    EVENT_BROKER_REDIS_URL = os.environ.get('EVENT_BROKER_REDIS_URL') or 'redis://localhost:6379/0'
+    SENSOR_LATEST_TTL_SECONDS = int(os.environ.get('SENSOR_LATEST_TTL_SECONDS') or 5)  # How stale another process's readings may look
+    DEVICE_STATUS_LOG_LIMIT = int(os.environ.get('DEVICE_STATUS_LOG_LIMIT') or 10)
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS') or 12)
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None  # None: one per CPU, 0: inline
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or _hash_max_pending())
+    LOG_FILE = os.environ.get('LOG_FILE') or 'app.log'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES') or 10 * 1024 * 1024)  # 0: never rotate (the default under gunicorn)
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT') or 5)
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE') or 10000)
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES') or 16 * 1024 * 1024)
+    DEVICE_LOG_WRITE_BEHIND = os.environ.get('DEVICE_LOG_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+    DEVICE_LOG_BATCH_SIZE = int(os.environ.get('DEVICE_LOG_BATCH_SIZE') or 500)
+    DEVICE_LOG_FLUSH_MS = int(os.environ.get('DEVICE_LOG_FLUSH_MS') or 200)
+    DEVICE_LOG_MAX_PENDING = int(os.environ.get('DEVICE_LOG_MAX_PENDING') or 10000)
+    DEVICE_LOG_COMPACT_AFTER_DAYS = int(os.environ.get('DEVICE_LOG_COMPACT_AFTER_DAYS') or 30)  # 0 disables
+    DEVICE_LOG_RETENTION_DAYS = int(os.environ.get('DEVICE_LOG_RETENTION_DAYS') or 365)  # 0 keeps forever
+    SENSOR_READING_RETENTION_DAYS = int(os.environ.get('SENSOR_READING_RETENTION_DAYS') or 90)  # 0 keeps forever
+    RULES_SYNC_SECONDS = int(os.environ.get('RULES_SYNC_SECONDS') or 5)
+    RULES_SCHEDULER_ENABLED = os.environ.get('RULES_SCHEDULER_ENABLED', '').lower() in ('1', 'true', 'yes')  # Enable in one process only
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD') or 10)
+    PROFILE_SLOW_REQUEST_MS = int(os.environ.get('PROFILE_SLOW_REQUEST_MS') or 0)  # 0 disables the sampling profiler
+    PROFILE_SAMPLE_INTERVAL_MS = int(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS') or 5)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or 'profiles'
+    DEVICE_COMMAND_QUEUE_ENABLED = os.environ.get('DEVICE_COMMAND_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes')  # Control returns 202 and a command id
+    DEVICE_COMMAND_WORKERS = int(os.environ.get('DEVICE_COMMAND_WORKERS') or 4)
+    DEVICE_COMMAND_MAX_PENDING = int(os.environ.get('DEVICE_COMMAND_MAX_PENDING') or 10000)
+    DEVICE_COMMAND_TIMEOUT_MS = int(os.environ.get('DEVICE_COMMAND_TIMEOUT_MS') or 2000)  # Per attempt
+    DEVICE_COMMAND_MAX_ATTEMPTS = int(os.environ.get('DEVICE_COMMAND_MAX_ATTEMPTS') or 3)
+    DEVICE_COMMAND_RETRY_BACKOFF_MS = int(os.environ.get('DEVICE_COMMAND_RETRY_BACKOFF_MS') or 100)  # Doubled per retry
+    DEVICE_COMMAND_RETENTION_DAYS = int(os.environ.get('DEVICE_COMMAND_RETENTION_DAYS') or 7)  # 0 keeps forever
+    BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE') or 5000)  # Rows validated and committed together
+    JSON_BACKEND = os.environ.get('JSON_BACKEND') or 'auto'  # 'orjson', 'stdlib', or 'auto' for orjson when installed
+    JSON_DATETIME_FORMAT = os.environ.get('JSON_DATETIME_FORMAT') or 'http'  # 'http' (RFC 822, Flask's) or 'iso'
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '').lower() in ('1', 'true', 'yes')  # Over the limit returns 429
+    RATE_LIMIT_DEFAULT = os.environ.get('RATE_LIMIT_DEFAULT', '600/minute')  # Per IP on every request; empty disables
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND') or 'memory'  # 'memory' (per process), 'redis' or 'module:factory'
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL') or 'redis://localhost:6379/0'
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES') or 0)  # Proxies in front that set X-Forwarded-For; 0: none, use the peer address
+    DEVICE_DRIVER = os.environ.get('DEVICE_DRIVER') or 'simulated'  # A drivers.DRIVERS name or 'module:factory'
+    SIMULATED_DRIVER_LATENCY_MS = int(os.environ.get('SIMULATED_DRIVER_LATENCY_MS') or 50)
+    SIMULATED_DRIVER_JITTER_MS = int(os.environ.get('SIMULATED_DRIVER_JITTER_MS') or 0)
+    SIMULATED_DRIVER_FAILURE_RATE = float(os.environ.get('SIMULATED_DRIVER_FAILURE_RATE') or 0)
+    HOUSEHOLD_SHARDS = _shards(os.environ.get('HOUSEHOLD_SHARDS'))  # Extra databases for household data
+    HOUSEHOLD_DEFAULT_SHARD = os.environ.get('HOUSEHOLD_DEFAULT_SHARD') or 'default'  # Where new households go
+    SQLALCHEMY_BINDS = {f'shard:{name}': url for name, url in HOUSEHOLD_SHARDS.items()}
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLITE_PRAGMAS = {'busy_timeout': 5000, 'foreign_keys': 'ON'}  # Applied to every new SQLite connection
+
+
+class DevelopmentConfig(Config):
+    """Default profile: local SQLite file, SQLAlchemy's default pooling."""
+
+
+class SQLiteConfig(Config):
+    """Single-node SQLite: WAL so readers don't block the writer, pooled connections."""
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': QueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 8),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 24),
+        'pool_timeout': 30,
+        'connect_args': {'check_same_thread': False, 'timeout': 30},
+    }
+    SQLITE_PRAGMAS = {
+        'foreign_keys': 'ON',  # Needed for ON DELETE CASCADE
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 30000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,  # KiB
+        'temp_store': 'MEMORY',
+    }
+
+
+class PostgresConfig(Config):
+    """Pooled PostgreSQL; DATABASE_URL must point at the server."""
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+    SQLITE_PRAGMAS = {}
+
+
+PROFILES = {
+    'dev': DevelopmentConfig,
+    'sqlite': SQLiteConfig,
+    'postgres': PostgresConfig,
+}
+
+
+def get_config(name=None):
+    """Return the config class for ``name`` or the APP_PROFILE environment variable."""
+    name = name or os.environ.get('APP_PROFILE') or 'dev'
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown APP_PROFILE '{name}', expected one of {', '.join(PROFILES)}")
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+
+
+def install_sqlite_pragmas(pragmas):
+    """Run ``PRAGMA name = value`` for each entry on every new SQLite connection.
+
+    journal_mode=WAL is persistent in the database file; the others are
+    per-connection and must be set each time.
+    """
+    if not pragmas:
+        return
+
+    statements = [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+    @event.listens_for(Engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return set_sqlite_pragmas
+
+
+def install_fork_guard():
+    """Keep pooled connections from crossing into forked processes.
+
+    A server that imports the app and then forks workers would otherwise
+    hand the parent's open connections to every child, where concurrent use
+    of one socket or SQLite handle corrupts both sides. Each connection
+    remembers the process that opened it; checking it out in another process
+    discards it without closing it (the owner may still be using it) and
+    the pool opens a fresh one.
+    """
+
+    @event.listens_for(Engine, "connect")
+    def remember_pid(dbapi_connection, connection_record):
+        connection_record.info["pid"] = os.getpid()
+
+    @event.listens_for(Engine, "checkout")
+    def check_pid(dbapi_connection, connection_record, connection_proxy):
+        pid = os.getpid()
+        if connection_record.info["pid"] != pid:
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                f"Connection opened in process {connection_record.info['pid']}, checked out in {pid}"
+            )
+
+    return remember_pid, check_pid
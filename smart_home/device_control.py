@@ -0,0 +1,121 @@
+from datetime import datetime
+
+from sqlalchemy import case
+
+ACTIONS = ("turn_on", "turn_off", "adjust")
+MAX_BULK_COMMANDS = 1000
+MAX_ACTION_LENGTH = 50  # DeviceLog.action
+
+
+def resolve_action(action, value=None):
+    """Return ``(status, last_action)`` for a control action; status is None if unchanged.
+
+    ``last_action`` is cut to fit the device log, whatever ``value`` is.
+    """
+    if action == "turn_on":
+        return "on", "Device turned on"
+    if action == "turn_off":
+        return "off", "Device turned off"
+    if action == "adjust":
+        return None, f"Device adjusted to {value}"[:MAX_ACTION_LENGTH]
+    raise ValueError(f"Invalid action: {action}")
+
+
+def bump_device_version(user_id):
+    """Mark the user's cached device listings stale; call in the same transaction as the change."""
+    from models import User
+
+    User.query.filter_by(id=user_id).update(
+        {User.device_version: User.device_version + 1}, synchronize_session=False
+    )
+
+
+def load_devices(user_id, device_ids):
+    """``{device_id: (status, location, name, device_type)}`` for the user's devices among ``device_ids``."""
+    from models import MockIoTDevice
+
+    return {
+        device_id: (status, location, name, device_type)
+        for device_id, status, location, name, device_type in MockIoTDevice.query.with_entities(
+            MockIoTDevice.id,
+            MockIoTDevice.status,
+            MockIoTDevice.location,
+            MockIoTDevice.name,
+            MockIoTDevice.device_type,
+        )
+        .filter(MockIoTDevice.user_id == user_id, MockIoTDevice.id.in_(device_ids))
+        .all()
+    }
+
+
+def command_error(device, action, policy=None):
+    """Why a command cannot be applied to ``device`` (a ``load_devices`` value), or ``None``."""
+    if device is None:
+        return "Device not found"
+    if action not in ACTIONS:
+        return f"Invalid action: {action}"
+    _, _, name, device_type = device
+    return policy.check(name, device_type, action) if policy is not None else None
+
+
+def control_devices(user_id, commands, log_buffer=None, policy=None):
+    """Apply ``(device_id, action, value)`` commands to the user's devices in one transaction.
+
+    Commands that ``policy`` (parental controls) rejects fail individually.
+
+    All devices are read with one SELECT, changed with one UPDATE and logged
+    with one bulk INSERT, or handed to ``log_buffer`` after the commit when
+    write-behind logging is enabled. Returns a result dict per command, in order.
+    """
+    from extensions import db
+    from models import MockIoTDevice, DeviceLog
+
+    devices = load_devices(user_id, {device_id for device_id, _, _ in commands})
+
+    results = []
+    final_state = {}  # device_id -> (status, last_action); later commands win
+    for device_id, action, value in commands:
+        error = command_error(devices.get(device_id), action, policy)
+        if error:
+            results.append({"device_id": device_id, "error": error})
+            continue
+        status, last_action = resolve_action(action, value)
+        current_status, location, _, _ = devices[device_id]
+        status = status or final_state.get(device_id, (current_status, None))[0]
+        final_state[device_id] = (status, last_action)
+        results.append(
+            {
+                "device_id": device_id,
+                "status": status,
+                "last_action": last_action,
+                "location": location,
+            }
+        )
+
+    if final_state:
+        MockIoTDevice.query.filter(MockIoTDevice.id.in_(final_state)).update(
+            {
+                MockIoTDevice.status: case(
+                    {device_id: state[0] for device_id, state in final_state.items()},
+                    value=MockIoTDevice.id,
+                ),
+                MockIoTDevice.last_action: case(
+                    {device_id: state[1] for device_id, state in final_state.items()},
+                    value=MockIoTDevice.id,
+                ),
+            },
+            synchronize_session=False,
+        )
+        now = datetime.utcnow()
+        logs = [
+            {"device_id": r["device_id"], "action": r["last_action"], "timestamp": now}
+            for r in results
+            if "error" not in r
+        ]
+        if log_buffer is None:
+            db.session.bulk_insert_mappings(DeviceLog, logs)
+        bump_device_version(user_id)
+        db.session.commit()
+        if log_buffer is not None:
+            log_buffer.extend(logs)
+    return results
@@ -0,0 +1,68 @@
+import importlib
+import random
+import threading
+import time
+
+
+class DriverError(Exception):
+    """A device did not accept a command; the command queue retries these."""
+
+
+class DriverTimeout(DriverError):
+    """A device did not acknowledge a command within the timeout."""
+
+
+class SimulatedDriver:
+    """Stands in for real devices when testing.
+
+    Each command takes ``latency_ms`` plus up to ``jitter_ms`` to
+    acknowledge, and fails with probability ``failure_rate``. A command
+    that would take longer than the timeout raises ``DriverTimeout``.
+    """
+
+    def __init__(self, latency_ms=50, jitter_ms=0, failure_rate=0.0, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            latency_ms=config["SIMULATED_DRIVER_LATENCY_MS"],
+            jitter_ms=config["SIMULATED_DRIVER_JITTER_MS"],
+            failure_rate=config["SIMULATED_DRIVER_FAILURE_RATE"],
+        )
+
+    def send(self, command, timeout):
+        """Deliver ``command`` (a ``QueuedCommand``) to its device within ``timeout`` seconds."""
+        with self._lock:  # random.Random is not safe to share between worker threads
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.failure_rate
+        if delay > timeout:
+            time.sleep(timeout)
+            raise DriverTimeout(f"Device {command.device_id} did not respond within {timeout * 1000:.0f} ms")
+        time.sleep(delay)
+        if failed:
+            raise DriverError(f"Device {command.device_id} rejected the command")
+
+
+# DEVICE_DRIVER names; anything else is imported as "module:factory"
+DRIVERS = {"simulated": SimulatedDriver.from_config}
+
+
+def load_driver(config):
+    """Build the driver named by ``DEVICE_DRIVER``; factories are called with the app config.
+
+    A driver is any object with ``send(command, timeout)`` that returns once
+    the device acknowledged the command and raises ``DriverError`` otherwise.
+    """
+    name = config["DEVICE_DRIVER"]
+    factory = DRIVERS.get(name)
+    if factory is None:
+        module, _, attribute = name.partition(":")
+        if not attribute:
+            raise ValueError(f"Unknown DEVICE_DRIVER {name!r}; use one of {sorted(DRIVERS)} or 'module:factory'")
+        factory = getattr(importlib.import_module(module), attribute)
+    return factory(config)
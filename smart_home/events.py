@@ -0,0 +1,157 @@
+import importlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class Subscription:
+    """Bounded mailbox for one stream; the oldest events are dropped if the client falls behind."""
+
+    def __init__(self, maxsize=100):
+        self._events = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+
+    def put(self, event):
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify()
+
+    def drain(self, timeout):
+        """Wait up to ``timeout`` seconds for events and return all that are queued."""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+
+class EventBroker:
+    """In-process pub/sub fanning device and sensor events out to each user's streams.
+
+    Subscriptions block on a ``Condition`` rather than owning a thread, so
+    under gevent workers (the default in ``gunicorn.conf.py``) an idle stream
+    costs a greenlet and a small deque. Events only reach streams in the
+    process that published them; ``RedisEventBroker`` shares them between
+    processes.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)  # user_id -> {Subscription}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["EVENT_STREAM_QUEUE_SIZE"])
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers[int(user_id)].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        user_id = int(user_id)
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(int(user_id), ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, user_id, event, data):
+        return self.deliver(user_id, format_sse(event, data))
+
+    def deliver(self, user_id, message):
+        """Hand a formatted message to ``user_id``'s streams in this process; returns how many."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(int(user_id), ()))
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+
+class RedisEventBroker(EventBroker):
+    """``EventBroker`` whose events travel through Redis pub/sub, so every process sees them.
+
+    ``publish`` sends to the channel ``<prefix><user_id>``; each process with
+    open streams runs one listener thread, started on its first subscription,
+    subscribed to all of them and delivering to its local streams. If Redis
+    is unreachable, events are delivered in the publishing process only.
+    Needs the ``redis`` package.
+    """
+
+    def __init__(self, client, queue_size=100, prefix="events:"):
+        super().__init__(queue_size)
+        self.client = client
+        self.prefix = prefix
+        self._listener_pid = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        import redis
+
+        return cls(redis.Redis.from_url(config["EVENT_BROKER_REDIS_URL"]), config["EVENT_STREAM_QUEUE_SIZE"])
+
+    def subscribe(self, user_id):
+        self._ensure_listening()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event, data):
+        message = format_sse(event, data)
+        try:
+            return self.client.publish(f"{self.prefix}{int(user_id)}", message)
+        except Exception as e:
+            logging.warning("Event broker could not publish to Redis, delivering locally: %s", e)
+            return self.deliver(user_id, message)
+
+    def _ensure_listening(self):
+        if self._listener_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._listener_pid == os.getpid():
+                return
+            threading.Thread(target=self._listen, name="event-listener", daemon=True).start()
+            self._listener_pid = os.getpid()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{self.prefix}*")
+                for message in pubsub.listen():
+                    user_id = message["channel"].decode()[len(self.prefix):]
+                    self.deliver(user_id, message["data"].decode())
+            except Exception as e:
+                logging.warning("Event listener lost its Redis connection, reconnecting: %s", e)
+                time.sleep(1)
+
+
+BACKENDS = {"memory": EventBroker.from_config, "redis": RedisEventBroker.from_config}
+
+
+def load_broker(config):
+    """Build the event broker named by ``EVENT_BROKER_BACKEND``; factories are called with the app config."""
+    name = config["EVENT_BROKER_BACKEND"]
+    factory = BACKENDS.get(name)
+    if factory is None:
+        module, _, attribute = name.partition(":")
+        if not attribute:
+            raise ValueError(f"Unknown EVENT_BROKER_BACKEND {name!r}; use one of {sorted(BACKENDS)} or 'module:factory'")
+        factory = getattr(importlib.import_module(module), attribute)
+    return factory(config)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
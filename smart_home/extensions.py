@@ -0,0 +1,34 @@
+from flask_jwt_extended import JWTManager
+
+from tenancy import TenantSQLAlchemy
+
+
+class LazyMigrate:
+    """Stands in for ``flask_migrate.Migrate`` until a migration command uses it.
+
+    Importing Flask-Migrate imports Alembic, about a fifth of the app's
+    import time, and only ``flask db`` needs it. ``init_app`` leaves this
+    placeholder in ``app.extensions``; the first lookup of anything but
+    ``db`` sets up the real extension, which replaces it.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.db = None
+
+    def init_app(self, app, db):
+        self.app = app
+        self.db = db
+        app.extensions["migrate"] = self
+
+    def __getattr__(self, name):
+        from flask_migrate import Migrate
+
+        Migrate(self.app, self.db)
+        return getattr(self.app.extensions["migrate"], name)
+
+# Created unbound and set up in app.py, so models and helpers can import
+# them without importing (and building) the app
+db = TenantSQLAlchemy()  # Household tables are routed per shard, see tenancy.py
+jwt = JWTManager()
+migrate = LazyMigrate()
@@ -0,0 +1,276 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+def _green_threads():
+    """gevent's ``monkey`` module if it patched ``threading``, so that request "threads" are greenlets."""
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is not None and monkey.is_module_patched("threading"):
+        return monkey
+    return None
+
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense; guarded by the owner's lock."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RequestStats:
+    """What one in-flight request has done so far; lives in a thread-local."""
+
+    def __init__(self, thread_id, os_thread_id=None, greenlet=None):
+        self.thread_id = thread_id
+        self.os_thread_id = thread_id if os_thread_id is None else os_thread_id  # Key of sys._current_frames()
+        self.greenlet = greenlet
+        self.started = time.perf_counter()
+        self.status = None
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+        self.samples = Counter()
+
+
+class Instrumentation:
+    """Opt-in per-request metrics, SQL accounting and a sampling profiler for slow requests.
+
+    Every request records its duration per route, the number of SQL
+    statements it ran and the time spent in them (via engine cursor events).
+    A statement text executed ``n_plus_one_threshold`` times or more within
+    one request is counted and logged as a likely N+1. ``render`` produces the
+    Prometheus text format; counters are per process.
+
+    With ``slow_request_ms`` set, a background thread samples the stacks of
+    request threads every ``sample_interval_ms`` and requests slower than the
+    threshold get their stacks written to ``profile_dir`` as folded lines
+    (``frame;frame;frame count``), the input flamegraph.pl and speedscope take.
+    Under gevent's monkey patching (the gunicorn default) requests are
+    greenlets: the sampler is then a real OS thread, so it still interrupts
+    CPU-bound requests, and reads a waiting greenlet's stack from its frame.
+    """
+
+    def __init__(self, n_plus_one_threshold=10, slow_request_ms=0, sample_interval_ms=5, profile_dir="profiles"):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_request_ms = slow_request_ms
+        self.sample_interval = sample_interval_ms / 1000
+        self.profile_dir = profile_dir
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._durations = defaultdict(Histogram)  # (method, route) -> Histogram
+        self._sql_durations = defaultdict(Histogram)  # (method, route) -> Histogram
+        self._requests = Counter()  # (method, route, status) -> count
+        self._sql_statements = Counter()  # (method, route) -> count
+        self._n_plus_one = Counter()  # (method, route) -> count
+        self._profiles_written = 0
+        self._active = {}  # thread id -> RequestStats, for the sampler
+        self._sampler_pid = None
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        if self.slow_request_ms:
+            os.makedirs(self.profile_dir, exist_ok=True)
+
+    def _ensure_sampler(self):
+        # Started on the first request in each process, so forked workers get their own
+        if self._sampler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sampler_pid != os.getpid():
+                monkey = _green_threads()
+                if monkey is not None:
+                    # A greenlet would only run when the request being sampled yields
+                    monkey.get_original("_thread", "start_new_thread")(self._sample, ())
+                else:
+                    threading.Thread(target=self._sample, name="request-sampler", daemon=True).start()
+                self._sampler_pid = os.getpid()
+
+    def _start_request(self):
+        monkey = _green_threads() if self.slow_request_ms else None
+        if monkey is not None:
+            import gevent
+
+            os_thread_id = monkey.get_original("_thread", "get_ident")()
+            stats = RequestStats(threading.get_ident(), os_thread_id, gevent.getcurrent())
+        else:
+            stats = RequestStats(threading.get_ident())
+        self._local.stats = stats
+        if self.slow_request_ms:
+            self._ensure_sampler()
+            self._active[stats.thread_id] = stats
+
+    def _record_status(self, response):
+        stats = getattr(self._local, "stats", None)
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    def _finish_request(self, exc=None):
+        stats = getattr(self._local, "stats", None)
+        if stats is None:
+            return
+        self._local.stats = None
+        self._active.pop(stats.thread_id, None)
+        elapsed = time.perf_counter() - stats.started
+        key = (request.method, request.url_rule.rule if request.url_rule else "unmatched")
+        status = stats.status or 500
+
+        suspects = [
+            (statement, count)
+            for statement, count in stats.statements.items()
+            if count >= self.n_plus_one_threshold
+        ]
+        with self._lock:
+            self._durations[key].observe(elapsed)
+            self._sql_durations[key].observe(stats.sql_seconds)
+            self._requests[key + (status,)] += 1
+            self._sql_statements[key] += stats.sql_count
+            if suspects:
+                self._n_plus_one[key] += 1
+        for statement, count in suspects:
+            logging.warning(
+                "Possible N+1 in %s %s: statement ran %s times: %s",
+                key[0],
+                key[1],
+                count,
+                " ".join(statement.split())[:200],
+            )
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms and stats.samples:
+            self._write_profile(key, elapsed, stats.samples)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._instrumentation_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(self._local, "stats", None)
+        started = getattr(context, "_instrumentation_started", None)
+        if stats is None or started is None:
+            return
+        stats.sql_count += 1
+        stats.sql_seconds += time.perf_counter() - started
+        stats.statements[statement] += 1
+
+    def _sample(self):
+        monkey = _green_threads()
+        sleep = monkey.get_original("time", "sleep") if monkey is not None else time.sleep
+        while True:
+            sleep(self.sample_interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for stats in list(self._active.values()):
+                # A greenlet that is waiting keeps its frame; the running one is its OS thread's current frame
+                frame = stats.greenlet.gr_frame if stats.greenlet is not None else None
+                if frame is None:
+                    frame = frames.get(stats.os_thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                stats.samples[";".join(reversed(stack))] += 1
+
+    def _write_profile(self, key, elapsed, samples):
+        method, route = key
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = os.path.join(
+            self.profile_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{int(elapsed * 1000)}ms-{method}-{slug}.folded"
+        )
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError:
+            logging.exception("Could not write request profile to %s", path)
+            return
+        with self._lock:
+            self._profiles_written += 1
+        logging.info("Slow request %s %s took %.0f ms; profile written to %s", method, route, elapsed * 1000, path)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        def labels(method, route):
+            route = route.replace("\\", "\\\\").replace('"', '\\"')
+            return f'method="{method}",route="{route}"'
+
+        with self._lock:
+            lines = [
+                "# HELP smart_home_http_requests_total Requests handled, by route and status.",
+                "# TYPE smart_home_http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'smart_home_http_requests_total{{{labels(method, route)},status="{status}"}} {count}')
+
+            lines += [
+                "# HELP smart_home_http_request_duration_seconds Time from routing to teardown.",
+                "# TYPE smart_home_http_request_duration_seconds histogram",
+            ]
+            for key, histogram in sorted(self._durations.items()):
+                lines += histogram.render("smart_home_http_request_duration_seconds", labels(*key))
+
+            lines += [
+                "# HELP smart_home_db_time_per_request_seconds Time spent executing SQL within one request.",
+                "# TYPE smart_home_db_time_per_request_seconds histogram",
+            ]
+            for key, histogram in sorted(self._sql_durations.items()):
+                lines += histogram.render("smart_home_db_time_per_request_seconds", labels(*key))
+
+            lines += [
+                "# HELP smart_home_db_statements_total SQL statements executed while serving requests.",
+                "# TYPE smart_home_db_statements_total counter",
+            ]
+            for key, count in sorted(self._sql_statements.items()):
+                lines.append(f"smart_home_db_statements_total{{{labels(*key)}}} {count}")
+
+            lines += [
+                "# HELP smart_home_n_plus_one_requests_total Requests that repeated one statement past the threshold.",
+                "# TYPE smart_home_n_plus_one_requests_total counter",
+            ]
+            for key, count in sorted(self._n_plus_one.items()):
+                lines.append(f"smart_home_n_plus_one_requests_total{{{labels(*key)}}} {count}")
+
+            lines += [
+                "# HELP smart_home_slow_request_profiles_total Folded-stack profiles written for slow requests.",
+                "# TYPE smart_home_slow_request_profiles_total counter",
+                f"smart_home_slow_request_profiles_total {self._profiles_written}",
+            ]
+        return "\n".join(lines) + "\n"
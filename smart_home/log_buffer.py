@@ -0,0 +1,140 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from tenancy import current_shard, use_shard
+
+
+class DeviceLogBuffer:
+    """Write-behind buffer for ``DeviceLog`` rows.
+
+    Entries are queued in memory and inserted by a background thread with one
+    bulk INSERT per ``batch_size`` entries or every ``flush_interval`` seconds,
+    whichever comes first. The queue holds at most ``max_pending`` entries;
+    when it is full ``add`` blocks, so producers slow to the rate the database
+    can absorb instead of growing memory. Pending entries are flushed at exit.
+    Each entry remembers the household shard it was queued from. If a batch
+    fails (say a device was deleted meanwhile) its entries are written one
+    by one, so only the ones the database rejects are dropped.
+    """
+
+    def __init__(self, app, batch_size=500, flush_interval=0.2, max_pending=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            self._thread = threading.Thread(target=self._run, name="device-log-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+            atexit.register(self.close)
+
+    def add(self, device_id, action, timestamp=None):
+        self._ensure_started()
+        self._queue.put(
+            (
+                current_shard(),
+                {"device_id": device_id, "action": action, "timestamp": timestamp or datetime.utcnow()},
+            )
+        )
+
+    def extend(self, entries):
+        for entry in entries:
+            self.add(entry["device_id"], entry["action"], entry.get("timestamp"))
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self):
+        """Block until every entry queued so far has been written.
+
+        Queues a marker behind them and waits for the writer to reach it, so
+        entries added meanwhile do not hold the caller up.
+        """
+        if self._queue is not None and self._pid == os.getpid():
+            written = threading.Event()
+            self._queue.put(written)
+            written.wait()
+
+    def close(self):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            flushed = None
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                if isinstance(entry, threading.Event):  # A flush marker: write what came before it now
+                    self._queue.task_done()
+                    flushed = entry
+                    break
+                batch.append(entry)
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if flushed is not None:
+                flushed.set()
+
+    def _write(self, batch):
+        from extensions import db
+
+        by_shard = defaultdict(list)
+        for shard, entry in batch:
+            by_shard[shard].append(entry)
+        with self.app.app_context():
+            for shard, entries in by_shard.items():
+                try:
+                    self._insert(shard, entries)
+                except Exception as e:
+                    db.session.rollback()
+                    logging.warning("Failed to write %s buffered device logs, retrying one by one: %s", len(entries), e)
+                    self._insert_each(shard, entries)
+
+    def _insert(self, shard, entries):
+        from extensions import db
+        from models import DeviceLog
+
+        with use_shard(shard):
+            db.session.execute(DeviceLog.__table__.insert(), entries)
+            db.session.commit()
+
+    def _insert_each(self, shard, entries):
+        from extensions import db
+
+        for entry in entries:
+            try:
+                self._insert(shard, [entry])
+            except Exception as e:
+                db.session.rollback()
+                logging.error("Dropped buffered log %r for device %s: %s", entry["action"], entry["device_id"], e)
@@ -0,0 +1,159 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; the message is only rendered here, on the writer thread."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueue without blocking; records are dropped (and counted) when the queue is full.
+
+    The writer draining the queue is made by ``make_writer(queue)`` and
+    started with the first record in each process, so a forked child (a
+    server worker) gets its own queue and writer. Records still queued in
+    the parent are left for the parent to write.
+    """
+
+    def __init__(self, maxsize, make_writer):
+        super().__init__(None)
+        self.maxsize = maxsize
+        self.make_writer = make_writer
+        self.writer = None
+        self.dropped = 0
+        self._pid = None
+
+    def prepare(self, record):
+        # The queue stays in-process, so the record is passed through as-is and
+        # formatting is left to the writer. Tracebacks are rendered now so the
+        # frames they reference can be released.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Called with the handler's lock held, which logging resets in a forked child
+        if self._pid != os.getpid():
+            # The parent's writer thread is gone and may have held the queue's lock
+            self.queue = queue.Queue(maxsize=self.maxsize)
+            self.dropped = 0
+            self.writer = self.make_writer(self.queue)
+            self.writer.start()
+            self._pid = os.getpid()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        """Write what is queued and stop this process's writer."""
+        if self.writer is not None and self._pid == os.getpid():
+            self.writer.stop()
+            self.writer = None
+
+
+class BatchWriter(threading.Thread):
+    """Background thread draining the log queue into a size-rotated file, one write per batch."""
+
+    _STOP = object()
+
+    def __init__(self, log_queue, handler, batch_size=256, flush_interval=0.5):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    def run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is self._STOP
+            self.write([record for record in batch if record is not self._STOP])
+            if stop:
+                return
+
+    def write(self, records):
+        if not records:
+            return
+        handler = self.handler
+        lines = []
+        for record in records:
+            try:
+                lines.append(handler.format(record) + "\n")
+            except Exception:
+                handler.handleError(record)
+        chunk = "".join(lines)
+        with handler.lock:
+            try:
+                if handler.stream is None:
+                    handler.stream = handler._open()
+                if handler.maxBytes > 0 and handler.stream.tell() + len(chunk) >= handler.maxBytes:
+                    handler.doRollover()
+                    if handler.stream is None:
+                        handler.stream = handler._open()
+                handler.stream.write(chunk)
+                handler.stream.flush()
+            except Exception:
+                handler.handleError(records[-1])
+
+    def stop(self):
+        self.queue.put(self._STOP)
+        self.join()
+        self.handler.close()
+
+
+def configure_logging(config):
+    """Route the root logger through a bounded queue to a background JSON-lines writer.
+
+    Each process, forked server workers included, gets its own queue and
+    writer thread, started with its first record rather than in a fork
+    hook, where gevent's patched threads cannot start yet. All processes
+    append to the same file, so with several workers rotation should be
+    left to an external tool (``LOG_MAX_BYTES=0``, the default under gunicorn).
+    """
+    file_handler = RotatingFileHandler(
+        config.LOG_FILE,
+        maxBytes=config.LOG_MAX_BYTES,
+        backupCount=config.LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True,
+    )
+    file_handler.setFormatter(JsonFormatter())
+    queue_handler = DroppingQueueHandler(config.LOG_QUEUE_SIZE, lambda log_queue: BatchWriter(log_queue, file_handler))
+    atexit.register(queue_handler.stop)
+
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    return queue_handler
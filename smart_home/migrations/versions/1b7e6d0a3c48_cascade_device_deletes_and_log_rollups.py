@@ -0,0 +1,63 @@
+"""Cascade device deletes in the database and add daily log rollups
+
+Revision ID: 1b7e6d0a3c48
+Revises: f4a0c29e8b57
+Create Date: 2026-10-18 14:52:37.204519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7e6d0a3c48'
+down_revision = 'f4a0c29e8b57'
+branch_labels = None
+depends_on = None
+
+# The original foreign keys were created unnamed; SQLite batch mode needs a
+# naming convention to address them, PostgreSQL uses its default names.
+naming_convention = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+foreign_keys = [
+    # (table, column, referred table, PostgreSQL default name)
+    ('mock_iot_device', 'user_id', 'user', 'mock_iot_device_user_id_fkey'),
+    ('device_log', 'device_id', 'mock_iot_device', 'device_log_device_id_fkey'),
+]
+
+
+def _replace_foreign_keys(ondelete):
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table, column, referred, pg_name in foreign_keys:
+        name = f'fk_{table}_{column}_{referred}'
+        if sqlite:
+            with op.batch_alter_table(table, naming_convention=naming_convention) as batch_op:
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+        else:
+            op.drop_constraint(pg_name, table, type_='foreignkey')
+            op.create_foreign_key(pg_name, table, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+    op.create_table('device_log_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('action', sa.String(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('first_at', sa.DateTime(), nullable=False),
+    sa.Column('last_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['mock_iot_device.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('device_id', 'day', 'action', name='uq_device_log_daily_device_id_day_action')
+    )
+    op.create_index('ix_device_log_daily_day', 'device_log_daily', ['day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_device_log_daily_day', table_name='device_log_daily')
+    op.drop_table('device_log_daily')
+    _replace_foreign_keys(None)
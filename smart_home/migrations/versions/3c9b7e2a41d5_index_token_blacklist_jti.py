@@ -0,0 +1,26 @@
+"""Index token blacklist jti and track token expiry
+
+Revision ID: 3c9b7e2a41d5
+Revises: 6256956d332f
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9b7e2a41d5'
+down_revision = '6256956d332f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('token_blacklist', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_token_blacklist_jti'), 'token_blacklist', ['jti'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_token_blacklist_jti'), table_name='token_blacklist')
+    op.drop_column('token_blacklist', 'expires_at')
@@ -0,0 +1,44 @@
+"""Add the device command queue table
+
+Revision ID: 5c8b2e4f9a17
+Revises: a3e9c7d15f60
+Create Date: 2026-10-18 19:12:55.640218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8b2e4f9a17'
+down_revision = 'a3e9c7d15f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('device_command',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('value', sa.String(length=50), nullable=True),
+    sa.Column('source', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(length=200), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['device_id'], ['mock_iot_device.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_device_command_completed_at', 'device_command', ['completed_at'], unique=False)
+    op.create_index('ix_device_command_device_id', 'device_command', ['device_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_device_command_device_id', table_name='device_command')
+    op.drop_index('ix_device_command_completed_at', table_name='device_command')
+    op.drop_table('device_command')
@@ -0,0 +1,53 @@
+"""Add automation rules
+
+Revision ID: 7d2f5a9c1e84
+Revises: 1b7e6d0a3c48
+Create Date: 2026-10-18 16:21:09.815342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f5a9c1e84'
+down_revision = '1b7e6d0a3c48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('automation_rule',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=150), nullable=False),
+    sa.Column('enabled', sa.Boolean(), nullable=False),
+    sa.Column('trigger_type', sa.String(length=10), nullable=False),
+    sa.Column('trigger_device_id', sa.Integer(), nullable=True),
+    sa.Column('trigger_kind', sa.String(length=20), nullable=True),
+    sa.Column('trigger_operator', sa.String(length=2), nullable=True),
+    sa.Column('trigger_value', sa.Float(), nullable=True),
+    sa.Column('trigger_status', sa.String(length=10), nullable=True),
+    sa.Column('trigger_time', sa.String(length=5), nullable=True),
+    sa.Column('timezone', sa.String(length=64), nullable=True),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('action_value', sa.String(length=50), nullable=True),
+    sa.Column('target_device_id', sa.Integer(), nullable=True),
+    sa.Column('target_location', sa.String(length=50), nullable=True),
+    sa.Column('target_device_type', sa.String(length=50), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['target_device_id'], ['mock_iot_device.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['trigger_device_id'], ['mock_iot_device.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_automation_rule_updated_at', 'automation_rule', ['updated_at'], unique=False)
+    op.create_index('ix_automation_rule_user_id', 'automation_rule', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_automation_rule_user_id', table_name='automation_rule')
+    op.drop_index('ix_automation_rule_updated_at', table_name='automation_rule')
+    op.drop_table('automation_rule')
@@ -0,0 +1,26 @@
+"""Index device log by device and timestamp for keyset pagination
+
+Revision ID: 9a4f1c0d7b62
+Revises: 3c9b7e2a41d5
+Create Date: 2026-10-18 10:03:11.540872
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f1c0d7b62'
+down_revision = '3c9b7e2a41d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_device_log_device_id_timestamp', 'device_log', ['device_id', 'timestamp'], unique=False)
+    op.create_index('ix_device_log_timestamp', 'device_log', ['timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_device_log_timestamp', table_name='device_log')
+    op.drop_index('ix_device_log_device_id_timestamp', table_name='device_log')
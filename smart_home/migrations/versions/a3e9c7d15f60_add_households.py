@@ -0,0 +1,55 @@
+"""Add households and assign every existing user to one of their own
+
+Revision ID: a3e9c7d15f60
+Revises: 7d2f5a9c1e84
+Create Date: 2026-10-18 18:06:41.337120
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e9c7d15f60'
+down_revision = '7d2f5a9c1e84'
+branch_labels = None
+depends_on = None
+
+naming_convention = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def upgrade():
+    household = op.create_table('household',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=150), nullable=False),
+    sa.Column('shard', sa.String(length=50), server_default='default', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('user', naming_convention=naming_convention) as batch_op:
+        batch_op.add_column(sa.Column('household_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_household_id'), ['household_id'], unique=False)
+        batch_op.create_foreign_key('fk_user_household_id_household', 'household', ['household_id'], ['id'], ondelete='SET NULL')
+
+    # Every existing user gets a household of their own, on the main database
+    conn = op.get_bind()
+    user = sa.table('user', sa.column('id', sa.Integer), sa.column('username', sa.String), sa.column('household_id', sa.Integer))
+    now = datetime.utcnow()
+    for user_id, username in conn.execute(sa.select(user.c.id, user.c.username)).all():
+        household_id = conn.execute(
+            household.insert().values(name=f"{username}'s home", shard='default', created_at=now)
+        ).inserted_primary_key[0]
+        conn.execute(user.update().where(user.c.id == user_id).values(household_id=household_id))
+
+
+def downgrade():
+    with op.batch_alter_table('user', naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint('fk_user_household_id_household', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_user_household_id'))
+        batch_op.drop_column('household_id')
+
+    op.drop_table('household')
@@ -0,0 +1,38 @@
+"""Backfill missing device log timestamps and make the column required
+
+Revision ID: b81f4d2e6a09
+Revises: 5c8b2e4f9a17
+Create Date: 2026-10-18 21:40:12.518204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f4d2e6a09'
+down_revision = '5c8b2e4f9a17'
+branch_labels = None
+depends_on = None
+
+naming_convention = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s',
+}
+
+
+def upgrade():
+    # Logs written before the column had a default have no time; the epoch
+    # keeps them after every dated log in newest-first pages.
+    device_log = sa.table('device_log', sa.column('timestamp', sa.DateTime))
+    op.get_bind().execute(
+        device_log.update().where(device_log.c.timestamp.is_(None)).values(timestamp=datetime(1970, 1, 1))
+    )
+    with op.batch_alter_table('device_log', naming_convention=naming_convention) as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('device_log', naming_convention=naming_convention) as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=True)
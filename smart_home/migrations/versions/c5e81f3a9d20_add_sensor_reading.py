@@ -0,0 +1,34 @@
+"""Add sensor reading table
+
+Revision ID: c5e81f3a9d20
+Revises: 9a4f1c0d7b62
+Create Date: 2026-10-18 11:26:52.031447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e81f3a9d20'
+down_revision = '9a4f1c0d7b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sensor_reading',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('timestamp', sa.BigInteger(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['mock_iot_device.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sensor_reading_device_id_kind_timestamp', 'sensor_reading', ['device_id', 'kind', 'timestamp'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sensor_reading_device_id_kind_timestamp', table_name='sensor_reading')
+    op.drop_table('sensor_reading')
@@ -0,0 +1,35 @@
+"""Add revoked_at to token_blacklist as the revocation sync watermark
+
+Revision ID: d3a7c1f9e512
+Revises: b81f4d2e6a09
+Create Date: 2026-10-18 22:31:47.093512
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7c1f9e512'
+down_revision = 'b81f4d2e6a09'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.add_column(sa.Column('revoked_at', sa.DateTime(), nullable=True))
+    # Rows revoked before the column existed were synced by id already; any time will do
+    token_blacklist = sa.table('token_blacklist', sa.column('revoked_at', sa.DateTime))
+    op.get_bind().execute(token_blacklist.update().values(revoked_at=datetime.utcnow()))
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.alter_column('revoked_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_token_blacklist_revoked_at'), ['revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_blacklist') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_blacklist_revoked_at'))
+        batch_op.drop_column('revoked_at')
@@ -0,0 +1,24 @@
+"""Add device version counter to user
+
+Revision ID: e27d4b8c6f13
+Revises: c5e81f3a9d20
+Create Date: 2026-10-18 12:48:05.772316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e27d4b8c6f13'
+down_revision = 'c5e81f3a9d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('device_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('user', 'device_version')
@@ -0,0 +1,26 @@
+"""Index devices by owner and location
+
+Revision ID: f4a0c29e8b57
+Revises: e27d4b8c6f13
+Create Date: 2026-10-18 13:34:19.608914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a0c29e8b57'
+down_revision = 'e27d4b8c6f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Also serves lookups on user_id alone; device_log.device_id, device_log.timestamp
+    # and token_blacklist.jti were indexed by earlier revisions.
+    op.create_index('ix_mock_iot_device_user_id_location', 'mock_iot_device', ['user_id', 'location'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_mock_iot_device_user_id_location', table_name='mock_iot_device')
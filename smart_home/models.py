@@ -1,13 +1,23 @@
-from app import db
+from extensions import db
 from datetime import datetime
 import json
 
+class Household(db.Model):
+    """A home whose devices and history live together in one shard (see tenancy.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(150), nullable=False)
+    shard = db.Column(db.String(50), nullable=False, default='default', server_default='default')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(150), nullable=False)
     parental_controls = db.Column(db.Text, nullable=True)  # Store as JSON string in Text
     is_admin = db.Column(db.Boolean, default=False)  # Add is_admin field
+    device_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every device write
+    household_id = db.Column(db.Integer, db.ForeignKey('household.id', ondelete='SET NULL'), nullable=True, index=True)
+    household = db.relationship('Household', backref=db.backref('members', lazy=True, passive_deletes=True))
 
     def set_parental_controls(self, controls_dict):
         """Serialize the dictionary as a JSON string before storing it."""
@@ -18,30 +28,115 @@ class User(db.Model):
         return json.loads(self.parental_controls) if self.parental_controls else {}
 class MockIoTDevice(db.Model):
     __tablename__ = 'mock_iot_device'
+    __table_args__ = (
+        db.Index('ix_mock_iot_device_user_id_location', 'user_id', 'location'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     device_type = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(10), default='off')
     last_action = db.Column(db.String(100), nullable=True)
     location = db.Column(db.String(50), nullable=True)  # Add location field
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    user = db.relationship('User', backref=db.backref('mock_devices', lazy=True))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    user = db.relationship('User', backref=db.backref('mock_devices', lazy=True, passive_deletes=True))
 
     # Rename the relationship to avoid conflict with the backref
-    device_logs = db.relationship('DeviceLog', backref='device', cascade="all, delete-orphan")
+    # passive_deletes: the database's ON DELETE CASCADE removes the logs, so the ORM never loads them
+    device_logs = db.relationship('DeviceLog', backref='device', cascade="all, delete-orphan", passive_deletes=True)
 
 class DeviceLog(db.Model):
     __tablename__ = 'device_log'
+    __table_args__ = (
+        db.Index('ix_device_log_device_id_timestamp', 'device_id', 'timestamp'),
+        db.Index('ix_device_log_timestamp', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     action = db.Column(db.String(50), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id', ondelete='CASCADE'), nullable=False)
 
     # Backref is automatically created on the `MockIoTDevice.device_logs` relationship
 
+class DeviceLogDaily(db.Model):
+    """Per-device, per-day action counts that replace compacted DeviceLog rows."""
+    __tablename__ = 'device_log_daily'
+    __table_args__ = (
+        db.UniqueConstraint('device_id', 'day', 'action', name='uq_device_log_daily_device_id_day_action'),
+        db.Index('ix_device_log_daily_day', 'day'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    action = db.Column(db.String(100), nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)
+    last_at = db.Column(db.DateTime, nullable=False)
+
+class AutomationRule(db.Model):
+    """A trigger -> device action rule; rules.RuleEngine indexes the enabled ones in memory."""
+    __tablename__ = 'automation_rule'
+    __table_args__ = (
+        db.Index('ix_automation_rule_user_id', 'user_id'),
+        db.Index('ix_automation_rule_updated_at', 'updated_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    name = db.Column(db.String(150), nullable=False)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    trigger_type = db.Column(db.String(10), nullable=False)  # 'sensor', 'device' or 'time'
+    trigger_device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id', ondelete='CASCADE'), nullable=True)
+    trigger_kind = db.Column(db.String(20), nullable=True)  # Sensor kind, e.g. 'temperature'
+    trigger_operator = db.Column(db.String(2), nullable=True)
+    trigger_value = db.Column(db.Float, nullable=True)
+    trigger_status = db.Column(db.String(10), nullable=True)  # Device status that fires the rule
+    trigger_time = db.Column(db.String(5), nullable=True)  # 'HH:MM' in the rule's timezone
+    timezone = db.Column(db.String(64), nullable=True)  # IANA name; UTC when empty
+    action = db.Column(db.String(20), nullable=False)
+    action_value = db.Column(db.String(50), nullable=True)
+    target_device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id', ondelete='CASCADE'), nullable=True)
+    target_location = db.Column(db.String(50), nullable=True)
+    target_device_type = db.Column(db.String(50), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # Soft delete, so other workers' indexes see the removal
+
+class DeviceCommand(db.Model):
+    """A control command for a device driver; command_queue.CommandQueue sends it and records the outcome."""
+    __tablename__ = 'device_command'
+    __table_args__ = (
+        db.Index('ix_device_command_device_id', 'device_id'),
+        db.Index('ix_device_command_completed_at', 'completed_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    action = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(50), nullable=True)
+    source = db.Column(db.String(10), nullable=False, default='api')  # 'api' or 'rule'
+    status = db.Column(db.String(10), nullable=False, default='queued')  # 'queued', 'retrying', 'succeeded' or 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+class SensorReading(db.Model):
+    __tablename__ = 'sensor_reading'
+    __table_args__ = (
+        db.Index('ix_sensor_reading_device_id_kind_timestamp', 'device_id', 'kind', 'timestamp'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.Integer, db.ForeignKey('mock_iot_device.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default='temperature')
+    timestamp = db.Column(db.BigInteger, nullable=False)  # Epoch milliseconds, so buckets are integer division
+    value = db.Column(db.Float, nullable=False)
+
 class TokenBlacklist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    jti = db.Column(db.String(120), nullable=False)  # 'jti' is the unique identifier for a JWT token
+    jti = db.Column(db.String(120), nullable=False, unique=True, index=True)  # 'jti' is the unique identifier for a JWT token
+    expires_at = db.Column(db.DateTime, nullable=True)  # Token 'exp'; the row can be dropped after this
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # Sync watermark for other workers
 
-    def __init__(self, jti):
-        self.jti = jti
\ No newline at end of file
+    def __init__(self, jti, expires_at=None):
+        self.jti = jti
+        self.expires_at = expires_at
\ No newline at end of file
@@ -0,0 +1,66 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _parse_time(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError as exc:
+        raise ValueError(f"Invalid '{name}' timestamp, expected ISO 8601") from exc
+
+
+def filter_logs(query, model, args):
+    """Apply the ``since``/``until``/``action``/``cursor`` query params to a log query.
+
+    Rows are ordered newest first on ``(timestamp, id)`` so the cursor can seek
+    straight to the next page through the ``(device_id, timestamp)`` and
+    ``timestamp`` indexes. Raises ``ValueError`` on malformed params.
+    """
+    since = args.get("since")
+    until = args.get("until")
+    action = args.get("action")
+    cursor = args.get("cursor")
+
+    if since:
+        query = query.filter(model.timestamp >= _parse_time(since, "since"))
+    if until:
+        query = query.filter(model.timestamp < _parse_time(until, "until"))
+    if action:
+        query = query.filter(model.action.startswith(action, autoescape=True))
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        # The first term alone bounds the index range; the OR only trims ties
+        query = query.filter(
+            model.timestamp <= timestamp,
+            or_(model.timestamp < timestamp, model.id < row_id),
+        )
+    return query.order_by(model.timestamp.desc(), model.id.desc())
+
+
+def page_size(args, default=DEFAULT_PAGE_SIZE):
+    try:
+        limit = int(args.get("limit", default))
+    except ValueError as exc:
+        raise ValueError("Invalid 'limit', expected an integer") from exc
+    if limit < 1:
+        raise ValueError("'limit' must be positive")
+    return min(limit, MAX_PAGE_SIZE)
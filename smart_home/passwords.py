@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+_COST = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash operations are already queued."""
+
+
+def _hash(password, rounds):
+    import bcrypt  # Only where hashing happens: the pool's processes, or the first login
+
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(pw_hash, password):
+    import bcrypt
+
+    return bcrypt.checkpw(password.encode("utf-8"), pw_hash.encode("utf-8"))
+
+
+class PasswordHasher:
+    """bcrypt hashing offloaded to a bounded process pool.
+
+    At most ``max_pending`` operations may be queued or running at once;
+    beyond that ``PasswordHasherBusy`` is raised immediately, so a login storm
+    is shed instead of tying up every request worker. ``workers=0`` hashes on
+    the calling thread. The pool is created on first use in each process, so
+    it is safe to construct before a server forks.
+    """
+
+    def __init__(self, rounds=12, workers=None, max_pending=64):
+        self.rounds = rounds
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        if not pw_hash or password is None:
+            return False
+        return self._run(_check, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """True if ``pw_hash`` was made with a lower cost than the configured one."""
+        match = _COST.match(pw_hash or "")
+        return match is None or int(match.group(1)) < self.rounds
+
+    def warm(self):
+        """Start the pool's worker processes ahead of the first request."""
+        if self.workers:
+            list(self._pool().map(abs, range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
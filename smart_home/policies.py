@@ -0,0 +1,126 @@
+import json
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MINUTES_PER_DAY = 24 * 60
+_CLOCK = re.compile(r"^(\d{1,2})(?::(\d{2}))?$")
+
+
+class PolicyError(ValueError):
+    """Parental-control settings that cannot be compiled into a policy."""
+
+
+class Policy:
+    """Compiled parental controls: set membership and a minute-of-day table, no parsing per check.
+
+    Enforced settings:
+
+    - ``device_restrictions``: device names that may not be controlled
+    - ``blocked_device_types``: device types that may not be controlled
+    - ``allowed_hours``: ``[[start, end], ...]`` windows in which devices may
+      be controlled; ``start``/``end`` are hours (``7``) or ``"HH:MM"``, and a
+      window may wrap past midnight (``[22, 6]``)
+    - ``timezone``: IANA name the windows are in, UTC by default
+
+    Turning a device off is always allowed. Other keys are stored but not enforced.
+    """
+
+    __slots__ = ("blocked_names", "blocked_types", "allowed_minutes", "tz")
+
+    def __init__(self, blocked_names=(), blocked_types=(), allowed_minutes=None, tz=timezone.utc):
+        self.blocked_names = frozenset(blocked_names)
+        self.blocked_types = frozenset(blocked_types)
+        self.allowed_minutes = allowed_minutes  # bytes with one flag per minute of the day, or None
+        self.tz = tz
+
+    def check(self, device_name, device_type, action, now=None):
+        """Return why ``action`` on the device is not allowed, or ``None`` if it is."""
+        if action == "turn_off":
+            return None
+        if device_name in self.blocked_names:
+            return "Device is blocked by parental controls"
+        if device_type in self.blocked_types:
+            return f"Device type '{device_type}' is blocked by parental controls"
+        if self.allowed_minutes is not None:
+            local = (now or datetime.now(timezone.utc)).astimezone(self.tz)
+            if not self.allowed_minutes[local.hour * 60 + local.minute]:
+                return "Devices cannot be controlled at this time"
+        return None
+
+
+UNRESTRICTED = Policy()
+
+
+def _minute(value):
+    if isinstance(value, bool):
+        raise PolicyError(f"Invalid time: {value!r}")
+    if isinstance(value, int):
+        hour, minute = value, 0
+    else:
+        match = _CLOCK.match(str(value).strip())
+        if not match:
+            raise PolicyError(f"Invalid time: {value!r}")
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if not (0 <= hour <= 24 and 0 <= minute < 60) or (hour == 24 and minute):
+        raise PolicyError(f"Invalid time: {value!r}")
+    return hour * 60 + minute
+
+
+def _allowed_minutes(windows):
+    if not isinstance(windows, list) or not all(isinstance(w, list) and len(w) == 2 for w in windows):
+        raise PolicyError("allowed_hours must be a list of [start, end] pairs")
+    table = bytearray(MINUTES_PER_DAY)
+    for start, end in windows:
+        start, end = _minute(start) % MINUTES_PER_DAY, _minute(end) % MINUTES_PER_DAY
+        if start < end:
+            table[start:end] = b"\x01" * (end - start)
+        else:  # Wraps past midnight; equal ends mean the whole day
+            table[start:] = b"\x01" * (MINUTES_PER_DAY - start)
+            table[:end] = b"\x01" * end
+    return bytes(table)
+
+
+def compile_policy(settings):
+    """Build a ``Policy`` from a settings dict; raises ``PolicyError`` on malformed values."""
+    if not settings:
+        return UNRESTRICTED
+    if not isinstance(settings, dict):
+        raise PolicyError("Settings must be an object")
+
+    names = settings.get("device_restrictions") or []
+    types = settings.get("blocked_device_types") or []
+    for key, values in (("device_restrictions", names), ("blocked_device_types", types)):
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise PolicyError(f"{key} must be a list of strings")
+
+    windows = settings.get("allowed_hours")
+    allowed = _allowed_minutes(windows) if windows is not None else None
+
+    tz = timezone.utc
+    if settings.get("timezone"):
+        try:
+            tz = ZoneInfo(settings["timezone"])
+        except (ZoneInfoNotFoundError, ValueError, TypeError):  # TypeError: not a string
+            raise PolicyError(f"Unknown timezone: {settings['timezone']!r}")
+
+    if not names and not types and allowed is None:
+        return UNRESTRICTED
+    return Policy(names, types, allowed, tz)
+
+
+@lru_cache(maxsize=4096)
+def policy_from_json(raw):
+    """Compile the stored ``parental_controls`` text, once per distinct value.
+
+    Keyed on the text itself, so an update yields a new entry and needs no
+    invalidation; the ``UserCache`` decides when a user's new text is seen.
+    Stored settings that no longer compile are not enforced.
+    """
+    if not raw:
+        return UNRESTRICTED
+    try:
+        return compile_policy(json.loads(raw))
+    except (PolicyError, ValueError):
+        return UNRESTRICTED
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+
+def hot_queries():
+    """The statements behind the hot endpoints, as ``(name, statement)`` pairs.
+
+    Endpoint queries come from the builders the endpoints themselves call, so
+    an endpoint change shows up here without editing this list.
+    """
+    from app import (
+        DEVICE_FIELDS,
+        DEVICE_LIST_FIELDS,
+        device_listing_rows,
+        device_logs,
+        device_status_query,
+        device_version_query,
+        household_devices,
+        household_logs,
+        household_members_query,
+        log_rows,
+        user_by_username_query,
+    )
+    from extensions import db
+    from models import MockIoTDevice
+    from pagination import encode_cursor
+    from revocation import revocations_since
+    from sensors import SensorStore
+    from user_cache import UserCache
+
+    cursor = {"cursor": encode_cursor(datetime(2024, 1, 5), 500)}
+    queries = {
+        "user by id": UserCache.load_query(1),
+        "user by username": user_by_username_query("bench"),
+        "user device_version": device_version_query(1),
+        "revocations since watermark": revocations_since(datetime(2024, 1, 1)),
+        "devices by user": device_listing_rows(MockIoTDevice.query.filter_by(user_id=1), DEVICE_LIST_FIELDS),
+        "devices by user and location": device_listing_rows(
+            MockIoTDevice.query.filter_by(user_id=1, location="kitchen"), DEVICE_FIELDS
+        ),
+        # What Query.get() sends when the device is not in the session's identity map
+        "device by id": db.session.query(MockIoTDevice).filter(MockIoTDevice.id == 1),
+        "device status with recent logs": device_status_query(1, 10),
+        "household members": household_members_query(1),
+        "household devices": db.session.query(household_devices([1, 2]).subquery()),
+        "logs page": log_rows(household_logs([1, 2]), {}).limit(101),
+        "logs page after cursor": log_rows(household_logs([1, 2]), cursor).limit(101),
+        "device logs page": log_rows(device_logs(1), {}).limit(101),
+        "device logs page after cursor": log_rows(device_logs(1), cursor).limit(101),
+        "latest sensor reading": SensorStore.latest_query(1, "temperature").limit(1),
+        "sensor rollup": SensorStore.rollup_query([1, 2], "temperature", 60_000, 0, 3_600_000),
+    }
+    return [(name, query.statement) for name, query in queries.items()]
+
+
+def _seed(engine):
+    from models import User, MockIoTDevice, DeviceLog
+
+    with engine.begin() as conn:
+        conn.execute(
+            User.__table__.insert(),
+            [{"id": i, "username": f"user{i}", "password": "x"} for i in range(1, 51)],
+        )
+        conn.execute(
+            MockIoTDevice.__table__.insert(),
+            [
+                {
+                    "id": i,
+                    "name": f"device{i}",
+                    "device_type": "light",
+                    "location": f"room{i % 5}",
+                    "user_id": i % 50 + 1,
+                }
+                for i in range(1, 501)
+            ],
+        )
+        conn.execute(
+            DeviceLog.__table__.insert(),
+            [
+                {"action": "Device turned on", "device_id": i % 500 + 1, "timestamp": datetime(2024, 1, 1 + i % 28)}
+                for i in range(5000)
+            ],
+        )
+        conn.exec_driver_sql("ANALYZE")
+
+
+def explain(conn, statement):
+    """Return the plan lines for ``statement`` on ``conn``'s database."""
+    dialect = conn.dialect
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    if dialect.name == "sqlite":
+        params = tuple(compiled.params[key] for key in compiled.positiontup)
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+        return [row[-1] for row in rows]
+    rows = conn.exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).all()
+    return [row[0] for row in rows]
+
+
+def full_scans(plan, dialect_name):
+    """The lines of ``plan`` that read a whole table or sort rows no index orders."""
+    if dialect_name == "sqlite":
+        # "SCAN t USING INDEX ..." walks an index in order; a bare "SCAN t" reads the
+        # table, unless t is a subquery result that was materialized first.
+        derived = {line.split()[1] for line in plan if line.startswith(("MATERIALIZE", "CO-ROUTINE"))}
+        return [
+            line
+            for line in plan
+            if line.startswith("SCAN") and "USING" not in line and line.split()[1] not in derived
+            or line.startswith("USE TEMP B-TREE")
+        ]
+    return [line for line in plan if "Seq Scan" in line or line.lstrip(" ->").startswith("Sort ")]
+
+
+def audit(database_url=None):
+    """Explain every hot query; returns ``[(name, plan, full_scan_lines)]``.
+
+    Without ``database_url`` the schema is built in a seeded in-memory SQLite
+    database. On other databases sequential scans are disabled first so that
+    the plan shows whether an index path exists at all.
+    """
+    from extensions import db
+
+    if database_url is None:
+        engine = create_engine("sqlite://")
+        db.metadata.create_all(engine)
+        _seed(engine)
+    else:
+        engine = create_engine(database_url)
+
+    results = []
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for name, statement in hot_queries():
+            plan = explain(conn, statement)
+            results.append((name, plan, full_scans(plan, conn.dialect.name)))
+    engine.dispose()
+    return results
@@ -0,0 +1,192 @@
+import importlib
+import logging
+import re
+import threading
+import time
+from functools import wraps
+
+from flask import request
+from flask_jwt_extended import get_jwt_identity
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_SPEC = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)s?\s*$")
+
+
+class RateLimited(Exception):
+    """Raised when a request has used up its token bucket; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def parse_limit(spec):
+    """``"10/minute"`` as ``(rate, burst)``: tokens refilled per second and the bucket size."""
+    match = _SPEC.match(spec or "")
+    if not match:
+        raise ValueError(f"Bad rate limit {spec!r}; expected 'N/second', 'N/minute', 'N/hour' or 'N/day'")
+    count = int(match.group(1))
+    return count / PERIODS[match.group(2)], count
+
+
+class MemoryBuckets:
+    """Token buckets in a dict, local to the process.
+
+    The stand-in for a shared backend: with several worker processes each
+    one enforces the limits on its own, so a client can get up to one
+    bucket per process. Each bucket is ``(tokens, updated, full_at)``;
+    buckets that have refilled completely carry no state and are swept out
+    every ``sweep_interval`` seconds, so memory follows the active clients.
+    """
+
+    def __init__(self, sweep_interval=60):
+        self.sweep_interval = sweep_interval
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, rate, burst, cost=1):
+        """Take ``cost`` tokens from ``key``'s bucket; returns 0, or the seconds until they are available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if now >= self._next_sweep:
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+                self._next_sweep = now + self.sweep_interval
+        return wait
+
+
+class RedisBuckets:
+    """Token buckets in Redis, shared by every process and host using the same server.
+
+    Each take is one round trip running a Lua script, so refill and take
+    are atomic; keys expire once their bucket would be full again.
+    Needs the ``redis`` package.
+    """
+
+    SCRIPT = """
+    local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or burst
+    if bucket[2] then
+        tokens = math.min(burst, tokens + math.max(0, now - tonumber(bucket[2])) * rate)
+    end
+    local wait = 0
+    if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+    return tostring(wait)
+    """
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self.prefix = prefix
+        self._take = client.register_script(self.SCRIPT)
+
+    @classmethod
+    def from_config(cls, config):
+        import redis
+
+        return cls(redis.Redis.from_url(config["RATE_LIMIT_REDIS_URL"]))
+
+    def take(self, key, rate, burst, cost=1):
+        return float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+
+
+BACKENDS = {"memory": MemoryBuckets.from_config, "redis": RedisBuckets.from_config}
+
+
+def load_backend(config):
+    """Build the bucket store named by ``RATE_LIMIT_BACKEND``; factories are called with the app config.
+
+    A backend is any object with ``take(key, rate, burst, cost)`` returning
+    0 when the tokens were taken and the seconds to wait otherwise.
+    """
+    name = config["RATE_LIMIT_BACKEND"]
+    factory = BACKENDS.get(name)
+    if factory is None:
+        module, _, attribute = name.partition(":")
+        if not attribute:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND {name!r}; use one of {sorted(BACKENDS)} or 'module:factory'")
+        factory = getattr(importlib.import_module(module), attribute)
+    return factory(config)
+
+
+def client_ip():
+    """The client's address; behind a proxy, set ``TRUSTED_PROXIES`` or every client shares the proxy's buckets."""
+    return request.remote_addr or "unknown"
+
+
+def jwt_user():
+    return get_jwt_identity()
+
+
+KEYS = {"ip": client_ip, "user": jwt_user}
+
+
+class RateLimiter:
+    """Per-route token bucket limits, checked before the route does any work.
+
+    ``limit`` declares a route's limit as a decorator. Buckets are per
+    route and per ``per``: ``"ip"``, ``"user"`` (the JWT identity, so the
+    decorator goes under ``jwt_required``) or a function returning the key,
+    where ``None`` skips the limit. ``default`` is a per-IP limit on every
+    request, checked in ``before_request``. Over the limit ``RateLimited``
+    is raised; if the backend fails, requests are let through.
+    When disabled, ``limit`` returns the route unchanged.
+    """
+
+    def __init__(self, backend, enabled=True, default=None):
+        self.backend = backend
+        self.enabled = enabled
+        self.default = parse_limit(default) if default else None
+
+    def init_app(self, app):
+        if self.enabled and self.default is not None:
+            app.before_request(self._admit)
+
+    def _admit(self):
+        self.check(f"*:ip:{client_ip()}", *self.default)
+
+    def check(self, key, rate, burst, cost=1):
+        try:
+            wait = self.backend.take(key, rate, burst, cost)
+        except Exception as e:
+            logging.warning("Rate limit backend failed, letting the request through: %s", e)
+            return
+        if wait:
+            raise RateLimited(wait)
+
+    def limit(self, spec, per="ip", scope=None):
+        rate, burst = parse_limit(spec)
+        key_func = KEYS[per] if isinstance(per, str) else per
+        per_name = per if isinstance(per, str) else per.__name__
+
+        def decorator(fn):
+            if not self.enabled:
+                return fn
+            prefix = f"{scope or fn.__name__}:{per_name}:"
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = key_func()
+                if key is not None:
+                    self.check(f"{prefix}{key}", rate, burst)
+                return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import func
+
+
+def purge_before(model, column, cutoff, chunk_size=5000):
+    """Delete rows with ``column < cutoff`` in primary-key chunks, one commit per chunk.
+
+    Short transactions keep the write lock (SQLite) or row locks (PostgreSQL)
+    from being held across the whole purge. Returns the number of rows deleted.
+    """
+    from extensions import db
+
+    deleted = 0
+    while True:
+        ids = [
+            row_id
+            for row_id, in db.session.query(model.id).filter(column < cutoff).limit(chunk_size)
+        ]
+        if not ids:
+            return deleted
+        db.session.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+
+
+def add_daily_counts(rows):
+    """Insert DeviceLogDaily ``rows``, merging into the summary of any (device, day, action) already present."""
+    from extensions import db
+    from models import DeviceLogDaily
+
+    table = DeviceLogDaily.__table__
+    if db.session.get_bind(DeviceLogDaily.__mapper__).dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        least, greatest = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+        least, greatest = func.min, func.max  # SQLite's min/max are scalar with two arguments
+    statement = insert(table)
+    excluded = statement.excluded
+    statement = statement.on_conflict_do_update(
+        index_elements=["device_id", "day", "action"],
+        set_={
+            "count": table.c["count"] + excluded["count"],
+            "first_at": least(table.c.first_at, excluded.first_at),
+            "last_at": greatest(table.c.last_at, excluded.last_at),
+        },
+    )
+    db.session.execute(statement, rows)
+
+
+def compact_device_logs(cutoff):
+    """Roll raw logs before ``cutoff`` into DeviceLogDaily rows, one day per transaction.
+
+    ``cutoff`` is rounded down to midnight so only whole days are compacted.
+    Each day's summaries are inserted and its raw rows deleted in the same
+    commit, so an interrupted run can simply be started again. Logs that
+    arrive late for a day compacted before (imports, replayed buffers) are
+    added to its existing summaries.
+    Returns ``(days, raw_rows)`` compacted.
+    """
+    from extensions import db
+    from models import DeviceLog, DeviceLogDaily
+
+    cutoff = datetime.combine(cutoff.date(), time.min)
+    days = raw_rows = 0
+    while True:
+        oldest = db.session.query(func.min(DeviceLog.timestamp)).filter(DeviceLog.timestamp < cutoff).scalar()
+        if oldest is None:
+            return days, raw_rows
+        start = datetime.combine(oldest.date(), time.min)
+        end = start + timedelta(days=1)
+        in_day = (DeviceLog.timestamp >= start, DeviceLog.timestamp < end)
+
+        summaries = (
+            db.session.query(
+                DeviceLog.device_id,
+                DeviceLog.action,
+                func.count(),
+                func.min(DeviceLog.timestamp),
+                func.max(DeviceLog.timestamp),
+            )
+            .filter(*in_day)
+            .group_by(DeviceLog.device_id, DeviceLog.action)
+            .all()
+        )
+        add_daily_counts(
+            [
+                {
+                    "device_id": device_id,
+                    "day": start.date(),
+                    "action": action,
+                    "count": count,
+                    "first_at": first_at,
+                    "last_at": last_at,
+                }
+                for device_id, action, count, first_at, last_at in summaries
+            ]
+        )
+        raw_rows += db.session.query(DeviceLog).filter(*in_day).delete(synchronize_session=False)
+        db.session.commit()
+        days += 1
+
+
+def run_retention(config, now=None, chunk_size=5000):
+    """Apply every retention rule from ``config``, in every household shard; returns a dict of counts."""
+    from models import AutomationRule, DeviceCommand, DeviceLog, DeviceLogDaily, SensorReading, TokenBlacklist
+    from tenancy import shard_names, use_shard
+
+    now = now or datetime.utcnow()
+    report = Counter()
+    for shard in shard_names(config):
+        with use_shard(shard):
+            if config["DEVICE_LOG_COMPACT_AFTER_DAYS"]:
+                days, rows = compact_device_logs(now - timedelta(days=config["DEVICE_LOG_COMPACT_AFTER_DAYS"]))
+                report["device_log_compacted_days"] += days
+                report["device_log_compacted_rows"] += rows
+            if config["DEVICE_LOG_RETENTION_DAYS"]:
+                log_cutoff = now - timedelta(days=config["DEVICE_LOG_RETENTION_DAYS"])
+                report["device_log_purged"] += purge_before(DeviceLog, DeviceLog.timestamp, log_cutoff, chunk_size)
+                report["device_log_daily_purged"] += purge_before(
+                    DeviceLogDaily, DeviceLogDaily.day, log_cutoff.date(), chunk_size
+                )
+            if config["SENSOR_READING_RETENTION_DAYS"]:
+                reading_cutoff = now - timedelta(days=config["SENSOR_READING_RETENTION_DAYS"])
+                reading_cutoff = int((reading_cutoff - datetime(1970, 1, 1)).total_seconds() * 1000)
+                report["sensor_reading_purged"] += purge_before(
+                    SensorReading, SensorReading.timestamp, reading_cutoff, chunk_size
+                )
+            if config["DEVICE_COMMAND_RETENTION_DAYS"]:
+                command_cutoff = now - timedelta(days=config["DEVICE_COMMAND_RETENTION_DAYS"])
+                report["device_command_purged"] += purge_before(
+                    DeviceCommand, DeviceCommand.completed_at, command_cutoff, chunk_size
+                )
+            # A day is far longer than any worker's rule sync interval, so every index has seen the delete
+            report["automation_rule_purged"] += purge_before(
+                AutomationRule, AutomationRule.deleted_at, now - timedelta(days=1), chunk_size
+            )
+    report["token_blacklist_purged"] = purge_before(TokenBlacklist, TokenBlacklist.expires_at, now, chunk_size)
+    return dict(report)
@@ -0,0 +1,102 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+SYNC_OVERLAP = timedelta(seconds=2)  # Re-read recent revocations in case a slower commit landed behind the watermark
+
+
+def revocations_since(watermark):
+    """Query of ``(jti, expires_at, revoked_at)`` revoked at or after ``watermark``; unexpired ones if ``None``."""
+    from sqlalchemy import or_
+
+    from models import TokenBlacklist
+
+    query = TokenBlacklist.query.with_entities(TokenBlacklist.jti, TokenBlacklist.expires_at, TokenBlacklist.revoked_at)
+    if watermark is None:
+        return query.filter(or_(TokenBlacklist.expires_at.is_(None), TokenBlacklist.expires_at > datetime.utcnow()))
+    return query.filter(TokenBlacklist.revoked_at >= watermark - SYNC_OVERLAP)
+
+
+class RevocationIndex:
+    """In-memory set of revoked JWT IDs, keyed by jti and pruned on expiry.
+
+    Lookups are a single dict probe, so their cost does not depend on how
+    many tokens have been revoked. Each process keeps its own copy and pulls
+    rows added by other processes from ``token_blacklist`` at most once every
+    ``sync_interval`` seconds, by ``revoked_at`` like ``RuleEngine`` does by
+    ``updated_at``: ids are no watermark, as expired rows are purged and
+    their ids reused, and sequence ids may commit out of order.
+    """
+
+    def __init__(self, sync_interval=5):
+        self.sync_interval = sync_interval
+        self._expiry = {}  # jti -> exp (epoch seconds), None if unknown
+        self._heap = []  # (exp, jti) for tokens that carry an exp
+        self._watermark = None  # Newest revoked_at seen
+        self._last_sync = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, jti):
+        return jti in self._expiry
+
+    def add(self, jti, exp=None):
+        with self._lock:
+            self._expiry[jti] = exp
+            if exp is not None:
+                heapq.heappush(self._heap, (exp, jti))
+
+    def prune(self, now=None):
+        """Drop entries whose token has expired; returns how many were removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                exp, jti = heapq.heappop(self._heap)
+                if self._expiry.get(jti) == exp:
+                    del self._expiry[jti]
+                    removed += 1
+        return removed
+
+    def is_revoked(self, jti):
+        if (
+            self._last_sync is None
+            or time.monotonic() - self._last_sync >= self.sync_interval
+        ):
+            self.sync()
+        return jti in self._expiry
+
+    def revoke(self, jti, exp=None):
+        """Persist a revoked token and record it in the index."""
+        from extensions import db
+        from models import TokenBlacklist
+
+        expires_at = datetime.utcfromtimestamp(exp) if exp is not None else None
+        db.session.add(TokenBlacklist(jti=jti, expires_at=expires_at))
+        db.session.commit()
+        self.add(jti, exp)
+
+    def sync(self):
+        """Load rows added to ``token_blacklist`` since the last sync; returns how many were read."""
+        now = time.time()
+        watermark = self._watermark
+        rows = revocations_since(watermark).all()
+        for jti, expires_at, revoked_at in rows:
+            exp = _to_epoch(expires_at)
+            if (exp is None or exp > now) and jti not in self._expiry:
+                self.add(jti, exp)
+            if watermark is None or revoked_at > watermark:
+                watermark = revoked_at
+        self._watermark = watermark or datetime.utcnow()
+        self._last_sync = time.monotonic()
+        self.prune(now)
+        return len(rows)
+
+
+def _to_epoch(value):
+    if value is None:
+        return None
+    return (value - datetime(1970, 1, 1)).total_seconds()
@@ -0,0 +1,369 @@
+import logging
+import operator
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from flask import current_app
+
+from device_control import ACTIONS
+from sensors import MAX_KIND_LENGTH
+from tenancy import DEFAULT_SHARD, shard_names, use_shard
+
+TRIGGER_TYPES = ("sensor", "device", "time")
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+MAX_TARGET_LENGTH = 50  # AutomationRule.target_location and target_device_type
+SYNC_OVERLAP = timedelta(seconds=2)  # Re-read recent changes in case a slower commit landed behind the watermark
+
+
+class RuleError(ValueError):
+    """A rule definition that cannot be stored or evaluated."""
+
+
+def _parse_clock(value):
+    try:
+        hour, minute = (int(part) for part in str(value).split(":"))
+    except ValueError:
+        raise RuleError(f"Invalid time: {value!r}, expected HH:MM")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise RuleError(f"Invalid time: {value!r}, expected HH:MM")
+    return hour * 60 + minute
+
+
+def _text(value, key, limit):
+    if not isinstance(value, str) or len(value) > limit:
+        raise RuleError(f"{key} must be a string of at most {limit} characters")
+    return value
+
+
+def rule_columns(data):
+    """Validate a rule definition from the API and return ``AutomationRule`` column values.
+
+    ``{"name", "enabled", "trigger": {...}, "action": {...}}`` where the trigger is one of
+
+    - ``{"type": "sensor", "kind": "temperature", "op": ">", "value": 25, "device_id": 3}``
+      (``device_id`` optional: any of the user's sensors)
+    - ``{"type": "device", "device_id": 3, "status": "on"}``
+    - ``{"type": "time", "at": "22:00", "timezone": "Europe/Berlin"}`` (UTC by default)
+
+    and the action is ``{"action": "turn_on", "value": ..., "device_id": 5}`` or targets
+    the user's devices by ``location`` and/or ``device_type`` instead of ``device_id``.
+    """
+    if not isinstance(data, dict):
+        raise RuleError("Rule must be an object")
+    trigger = data.get("trigger") or {}
+    action = data.get("action") or {}
+    if not isinstance(trigger, dict) or not isinstance(action, dict):
+        raise RuleError("trigger and action must be objects")
+
+    columns = {
+        "name": str(data.get("name") or "")[:150] or None,
+        "enabled": bool(data.get("enabled", True)),
+        "trigger_type": trigger.get("type"),
+        "trigger_device_id": None,
+        "trigger_kind": None,
+        "trigger_operator": None,
+        "trigger_value": None,
+        "trigger_status": None,
+        "trigger_time": None,
+        "timezone": None,
+    }
+    if not columns["name"]:
+        raise RuleError("name is required")
+
+    kind = columns["trigger_type"]
+    if kind == "sensor":
+        if trigger.get("op") not in OPERATORS:
+            raise RuleError(f"Sensor trigger op must be one of {', '.join(OPERATORS)}")
+        try:
+            columns["trigger_value"] = float(trigger["value"])
+        except (KeyError, TypeError, ValueError):
+            raise RuleError("Sensor trigger needs a numeric value")
+        columns["trigger_kind"] = _text(trigger.get("kind") or "temperature", "kind", MAX_KIND_LENGTH)
+        columns["trigger_operator"] = trigger["op"]
+        columns["trigger_device_id"] = trigger.get("device_id")
+    elif kind == "device":
+        if trigger.get("device_id") is None or trigger.get("status") not in ("on", "off"):
+            raise RuleError("Device trigger needs a device_id and a status of 'on' or 'off'")
+        columns["trigger_device_id"] = trigger["device_id"]
+        columns["trigger_status"] = trigger["status"]
+    elif kind == "time":
+        minute = _parse_clock(trigger.get("at"))
+        columns["trigger_time"] = f"{minute // 60:02d}:{minute % 60:02d}"
+        columns["timezone"] = trigger.get("timezone") or None
+        if columns["timezone"]:
+            try:
+                ZoneInfo(columns["timezone"])
+            except (ZoneInfoNotFoundError, ValueError, TypeError):  # TypeError: not a string
+                raise RuleError(f"Unknown timezone: {columns['timezone']!r}")
+    else:
+        raise RuleError(f"Trigger type must be one of {', '.join(TRIGGER_TYPES)}")
+
+    if action.get("action") not in ACTIONS:
+        raise RuleError(f"Action must be one of {', '.join(ACTIONS)}")
+    columns.update(
+        action=action["action"],
+        action_value=None if action.get("value") is None else str(action["value"])[:50],
+        target_device_id=action.get("device_id"),
+        target_location=action.get("location"),
+        target_device_type=action.get("device_type"),
+    )
+    if columns["target_device_id"] is None and not (columns["target_location"] or columns["target_device_type"]):
+        raise RuleError("Action needs a device_id, location or device_type")
+    for key, column in (("location", "target_location"), ("device_type", "target_device_type")):
+        if columns[column] is not None:
+            columns[column] = _text(columns[column], key, MAX_TARGET_LENGTH)
+    for key in ("trigger_device_id", "target_device_id"):
+        if columns[key] is not None:
+            try:
+                columns[key] = int(columns[key])
+            except (TypeError, ValueError):
+                raise RuleError("device_id must be an integer")
+    return columns
+
+
+def rule_to_dict(row):
+    """API representation of an ``AutomationRule`` row."""
+    trigger = {"type": row.trigger_type}
+    if row.trigger_type == "sensor":
+        trigger.update(kind=row.trigger_kind, op=row.trigger_operator, value=row.trigger_value)
+        if row.trigger_device_id is not None:
+            trigger["device_id"] = row.trigger_device_id
+    elif row.trigger_type == "device":
+        trigger.update(device_id=row.trigger_device_id, status=row.trigger_status)
+    else:
+        trigger.update(at=row.trigger_time, timezone=row.timezone or "UTC")
+    action = {"action": row.action}
+    for key, value in (
+        ("value", row.action_value),
+        ("device_id", row.target_device_id),
+        ("location", row.target_location),
+        ("device_type", row.target_device_type),
+    ):
+        if value is not None:
+            action[key] = value
+    return {"id": row.id, "name": row.name, "enabled": row.enabled, "trigger": trigger, "action": action}
+
+
+class Rule:
+    """An enabled rule, reduced to what evaluation and dispatch need.
+
+    Row ids are only unique within a shard, so rules are keyed by ``(shard, id)``.
+    """
+
+    __slots__ = (
+        "key",
+        "id",
+        "shard",
+        "user_id",
+        "trigger_type",
+        "device_id",
+        "kind",
+        "compare",
+        "threshold",
+        "status",
+        "minute",
+        "tz",
+        "action",
+        "value",
+        "target_device_id",
+        "target_location",
+        "target_device_type",
+    )
+
+    def __init__(self, row, shard=DEFAULT_SHARD):
+        self.key = (shard, row.id)
+        self.id = row.id
+        self.shard = shard
+        self.user_id = row.user_id
+        self.trigger_type = row.trigger_type
+        self.device_id = row.trigger_device_id
+        self.kind = row.trigger_kind
+        self.compare = OPERATORS.get(row.trigger_operator)
+        self.threshold = row.trigger_value
+        self.status = row.trigger_status
+        self.minute = _parse_clock(row.trigger_time) if row.trigger_type == "time" else None
+        self.tz = row.timezone or "UTC"
+        self.action = row.action
+        self.value = row.action_value
+        self.target_device_id = row.target_device_id
+        self.target_location = row.target_location
+        self.target_device_type = row.target_device_type
+
+
+class RuleEngine:
+    """Automation rules indexed by trigger key, so an event only touches the rules it can fire.
+
+    - sensor rules: ``(user_id, kind, device_id)``, with ``device_id`` ``None``
+      for rules watching any of the user's sensors
+    - device rules: ``(user_id, device_id)``
+    - time rules: ``timezone -> minute of day``
+
+    Sensor and device rules are edge-triggered: a rule fires when its
+    condition becomes true and not again until it has been false. Fired
+    rules are passed to ``dispatch`` in one call per event batch. The
+    last-seen condition is per process: each worker fires on the edges of
+    the events it handles (see ``gunicorn.conf.py``).
+
+    Like ``RevocationIndex``, each process keeps its own index and pulls rules
+    changed elsewhere (by ``updated_at``, per shard) at most every ``sync_interval`` seconds.
+    """
+
+    def __init__(self, dispatch, sync_interval=5):
+        self.dispatch = dispatch
+        self.sync_interval = sync_interval
+        self._rules = {}  # (shard, rule_id) -> Rule
+        self._sensor = defaultdict(list)  # (user_id, kind, device_id | None) -> [Rule]
+        self._device = defaultdict(list)  # (user_id, device_id) -> [Rule]
+        self._time = defaultdict(lambda: defaultdict(list))  # timezone -> minute -> [Rule]
+        self._matched = {}  # (shard, rule_id) -> whether its condition held on the last event
+        self._watermarks = {}  # shard -> newest updated_at seen
+        self._last_sync = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _buckets(self, rule):
+        if rule.trigger_type == "sensor":
+            return self._sensor, (rule.user_id, rule.kind, rule.device_id)
+        if rule.trigger_type == "device":
+            return self._device, (rule.user_id, rule.device_id)
+        return self._time[rule.tz], rule.minute
+
+    def add(self, rule):
+        with self._lock:
+            self._discard(rule.key)
+            self._rules[rule.key] = rule
+            index, key = self._buckets(rule)
+            index[key].append(rule)
+
+    def remove(self, shard, rule_id):
+        with self._lock:
+            self._discard((shard, rule_id))
+            self._matched.pop((shard, rule_id), None)
+
+    def _discard(self, rule_key):
+        rule = self._rules.pop(rule_key, None)
+        if rule is None:
+            return
+        index, key = self._buckets(rule)
+        bucket = index[key]
+        bucket[:] = [r for r in bucket if r.key != rule_key]
+        if not bucket:
+            del index[key]
+        if rule.trigger_type == "time" and not self._time[rule.tz]:
+            del self._time[rule.tz]
+
+    def apply(self, row, shard=DEFAULT_SHARD):
+        """Bring the index in line with one ``AutomationRule`` row from ``shard``."""
+        if row.enabled and row.deleted_at is None:
+            self.add(Rule(row, shard))
+        else:
+            self.remove(shard, row.id)
+
+    def maybe_sync(self):
+        if self._last_sync is None or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Load rules created, changed or deleted since the last sync; returns how many rows were read."""
+        from extensions import db
+        from models import AutomationRule
+
+        rules = AutomationRule.__table__
+        read = 0
+        for shard in shard_names(current_app.config):
+            watermark = self._watermarks.get(shard)
+            # Plain rows: ORM objects from different shards would share identities by id
+            query = rules.select()
+            if watermark is None:
+                query = query.where(rules.c.enabled.is_(True), rules.c.deleted_at.is_(None))
+            else:
+                query = query.where(rules.c.updated_at >= watermark - SYNC_OVERLAP)
+            with use_shard(shard):
+                rows = db.session.execute(query).all()
+            for row in rows:
+                self.apply(row, shard)
+                if watermark is None or row.updated_at > watermark:
+                    watermark = row.updated_at
+            self._watermarks[shard] = watermark or datetime.utcnow()
+            read += len(rows)
+        self._last_sync = time.monotonic()
+        return read
+
+    def _edge(self, rule, matched):
+        previous = self._matched.get(rule.key, False)
+        self._matched[rule.key] = matched
+        return matched and not previous
+
+    def on_sensor_readings(self, user_id, readings):
+        """Evaluate ``[{"device_id", "kind", "value"}]`` readings in order; returns the rules fired."""
+        self.maybe_sync()
+        user_id = int(user_id)
+        fired = []
+        with self._lock:
+            for reading in readings:
+                for device_id in (reading["device_id"], None):
+                    for rule in self._sensor.get((user_id, reading["kind"], device_id), ()):
+                        if self._edge(rule, rule.compare(reading["value"], rule.threshold)):
+                            fired.append(rule)
+        return self._fire(fired)
+
+    def on_device_changes(self, user_id, changes):
+        """Evaluate ``[(device_id, status)]`` after the user's devices were controlled; returns the rules fired."""
+        self.maybe_sync()
+        user_id = int(user_id)
+        fired = []
+        with self._lock:
+            for device_id, status in changes:
+                for rule in self._device.get((user_id, device_id), ()):
+                    if self._edge(rule, status == rule.status):
+                        fired.append(rule)
+        return self._fire(fired)
+
+    def on_minute(self, now=None):
+        """Fire the time rules due in the minute containing ``now`` (aware, UTC by default)."""
+        self.maybe_sync()
+        now = now or datetime.now(timezone.utc)
+        fired = []
+        with self._lock:
+            for tz, minutes in self._time.items():
+                local = now.astimezone(ZoneInfo(tz))
+                fired.extend(minutes.get(local.hour * 60 + local.minute, ()))
+        return self._fire(fired)
+
+    def _fire(self, fired):
+        if fired:
+            try:
+                self.dispatch(fired)
+            except Exception:
+                logging.exception("Failed to run actions for %s automation rules", len(fired))
+        return fired
+
+
+class RuleScheduler(threading.Thread):
+    """Calls ``engine.on_minute`` at the start of every minute, inside an app context."""
+
+    def __init__(self, app, engine):
+        super().__init__(name="rule-scheduler", daemon=True)
+        self.app = app
+        self.engine = engine
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not self._stopping.wait(60.05 - time.time() % 60):
+            with self.app.app_context():
+                self.engine.on_minute()
+
+    def stop(self):
+        self._stopping.set()
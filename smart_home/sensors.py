@@ -0,0 +1,233 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from sqlalchemy import func, literal
+
+RESOLUTIONS = {"1m": 60_000, "1h": 3_600_000, "1d": 86_400_000}  # bucket width in ms
+DEFAULT_BUCKETS = 60
+MAX_KIND_LENGTH = 20  # SensorReading.kind
+ROLLUP_QUERY_PARAMS = 5000  # Bound parameters per rollup statement (SQLite allows 32766)
+ROLLUP_QUERY_BUCKETS = 500  # UNION ALL terms per rollup statement (SQLite's limit)
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def parse_readings(items, received):
+    """Rows for ``SensorStore.ingest`` from posted readings; raises ``ValueError`` saying what is wrong."""
+    if not isinstance(items, list):
+        raise ValueError("readings must be a list")
+    readings = []
+    for reading in items:
+        try:
+            row = {
+                "device_id": int(reading["device_id"]),
+                "kind": reading.get("kind", "temperature"),
+                "timestamp": int(reading.get("timestamp", received)),
+                "value": float(reading["value"]),
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValueError("Each reading needs a device_id and a numeric value")
+        if not isinstance(row["kind"], str) or not 0 < len(row["kind"]) <= MAX_KIND_LENGTH:
+            raise ValueError(f"kind must be a string of 1 to {MAX_KIND_LENGTH} characters")
+        readings.append(row)
+    return readings
+
+
+class SensorStore:
+    """Batched ingestion of sensor readings with the latest value per sensor held in memory.
+
+    Readings are appended to ``sensor_reading`` with one bulk INSERT per batch.
+    ``latest`` is answered from memory for ``ttl`` seconds after this process
+    last ingested or looked up the user's value; after that it falls back to
+    a single indexed query, so readings stored by other processes (other
+    workers, ``flask sensors simulate``) show up within ``ttl``.
+    """
+
+    def __init__(self, ttl=5):
+        self.ttl = ttl
+        self._latest = {}  # (user_id, kind) -> (reading dict, expires_at)
+        self._lock = threading.Lock()
+
+    def ingest(self, user_id, readings):
+        """Store ``[{"device_id", "value", "kind", "timestamp"}]`` and update the current values."""
+        from extensions import db
+        from models import SensorReading
+
+        if not readings:
+            return []
+        db.session.bulk_insert_mappings(SensorReading, readings)
+        db.session.commit()
+
+        changed = {}
+        for reading in readings:
+            key = (int(user_id), reading["kind"])
+            newest = changed.get(key) or self._latest.get(key, (None,))[0]
+            if newest is None or reading["timestamp"] >= newest["timestamp"]:
+                changed[key] = reading
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._latest.update((key, (reading, expires_at)) for key, reading in changed.items())
+        return list(changed.values())
+
+    def latest(self, user_id, kind="temperature"):
+        key = (int(user_id), kind)
+        cached = self._latest.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        row = max(self.latest_query(user_id, kind), key=lambda row: row.timestamp, default=None)
+        if row is None:
+            return None
+        reading = row._asdict()
+        with self._lock:
+            current = self._latest.get(key)
+            if current is not None and current[0]["timestamp"] > reading["timestamp"]:
+                reading = current[0]  # Ingested here while the query ran
+            self._latest[key] = (reading, time.monotonic() + self.ttl)
+        return reading
+
+    def forget_device(self, device_id):
+        with self._lock:
+            for key in [k for k, (r, _) in self._latest.items() if r["device_id"] == device_id]:
+                del self._latest[key]
+
+    @staticmethod
+    def latest_query(user_id, kind):
+        """Query of ``(device_id, kind, timestamp, value)``: the newest reading of ``kind`` per device of the user.
+
+        Each device's newest reading is one step down the (device_id, kind,
+        timestamp) index; ``latest`` picks the newest of them in Python, which
+        spares the database sorting every reading of every device.
+        """
+        from extensions import db
+        from models import MockIoTDevice, SensorReading
+
+        newest = (
+            db.session.query(SensorReading.id)
+            .filter(SensorReading.device_id == MockIoTDevice.id, SensorReading.kind == kind)
+            .order_by(SensorReading.timestamp.desc())
+            .limit(1)
+            .correlate(MockIoTDevice)
+            .scalar_subquery()
+        )
+        return (
+            db.session.query(SensorReading.device_id, SensorReading.kind, SensorReading.timestamp, SensorReading.value)
+            .select_from(MockIoTDevice)
+            .join(SensorReading, SensorReading.id == newest)
+            .filter(MockIoTDevice.user_id == user_id)
+        )
+
+    @staticmethod
+    def rollup_query(device_ids, kind, width, since, until):
+        """Query of ``(device_id, bucket, min, max, avg, count)`` per ``width`` ms bucket in ``[since, until)``.
+
+        One GROUP BY device_id per bucket, joined with UNION ALL: each reads its
+        time range off the (device_id, kind, timestamp) index in device order,
+        so nothing is sorted. Grouping on the bucket expression instead makes the
+        database sort every reading in a temporary B-tree. Rows are unordered.
+        """
+        from models import SensorReading
+
+        terms = [
+            SensorReading.query.with_entities(
+                SensorReading.device_id,
+                literal(start).label("bucket"),
+                func.min(SensorReading.value),
+                func.max(SensorReading.value),
+                func.avg(SensorReading.value),
+                func.count(),
+            )
+            .filter(
+                SensorReading.device_id.in_(device_ids),
+                SensorReading.kind == kind,
+                SensorReading.timestamp >= max(start, since),
+                SensorReading.timestamp < min(start + width, until),
+            )
+            .group_by(SensorReading.device_id)
+            for start in range(since - since % width, until, width)
+        ]
+        return terms[0].union_all(*terms[1:])
+
+    @classmethod
+    def rollup(cls, device_ids, kind, resolution, since=None, until=None):
+        """Return min/max/avg/count per time bucket, aggregated by the database.
+
+        Long ranges are split into several statements, each within SQLite's
+        limits on UNION ALL terms and bound parameters.
+        """
+        width = RESOLUTIONS[resolution]
+        until = until if until is not None else now_ms()
+        since = since if since is not None else until - width * DEFAULT_BUCKETS
+        if not device_ids or since >= until:
+            return []
+        step = width * max(1, min(ROLLUP_QUERY_BUCKETS, ROLLUP_QUERY_PARAMS // (len(device_ids) + 4)))
+        rows = []
+        for start in range(since - since % width, until, step):
+            rows.extend(cls.rollup_query(device_ids, kind, width, max(start, since), min(start + step, until)))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return [
+            {
+                "device_id": device_id,
+                "bucket": bucket_start,
+                "min": low,
+                "max": high,
+                "avg": round(mean, 3),
+                "count": count,
+            }
+            for device_id, bucket_start, low, high, mean, count in rows
+        ]
+
+
+class SensorSimulator:
+    """Random-walk temperature readings for a set of devices, for local runs and load tests."""
+
+    def __init__(self, device_ids, low=18.0, high=26.0, step=0.1, seed=None):
+        self.low = low
+        self.high = high
+        self.step = step
+        self._random = random.Random(seed)
+        self._values = {device_id: self._random.uniform(low, high) for device_id in device_ids}
+
+    def readings(self, count, timestamp=None):
+        timestamp = timestamp if timestamp is not None else now_ms()
+        device_ids = list(self._values)
+        batch = []
+        for i in range(count):
+            device_id = device_ids[i % len(device_ids)]
+            value = self._values[device_id] + self._random.uniform(-self.step, self.step)
+            value = min(max(value, self.low), self.high)
+            self._values[device_id] = value
+            batch.append(
+                {
+                    "device_id": device_id,
+                    "kind": "temperature",
+                    "timestamp": timestamp,
+                    "value": round(value, 2),
+                }
+            )
+        return batch
+
+
+def post_readings(url, token):
+    """A ``send(readings)`` posting batches to the server at ``url`` over one keep-alive connection."""
+    parts = urlsplit(url)
+    connection = (http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection)(
+        parts.netloc, timeout=30
+    )
+    path = parts.path.rstrip("/") + "/sensors/readings"
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    def send(readings):
+        connection.request("POST", path, json.dumps({"readings": readings}), headers)
+        response = connection.getresponse()
+        body = response.read()
+        if response.status != 201:
+            raise RuntimeError(f"POST {path} returned {response.status}: {body[:200].decode(errors='replace')}")
+
+    return send
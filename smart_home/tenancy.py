@@ -0,0 +1,219 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g, has_app_context, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import MetaData, orm, select
+
+DEFAULT_SHARD = "default"
+
+# Household data; everything else (users, households, revoked tokens) stays in the main database
+TENANT_TABLES = frozenset(
+    ("mock_iot_device", "device_log", "device_log_daily", "sensor_reading", "automation_rule", "device_command")
+)
+
+
+def shard_bind_key(shard):
+    return None if shard == DEFAULT_SHARD else f"shard:{shard}"
+
+
+def shard_names(config):
+    """The default shard followed by every shard in ``HOUSEHOLD_SHARDS``."""
+    return [DEFAULT_SHARD] + [name for name in config["HOUSEHOLD_SHARDS"] if name != DEFAULT_SHARD]
+
+
+def shard_for_user(user_id):
+    """The shard holding ``user_id``'s household data, via the user cache."""
+    from app import user_cache
+
+    user = user_cache.get(user_id) if user_id is not None else None
+    return user.shard if user is not None and user.shard else DEFAULT_SHARD
+
+
+def current_shard():
+    """The shard for this context: set by ``use_shard``, else the one of the JWT identity."""
+    if not has_app_context():
+        return DEFAULT_SHARD
+    shard = g.get("tenant_shard")
+    if shard is not None:
+        return shard
+    if not has_request_context():
+        return DEFAULT_SHARD
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:  # Not verified yet, or no JWT on this route
+        return DEFAULT_SHARD
+    g.tenant_shard = shard = shard_for_user(identity)
+    return shard
+
+
+@contextmanager
+def use_shard(shard):
+    """Route household tables to ``shard`` for the duration of the block.
+
+    The session's identity map knows nothing about shards, so code that
+    visits several shards in one session should read plain rows (Core
+    statements or column queries) rather than ORM objects.
+    """
+    previous = g.get("tenant_shard")
+    g.tenant_shard = shard
+    try:
+        yield
+    finally:
+        g.tenant_shard = previous
+
+
+def _statement_tables(clause):
+    table = getattr(clause, "table", None)  # INSERT, UPDATE, DELETE
+    if table is not None:
+        return [table]
+    froms = getattr(clause, "get_final_froms", None)
+    return froms() if froms is not None else []
+
+
+class TenantSession(SignallingSession):
+    """Sends statements on household tables to the current household's shard engine."""
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if mapper is not None:
+            tables = [mapper.persist_selectable]
+        else:
+            tables = _statement_tables(clause) if clause is not None else []
+        if any(getattr(table, "name", None) in TENANT_TABLES for table in tables):
+            shard = current_shard()
+            if shard != DEFAULT_SHARD:
+                return self.db.get_engine(self.app, bind=shard_bind_key(shard))
+        return super().get_bind(mapper, clause)
+
+
+class TenantSQLAlchemy(SQLAlchemy):
+    """``SQLAlchemy`` whose session routes household tables per shard.
+
+    Shards are Flask-SQLAlchemy binds named ``shard:<name>``, built from
+    ``HOUSEHOLD_SHARDS``; the ``default`` shard is the main database.
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=TenantSession, db=self, **options)
+
+
+def create_shard_schema(db, app, shard):
+    """Create the household tables in ``shard``'s database.
+
+    Foreign keys into the main database (``user``) cannot be enforced across
+    databases and are left out; keys between household tables are kept.
+    Alembic only migrates the main database, so a schema change to these
+    tables has to be applied to each shard as well.
+    """
+    engine = db.get_engine(app, bind=shard_bind_key(shard))
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        if table.name not in TENANT_TABLES:
+            continue
+        copy = table.to_metadata(metadata)
+        for key in list(copy.foreign_keys):
+            if key.target_fullname.split(".")[0] not in TENANT_TABLES:
+                copy.foreign_keys.discard(key)
+                key.parent.foreign_keys.discard(key)
+                copy.constraints.discard(key.constraint)
+    metadata.create_all(engine)
+    return engine
+
+
+def move_household(db, app, household, target, chunk_size=500):
+    """Move a household's devices and history to ``target``; returns rows copied per table.
+
+    Primary keys are only unique within a shard, so copied rows get new ids
+    in the target and references to moved devices are remapped; so do
+    device commands, whose old ids then 404 on GET /commands/<id>. Everything is
+    copied in one transaction on the target, then the household is switched
+    over, then the old rows are removed (rules are soft-deleted so the rule
+    engines drop them on their next sync). Other workers keep routing to the
+    old shard until their user cache entries expire, so run this while the
+    household is not being written to.
+    """
+    from models import AutomationRule, DeviceCommand, DeviceLog, DeviceLogDaily, MockIoTDevice, SensorReading, User
+
+    source = household.shard or DEFAULT_SHARD
+    if source == target:
+        return {}
+    member_ids = [user_id for user_id, in db.session.query(User.id).filter_by(household_id=household.id)]
+    source_engine = db.get_engine(app, bind=shard_bind_key(source))
+    target_engine = db.get_engine(app, bind=shard_bind_key(target))
+    devices = MockIoTDevice.__table__
+    rules = AutomationRule.__table__
+    history = (DeviceLog.__table__, DeviceLogDaily.__table__, SensorReading.__table__, DeviceCommand.__table__)
+
+    def chunks(ids):
+        for offset in range(0, len(ids), chunk_size):
+            yield ids[offset : offset + chunk_size]
+
+    with target_engine.connect() as conn:
+        if conn.execute(select(devices.c.id).where(devices.c.user_id.in_(member_ids)).limit(1)).first():
+            raise ValueError(f"Shard '{target}' already holds devices of household {household.id}")
+    with source_engine.connect() as conn:
+        device_ids = [row.id for row in conn.execute(select(devices.c.id).where(devices.c.user_id.in_(member_ids)))]
+
+    copied = Counter()
+    now = datetime.utcnow()
+    with source_engine.connect() as reader, target_engine.begin() as writer:
+        device_map = {}
+        for chunk in chunks(device_ids):
+            for row in reader.execute(devices.select().where(devices.c.id.in_(chunk))).all():
+                values = dict(row._mapping)
+                old_id = values.pop("id")
+                device_map[old_id] = writer.execute(devices.insert(), values).inserted_primary_key[0]
+        copied[devices.name] = len(device_map)
+
+        for table in history:
+            for chunk in chunks(device_ids):
+                result = reader.execute(table.select().where(table.c.device_id.in_(chunk)))
+                for partition in result.partitions(5000):
+                    rows = []
+                    for row in partition:
+                        values = dict(row._mapping)
+                        del values["id"]
+                        values["device_id"] = device_map[values["device_id"]]
+                        rows.append(values)
+                    writer.execute(table.insert(), rows)
+                    copied[table.name] += len(rows)
+
+        for chunk in chunks(member_ids):
+            rows = []
+            for row in reader.execute(rules.select().where(rules.c.user_id.in_(chunk), rules.c.deleted_at.is_(None))):
+                values = dict(row._mapping)
+                del values["id"]
+                for key in ("trigger_device_id", "target_device_id"):
+                    if values[key] is not None:
+                        values[key] = device_map.get(values[key])
+                values["updated_at"] = now
+                rows.append(values)
+            if rows:
+                writer.execute(rules.insert(), rows)
+                copied[rules.name] += len(rows)
+
+    household.shard = target
+    # Device ids changed, so cached listings must be rebuilt
+    db.session.query(User).filter(User.id.in_(member_ids)).update(
+        {User.device_version: User.device_version + 1}, synchronize_session=False
+    )
+    db.session.commit()
+
+    with source_engine.begin() as conn:
+        conn.execute(
+            rules.update()
+            .where(rules.c.user_id.in_(member_ids), rules.c.deleted_at.is_(None))
+            # Unlinked from the devices, or deleting those would cascade to the rules before workers see it
+            .values(deleted_at=now, updated_at=now, trigger_device_id=None, target_device_id=None)
+        )
+        for chunk in chunks(device_ids):
+            for table in history:
+                conn.execute(table.delete().where(table.c.device_id.in_(chunk)))
+            conn.execute(devices.delete().where(devices.c.id.in_(chunk)))
+    return dict(copied)
@@ -0,0 +1,64 @@
+"""Test setup: the app is imported once, against a scratch SQLite database.
+
+Run from ``smart_home/``:
+
+    python -m pytest tests
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+SMART_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="smart_home_test_")
+
+# Importing app reads its configuration from the environment
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    LOG_FILE=os.path.join(WORKDIR, "app.log"),
+    PASSWORD_HASH_WORKERS="0",
+    BCRYPT_LOG_ROUNDS="4",
+    RATE_LIMIT_ENABLED="0",
+    HOUSEHOLD_SHARDS="",
+)
+if SMART_HOME not in sys.path:
+    sys.path.insert(0, SMART_HOME)
+
+_usernames = (f"user{n}" for n in itertools.count(1))
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app, client):
+    """A new user; returns ``(user_id, headers)`` with its access token."""
+    username = next(_usernames)
+    assert client.post("/register", json={"username": username, "password": "pw"}).status_code == 201
+    response = client.post("/login", json={"username": username, "password": "pw"})
+    token = response.json["access_token"]
+    user_id = client.get("/users/me", headers={"Authorization": f"Bearer {token}"}).json["id"]
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def device(client, user):
+    """A light owned by ``user``; returns its id."""
+    _, headers = user
+    response = client.post(
+        "/mock/devices", json={"name": "lamp", "device_type": "light", "location": "hall"}, headers=headers
+    )
+    return response.json["device_id"]
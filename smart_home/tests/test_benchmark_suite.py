@@ -0,0 +1,8 @@
+from benchmarks.suite import Context, missing_routes
+
+
+def test_suite_measures_every_route(app):
+    from extensions import db
+
+    assert missing_routes(app, Context(app, db, None, {}, [])) == []
+
@@ -0,0 +1,32 @@
+import json
+
+
+def test_unreadable_device_rows_are_rejected_by_line(client, user):
+    _, headers = user
+    body = b"\n".join(
+        [
+            b"name,device_type,location",
+            b"lamp,light,hall",
+            b"lamp \xff,light,hall",
+            b"fan," + b"x" * 200_000 + b",hall",
+            b"heater,thermostat,den",
+        ]
+    )
+    response = client.post("/mock/devices/import?format=csv", data=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json["imported"] == 2
+    assert response.json["rejected"] == 2
+    assert [error["line"] for error in response.json["errors"]] == [3, 4]
+
+
+def test_unreadable_log_rows_are_rejected_by_line(client, user, device):
+    _, headers = user
+    row = json.dumps({"device_id": device, "action": "Device turned on"}).encode()
+    body = b"\n".join([row, row.replace(b"on", b"\xfe\xff"), b"{", row])
+    response = client.post("/logs/import?format=ndjson", data=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json["imported"] == 2
+    assert response.json["errors"] == [
+        {"line": 2, "error": "Line is not valid UTF-8"},
+        {"line": 3, "error": "Malformed JSON"},
+    ]
@@ -0,0 +1,34 @@
+import threading
+import time
+
+from command_queue import CommandQueue
+from extensions import db
+from models import DeviceCommand
+
+
+class HangingDriver:
+    """Ignores the timeout it is given."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def send(self, command, timeout):
+        self.release.wait(5)
+
+
+def test_driver_overrunning_the_timeout_fails_the_attempt(app, user, device):
+    user_id, _ = user
+    driver = HangingDriver()
+    commands = CommandQueue(app, driver, workers=1, timeout=0.05, max_attempts=1)
+    try:
+        with app.app_context():
+            started = time.monotonic()
+            command_id, = commands.submit(user_id, [(device, "turn_on", None)])
+            commands.flush()
+            assert time.monotonic() - started < 1
+            row = db.session.get(DeviceCommand, command_id)
+            assert row.status == "failed"
+            assert "did not respond within 50 ms" in row.error
+    finally:
+        driver.release.set()
+        commands.close()
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        ["x"],
+        {"selector": ["x"]},
+        {"selector": "hall"},
+        {"selector": {"location": {"a": 1}}, "action": "turn_on"},
+        {"commands": {"device_id": 1}},
+        {"commands": [["x"]]},
+        {"commands": ["x"]},
+    ],
+)
+def test_malformed_bulk_control_is_rejected(client, user, device, body):
+    _, headers = user
+    response = client.post("/mock/devices/control", json=body, headers=headers)
+    assert response.status_code == 400
+
+
+def test_bulk_control_by_selector(client, user, device):
+    _, headers = user
+    response = client.post(
+        "/mock/devices/control", json={"selector": {"location": "hall"}, "action": "turn_on"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert [(result["device_id"], result["status"]) for result in response.json["results"]] == [(device, "on")]
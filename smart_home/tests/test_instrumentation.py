@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+SMART_HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a process of its own: monkey patching cannot be undone
+GEVENT_APP = textwrap.dedent(
+    """
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    import sys
+    import time
+
+    from flask import Flask
+
+    from instrumentation import Instrumentation
+
+    app = Flask(__name__)
+    Instrumentation(slow_request_ms=50, sample_interval_ms=2, profile_dir=sys.argv[1]).init_app(app)
+
+
+    def spin():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+
+    @app.route("/cpu")
+    def cpu():
+        spin()
+        return "ok"
+
+
+    @app.route("/wait")
+    def wait():
+        time.sleep(0.2)
+        return "ok"
+
+
+    client = app.test_client()
+    assert client.get("/cpu").status_code == client.get("/wait").status_code == 200
+    """
+)
+
+
+def test_slow_requests_are_profiled_under_gevent(tmp_path):
+    pytest.importorskip("gevent")
+    script = tmp_path / "gevent_app.py"
+    script.write_text(GEVENT_APP)
+    profiles = tmp_path / "profiles"
+    subprocess.run(
+        [sys.executable, str(script), str(profiles)],
+        check=True,
+        cwd=SMART_HOME,
+        env={**os.environ, "PYTHONPATH": SMART_HOME},
+        timeout=60,
+    )
+
+    folded = {path.name.rsplit("-", 1)[1]: path.read_text() for path in profiles.iterdir()}
+    assert "spin (gevent_app.py)" in folded["cpu.folded"]  # Sampled while it held the CPU
+    assert "wait (gevent_app.py)" in folded["wait.folded"]  # Sampled from the waiting greenlet
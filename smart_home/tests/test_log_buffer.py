@@ -0,0 +1,45 @@
+import threading
+
+from device_control import MAX_ACTION_LENGTH, resolve_action
+from log_buffer import DeviceLogBuffer
+from models import DeviceLog
+
+
+def test_bad_entry_does_not_drop_its_batch(app, device):
+    buffer = DeviceLogBuffer(app, batch_size=100, flush_interval=1)
+    with app.app_context():
+        before = DeviceLog.query.filter_by(device_id=device).count()
+        for i in range(99):
+            buffer.add(device, f"Device adjusted to {i}")
+        buffer.add(device + 10_000, "Device turned on")  # No such device: a foreign key failure
+        buffer.flush()
+        assert DeviceLog.query.filter_by(device_id=device).count() == before + 99
+    buffer.close()
+
+
+def test_flush_returns_while_logs_keep_arriving(app, device):
+    buffer = DeviceLogBuffer(app, batch_size=10, flush_interval=0.01, max_pending=100)
+    stop = threading.Event()
+
+    def produce():
+        while not stop.is_set():
+            buffer.add(device, "Device turned on")  # Faster than the writer: the queue never drains
+
+    with app.app_context():
+        buffer.add(device, "Device turned off")
+        producer = threading.Thread(target=produce)
+        producer.start()
+        try:
+            flusher = threading.Thread(target=buffer.flush)
+            flusher.start()
+            flusher.join(5)
+            assert not flusher.is_alive()
+        finally:
+            stop.set()
+            producer.join()
+    buffer.close()
+
+
+def test_adjust_action_fits_the_log():
+    _, action = resolve_action("adjust", "x" * 200)
+    assert len(action) == MAX_ACTION_LENGTH
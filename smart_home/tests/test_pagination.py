@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import DeviceLog
+
+
+def test_cursor_walks_every_log_once(app, client, user, device):
+    _, headers = user
+    start = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        # Pairs of logs share a timestamp, so pages also split ties
+        db.session.add_all(
+            DeviceLog(device_id=device, action="Device turned on", timestamp=start + timedelta(minutes=n // 2))
+            for n in range(7)
+        )
+        db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        response = client.get("/logs", query_string={"limit": 3, **({"cursor": cursor} if cursor else {})}, headers=headers)
+        assert response.status_code == 200
+        seen += [log["id"] for log in response.json]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 7
+
+
+def test_logs_need_a_timestamp(app, device):
+    with app.app_context():
+        with pytest.raises(IntegrityError):
+            db.session.execute(
+                DeviceLog.__table__.insert().values(device_id=device, action="Device turned on", timestamp=None)
+            )
+        db.session.rollback()
@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.mark.parametrize("timezone", [123, ["UTC"], "Nowhere/Special"])
+def test_bad_timezone_is_rejected(client, user, timezone):
+    _, headers = user
+    settings = {"allowed_hours": [[7, 20]], "timezone": timezone}
+    response = client.post("/parental-control/settings", json={"settings": settings}, headers=headers)
+    assert response.status_code == 422
+    assert "timezone" in response.json["error"]
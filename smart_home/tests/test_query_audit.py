@@ -0,0 +1,21 @@
+import pytest
+
+from query_audit import full_scans
+
+
+@pytest.fixture(scope="module")
+def results(app):
+    from query_audit import audit
+
+    with app.app_context():
+        return {name: (plan, scans) for name, plan, scans in audit()}
+
+
+def test_every_hot_query_uses_an_index(results):
+    slow = {name: plan for name, (plan, scans) in results.items() if scans}
+    assert not slow
+
+
+def test_temp_b_tree_sorts_are_flagged():
+    plan = ["SEARCH device_log USING INDEX ix_device_log_device_id_timestamp (device_id=?)", "USE TEMP B-TREE FOR ORDER BY"]
+    assert full_scans(plan, "sqlite") == ["USE TEMP B-TREE FOR ORDER BY"]
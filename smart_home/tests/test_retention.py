@@ -0,0 +1,34 @@
+import json
+from datetime import datetime, timedelta
+
+from models import DeviceLog, DeviceLogDaily
+from retention import compact_device_logs
+
+
+def import_logs(client, headers, device_id, *timestamps):
+    body = "\n".join(
+        json.dumps({"device_id": device_id, "action": "Device turned on", "timestamp": timestamp.isoformat()})
+        for timestamp in timestamps
+    )
+    response = client.post("/logs/import?format=ndjson", data=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json["imported"] == len(timestamps)
+
+
+def test_late_logs_merge_into_compacted_day(app, client, user, device):
+    _, headers = user
+    day = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=400)
+    cutoff = datetime.utcnow() - timedelta(days=30)
+
+    import_logs(client, headers, device, day, day + timedelta(hours=1))
+    with app.app_context():
+        assert compact_device_logs(cutoff) == (1, 2)
+
+    import_logs(client, headers, device, day - timedelta(hours=2))
+    with app.app_context():
+        assert compact_device_logs(cutoff) == (1, 1)
+        summary = DeviceLogDaily.query.filter_by(device_id=device).one()
+        assert summary.count == 3
+        assert summary.first_at == day - timedelta(hours=2)
+        assert summary.last_at == day + timedelta(hours=1)
+        assert DeviceLog.query.filter(DeviceLog.device_id == device, DeviceLog.timestamp < cutoff).count() == 0
@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import TokenBlacklist
+from retention import purge_before
+from revocation import RevocationIndex
+
+
+def test_revocation_reusing_a_purged_id_reaches_other_workers(app):
+    revoking, other = RevocationIndex(), RevocationIndex()
+    with app.app_context():
+        expired = (datetime.utcnow() - timedelta(hours=1) - datetime(1970, 1, 1)).total_seconds()
+        revoking.revoke("expired-jti", expired)
+        other.sync()
+        purged_id = db.session.query(db.func.max(TokenBlacklist.id)).scalar()
+
+        purge_before(TokenBlacklist, TokenBlacklist.expires_at, datetime.utcnow(), 100)
+        revoking.revoke("logged-out-jti")
+        # SQLite hands the purged row's id out again
+        assert TokenBlacklist.query.filter_by(jti="logged-out-jti").one().id == purged_id
+
+        other.sync()
+    assert other.is_revoked("logged-out-jti")
@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.mark.parametrize("timezone", [123, ["UTC"], "Nowhere/Special"])
+def test_bad_timezone_is_rejected(client, user, device, timezone):
+    _, headers = user
+    rule = {
+        "name": "night light",
+        "trigger": {"type": "time", "at": "22:00", "timezone": timezone},
+        "action": {"action": "turn_on", "device_id": device},
+    }
+    response = client.post("/rules", json=rule, headers=headers)
+    assert response.status_code == 400
+    assert "timezone" in response.json["error"]
+
+
+@pytest.mark.parametrize(
+    "trigger, action",
+    [
+        ({"type": "sensor", "kind": {"a": 1}, "op": ">", "value": 25}, {"action": "turn_on", "location": "hall"}),
+        ({"type": "sensor", "kind": "k" * 21, "op": ">", "value": 25}, {"action": "turn_on", "location": "hall"}),
+        ({"type": "time", "at": "22:00"}, {"action": "turn_on", "location": {"room": "hall"}}),
+        ({"type": "time", "at": "22:00"}, {"action": "turn_on", "location": "l" * 51}),
+        ({"type": "time", "at": "22:00"}, {"action": "turn_on", "device_type": ["light"]}),
+        ({"type": "time", "at": "22:00"}, {"action": "turn_on", "device_type": "t" * 51}),
+    ],
+)
+def test_target_and_kind_must_fit_their_columns(client, user, trigger, action):
+    _, headers = user
+    response = client.post("/rules", json={"name": "rule", "trigger": trigger, "action": action}, headers=headers)
+    assert response.status_code == 400
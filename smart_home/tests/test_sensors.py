@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+
+@pytest.mark.parametrize("kind", [{"a": 1}, 7, "", "k" * 21])
+def test_bad_kind_is_rejected(client, user, device, kind):
+    _, headers = user
+    response = client.post(
+        "/sensors/readings", json={"readings": [{"device_id": device, "value": 20, "kind": kind}]}, headers=headers
+    )
+    assert response.status_code == 400
+    assert "kind" in response.json["error"]
+
+
+def test_readings_stored_elsewhere_show_up_after_the_ttl(app, client, user, device, monkeypatch):
+    from app import sensor_store
+    from extensions import db
+    from models import SensorReading
+
+    _, headers = user
+    client.post("/sensors/readings", json={"readings": [{"device_id": device, "value": 20}]}, headers=headers)
+    assert client.get("/temperature", headers=headers).json["temperature"] == 20
+
+    # Another process (a worker, the simulator) stores a newer reading
+    with app.app_context():
+        db.session.add(SensorReading(device_id=device, kind="temperature", value=23, timestamp=int(time.time() * 1000) + 1))
+        db.session.commit()
+    assert client.get("/temperature", headers=headers).json["temperature"] == 20
+    monotonic = time.monotonic
+    monkeypatch.setattr(time, "monotonic", lambda: monotonic() + sensor_store.ttl)
+    assert client.get("/temperature", headers=headers).json["temperature"] == 23
+
+
+def test_rollup_matches_the_readings(app, user, device, monkeypatch):
+    import sensors
+    from extensions import db
+    from models import SensorReading
+    from sensors import SensorStore
+
+    start = 1_700_000_000_000
+    readings = [
+        {"device_id": device, "kind": "temperature", "timestamp": start + n * 7_001, "value": float(n % 13)}
+        for n in range(100)
+    ]
+    with app.app_context():
+        db.session.bulk_insert_mappings(SensorReading, readings)
+        db.session.commit()
+        since, until = start + 30_000, start + 600_000
+        expected = {}
+        for reading in readings:
+            if since <= reading["timestamp"] < until:
+                bucket = reading["timestamp"] // 60_000 * 60_000
+                expected.setdefault(bucket, []).append(reading["value"])
+
+        monkeypatch.setattr(sensors, "ROLLUP_QUERY_PARAMS", 12)  # Two buckets per statement
+        buckets = SensorStore.rollup([device], "temperature", "1m", since, until)
+    assert [(row["bucket"], row["min"], row["max"], row["count"]) for row in buckets] == [
+        (bucket, min(values), max(values), len(values)) for bucket, values in sorted(expected.items())
+    ]
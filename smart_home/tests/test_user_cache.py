@@ -0,0 +1,33 @@
+from user_cache import UserCache
+
+
+def test_snapshot_has_no_password(app, user):
+    user_id, _ = user
+    with app.app_context():
+        assert "password" not in UserCache().get(user_id)._fields
+
+
+def test_load_invalidated_in_flight_is_not_cached(app, user, monkeypatch):
+    user_id, _ = user
+    cache = UserCache()
+    load = UserCache._load
+
+    def load_then_invalidate(user_id):
+        row = load(user_id)
+        cache.invalidate(user_id)  # A write commits while the row is being read
+        return row
+
+    with app.app_context():
+        monkeypatch.setattr(cache, "_load", load_then_invalidate)
+        assert cache.get(user_id).id == user_id
+        monkeypatch.setattr(cache, "_load", load)
+        assert user_id not in cache._entries
+        cache.get(user_id)
+        assert user_id in cache._entries
+
+
+def test_verify_password_reads_the_current_hash(client, user):
+    _, headers = user
+    assert client.post("/verify-password", json={"currentPassword": "pw"}, headers=headers).status_code == 200
+    assert client.put("/update-user", json={"password": "new"}, headers=headers).status_code == 200
+    assert client.post("/verify-password", json={"currentPassword": "new"}, headers=headers).status_code == 200
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from policies import policy_from_json
+
+
+class CachedUser(
+    namedtuple("CachedUser", "id username is_admin parental_controls household_id shard")
+):
+    """Read-only snapshot of a ``User`` row, without the password hash: read that fresh."""
+
+    __slots__ = ()
+
+    def get_parental_controls(self):
+        return json.loads(self.parental_controls) if self.parental_controls else {}
+
+    @property
+    def policy(self):
+        """The compiled parental-control ``Policy``; shared by every snapshot with the same settings."""
+        return policy_from_json(self.parental_controls)
+
+
+class UserCache:
+    """Per-process TTL cache of user rows, used for identity and admin checks.
+
+    Handlers that change a user must call ``invalidate`` after committing.
+    A load that was already running when ``invalidate`` was called returns
+    its row but does not cache it. Other processes see the change once
+    their entry's TTL runs out.
+    """
+
+    def __init__(self, ttl=30, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # user_id -> (expires_at, CachedUser)
+        self._loading = {}  # user_id -> generation of the newest load in flight
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the cached snapshot for ``user_id``, or ``None`` if no such user."""
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            self._generation += 1
+            generation = self._loading[user_id] = self._generation
+
+        try:
+            row = self._load(user_id)
+        except Exception:
+            with self._lock:
+                self._done_loading(user_id, generation)
+            raise
+        user = CachedUser(*row) if row is not None else None
+        with self._lock:
+            if self._done_loading(user_id, generation) and user is not None:
+                self._entries[user_id] = (now + self.ttl, user)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return user
+
+    def _done_loading(self, user_id, generation):
+        """Forget the load ``generation``; True unless it was invalidated or overtaken meanwhile."""
+        if self._loading.get(user_id) != generation:
+            return False
+        del self._loading[user_id]
+        return True
+
+    @classmethod
+    def _load(cls, user_id):
+        return cls.load_query(user_id).first()
+
+    @staticmethod
+    def load_query(user_id):
+        """Query of the ``CachedUser`` fields of ``user_id``."""
+        from models import Household, User
+
+        return (
+            User.query.with_entities(
+                User.id,
+                User.username,
+                User.is_admin,
+                User.parental_controls,
+                User.household_id,
+                Household.shard,
+            )
+            .outerjoin(Household, Household.id == User.household_id)
+            .filter(User.id == user_id)
+            .autoflush(False)  # Flushing may route household rows, which asks this cache for the shard
+        )
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+            self._loading.pop(int(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
@@ -0,0 +1,15 @@
+def create_app():
+    """The app for production WSGI servers; see ``gunicorn.conf.py``.
+
+    Safe to call once in a server's master process before it forks workers
+    (gunicorn's ``preload_app``): what runs in the background (log writer,
+    password pool, log buffer, command queue, profiler) is started afresh in
+    each worker, and pooled database connections never cross a fork
+    (``db_tuning.install_fork_guard``). The one-time setup in ``app.prewarm``
+    is done here, so workers inherit it instead of each doing it on its
+    first requests.
+    """
+    from app import app, prewarm
+
+    prewarm()
+    return app